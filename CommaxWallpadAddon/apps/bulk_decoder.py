@@ -0,0 +1,321 @@
+"""수집한 원시 패킷을 한꺼번에 열(column) 단위로 해석하는 오프라인 디코더 모듈입니다.
+
+프레임을 N×8 uint8 배열로 불러와 체크섬을 벡터 연산으로 검증하고, 헤더별로 묶은 뒤
+패킷 구조에 선언된 state 필드(decode 선언 또는 LEGACY_FIELD_CODECS)를 타입이 있는 열로
+해석합니다. process_elfin_data를 거치지 않으므로 HA나 MQTT로 아무것도 보내지 않습니다.
+
+numpy가 필요합니다. 애드온 이미지에는 포함되어 있지 않으므로 분석용 PC에서
+``pip3 install numpy`` 후 실행하세요.
+
+명령행 사용 예:
+    python3 -m apps.bulk_decoder --start 00:00 --end 23:59:59 --output /share/decoded
+    python3 -m apps.bulk_decoder --input capture.txt --format npz --output decoded.npz
+"""
+
+import os
+import csv
+import sys
+import argparse
+from functools import reduce
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .field_codecs import (BCD_TABLE, HEX_TABLE, CodecError, resolve_scale,
+                           iter_codec_declarations, state_device_id_position)
+from .packet_journal import PacketJournal, parse_time_range
+from .packet_structure import CompiledStructure, load_structure
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # 애드온 이미지에는 numpy가 없습니다
+    np = None
+
+FRAME_SIZE = 8
+DEFAULT_STRUCTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packet_structures_commax.yaml')
+
+# 열 단위 해석 함수: (N×8 프레임 배열) -> 길이 N 배열
+ColumnDecoder = Callable[[Any], Any]
+
+
+def require_numpy() -> Any:
+    """numpy 모듈을 반환합니다.
+
+    Raises:
+        ImportError: numpy가 설치되어 있지 않은 경우
+    """
+    if np is None:
+        raise ImportError('벌크 디코더에는 numpy가 필요합니다. pip3 install numpy 후 다시 실행하세요.')
+    return np
+
+
+def frames_to_array(frames: Iterable[bytes]) -> Any:
+    """8바이트 프레임 목록을 N×8 uint8 배열로 만듭니다. 길이가 8이 아닌 프레임은 버립니다."""
+    numpy = require_numpy()
+    data = b''.join(frame for frame in frames if len(frame) == FRAME_SIZE)
+    return numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, FRAME_SIZE)
+
+
+def checksum_mask(frames: Any) -> Any:
+    """utils.checksum과 같은 니블 체크섬을 프레임 전체에 대해 한 번에 검증합니다."""
+    numpy = require_numpy()
+    body = frames[:, :FRAME_SIZE - 1].astype(numpy.uint16)
+    low = (body & 0x0F).sum(axis=1)
+    high = ((body >> 4).sum(axis=1) + low // 16) % 16
+    return frames[:, FRAME_SIZE - 1] == (high << 4) | (low % 16)
+
+
+def compile_column(spec: Dict[str, Any], position: int, values: Dict[str, int],
+                   packet: Dict[str, Any], logger: Any = None, where: str = '') -> ColumnDecoder:
+    """codec 선언 하나를 열 단위 해석 함수로 컴파일합니다. (field_codecs.compile_codec의 배열 버전)
+
+    bcd/scaled는 float64 열(해석할 수 없는 BCD는 NaN), enum은 값 종류에 맞는 열,
+    hex는 문자열 열, raw는 uint8 열이 됩니다.
+
+    Raises:
+        CodecError: 알 수 없는 codec이거나 길이가 맞지 않는 경우
+    """
+    numpy = require_numpy()
+    kind = spec.get('type')
+    length = int(spec.get('length', 1))
+    if length < 1 or position + length > 7:
+        raise CodecError(f'{where}: 위치 {position}에서 {length}바이트를 읽을 수 없습니다.')
+    end = position + length
+
+    if kind == 'enum':
+        if length != 1:
+            raise CodecError(f'{where}: enum은 1바이트만 해석할 수 있습니다.')
+        mapping = spec.get('map')
+        default = spec.get('default')
+        table: List[Any] = [default] * 256
+        for name, byte in reversed(list(values.items())):
+            table[byte] = name if mapping is None else mapping.get(name, default)
+        lookup = numpy.array(table, dtype=object if None in table else None)
+        return lambda frames: lookup[frames[:, position]]
+
+    if kind == 'bcd':
+        scale = resolve_scale(spec, packet, logger, where) if 'scale' in spec else None
+        digits = numpy.array([numpy.nan if v is None else v for v in BCD_TABLE], dtype=numpy.float64)
+
+        def decode_bcd(frames: Any) -> Any:
+            value = numpy.zeros(len(frames), dtype=numpy.float64)
+            for i in range(position, end):
+                value = value * 100 + digits[frames[:, i]]
+            return value if scale is None else value * scale
+        return decode_bcd
+
+    if kind == 'scaled':
+        scale = resolve_scale(spec, packet, logger, where)
+        offset = float(spec.get('offset', 0))
+        weights = numpy.array([256 ** (end - 1 - i) for i in range(position, end)], dtype=numpy.float64)
+        return lambda frames: frames[:, position:end].astype(numpy.float64) @ weights * scale + offset
+
+    if kind == 'hex':
+        hex_table = numpy.array(HEX_TABLE)
+        return lambda frames: reduce(numpy.char.add, (hex_table[frames[:, i]] for i in range(position, end)))
+
+    if kind == 'raw':
+        return lambda frames: frames[:, position].copy()
+
+    raise CodecError(f'{where}: 알 수 없는 codec 종류입니다: {kind}')
+
+
+def _apply_condition(column: Any, frames: Any, condition: Optional[Tuple[int, int]]) -> Any:
+    """when 조건이 맞지 않는 행을 비웁니다. (실수 열은 NaN, 그 밖의 열은 None)"""
+    if condition is None:
+        return column
+    numpy = require_numpy()
+    miss = frames[:, condition[0]] != condition[1]
+    if not miss.any():
+        return column
+    if column.dtype.kind == 'f':
+        column = column.copy()
+        column[miss] = numpy.nan
+    else:
+        column = column.astype(object)
+        column[miss] = None
+    return column
+
+
+class BulkDecoder:
+    """컴파일된 패킷 구조로 프레임 배열을 기기별 열 테이블로 해석하는 클래스
+
+    Args:
+        compiled (CompiledStructure): 컴파일된 패킷 구조
+        logger: 잘못된 codec 선언을 기록할 로거 (없으면 조용히 건너뜀)
+    """
+
+    def __init__(self, compiled: CompiledStructure, logger: Any = None) -> None:
+        require_numpy()
+        self.compiled = compiled
+        # {상태 헤더: (기기 이름, deviceId 위치, [(출력 이름, 해석 함수, 조건)])}
+        self.headers: Dict[int, Tuple[str, Optional[int], List[Tuple[str, ColumnDecoder, Optional[Tuple[int, int]]]]]] = {}
+        for header, decoder in compiled.state_decoders.items():
+            packet = compiled.devices[decoder.device]['state']
+            columns = []
+            for declaration in iter_codec_declarations(decoder.device, packet, compiled.value_tables, logger):
+                try:
+                    column = compile_column(declaration.spec, declaration.position, declaration.values,
+                                            packet, logger, declaration.where)
+                except (CodecError, KeyError, TypeError, ValueError) as e:
+                    if logger:
+                        logger.error(f'상태 필드 codec을 컴파일할 수 없습니다 ({declaration.where}): {e}')
+                    continue
+                columns.append((declaration.output, column, declaration.condition))
+            self.headers[header] = (decoder.device, state_device_id_position(packet), columns)
+        self.stats: Dict[str, int] = {}
+
+    def decode(self, frames: Any, timestamps: Optional[Any] = None) -> Dict[str, Dict[str, Any]]:
+        """프레임 배열을 {기기 이름: {열 이름: 배열}}로 해석합니다.
+
+        체크섬이 틀린 프레임과 구조에 없는 헤더는 버리고 개수만 stats에 남깁니다.
+        timestamps(길이 N, epoch ns)가 주어지면 각 테이블에 timestamp 열이 붙습니다.
+        """
+        numpy = require_numpy()
+        valid = checksum_mask(frames)
+        frames = frames[valid]
+        if timestamps is not None:
+            timestamps = numpy.asarray(timestamps, dtype=numpy.uint64)[valid]
+        self.stats = {'frames': int(len(valid)), 'bad_checksum': int((~valid).sum()), 'unknown_header': 0}
+
+        tables: Dict[str, Dict[str, Any]] = {}
+        headers, inverse = numpy.unique(frames[:, 0], return_inverse=True)
+        for index, header in enumerate(headers.tolist()):
+            rows = inverse.reshape(-1) == index
+            if header not in self.headers:
+                self.stats['unknown_header'] += int(rows.sum())
+                continue
+            device, id_position, columns = self.headers[header]
+            if len(self.compiled.header_candidates.get(header, ())) > 1:
+                owned = self._owned_rows(header, device, frames[rows])
+                self.stats['unknown_header'] += int((~owned).sum())
+                rows[rows] = owned
+            group = frames[rows]
+            table: Dict[str, Any] = {}
+            if timestamps is not None:
+                table['timestamp'] = timestamps[rows]
+            table['device_id'] = (group[:, id_position].copy() if id_position is not None
+                                  else numpy.ones(len(group), dtype=numpy.uint8))
+            for name, column, condition in columns:
+                table[name] = _apply_condition(column(group), group, condition)
+            tables[device] = table
+        return tables
+
+
+    def _owned_rows(self, header: int, device: str, group: Any) -> Any:
+        """같은 헤더를 쓰는 후보가 여럿일 때 device의 상태 패킷으로 판별되는 행을 고릅니다.
+
+        CompiledStructure.identify와 같은 규칙(고정 바이트가 맞는 후보 중 가장 구체적인 후보)을 따릅니다.
+        """
+        numpy = require_numpy()
+        candidates = self.compiled.header_candidates[header]
+        scores = numpy.full((len(candidates), len(group)), -1)
+        for i, candidate in enumerate(candidates):
+            match = numpy.ones(len(group), dtype=bool)
+            for pos, byte in candidate.fixed:
+                match &= group[:, pos] == byte
+            scores[i][match] = len(candidate.fixed)
+        best = scores.argmax(axis=0)
+        mine = [i for i, c in enumerate(candidates) if c.device == device and c.packet_type == 'state']
+        return numpy.isin(best, mine) & (scores.max(axis=0) >= 0)
+
+
+def save_csv(tables: Dict[str, Dict[str, Any]], directory: str) -> List[str]:
+    """기기별 테이블을 ``<directory>/<기기>.csv``로 저장하고 파일 경로 목록을 반환합니다."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for device, table in tables.items():
+        path = os.path.join(directory, f'{device}.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(table))
+            writer.writerows(zip(*(column.tolist() for column in table.values())))
+        paths.append(path)
+    return paths
+
+
+def save_npz(tables: Dict[str, Dict[str, Any]], path: str) -> str:
+    """기기별 테이블을 ``<기기>.<열>`` 키로 하나의 NPZ 파일에 저장합니다.
+
+    pickle 없이 읽을 수 있도록 object 열은 문자열 열로 바꿉니다. (None은 빈 문자열)
+    """
+    numpy = require_numpy()
+    arrays = {}
+    for device, table in tables.items():
+        for name, column in table.items():
+            if column.dtype == object:
+                column = numpy.array(['' if v is None else str(v) for v in column.tolist()])
+            arrays[f'{device}.{name}'] = column
+    numpy.savez_compressed(path, **arrays)
+    return path if path.endswith('.npz') else path + '.npz'
+
+
+def read_hex_file(path: str) -> List[bytes]:
+    """한 줄에 하나씩 16진수 프레임이 있는 텍스트 파일을 읽습니다.
+
+    줄의 마지막 단어를 프레임으로 보므로 packet_journal 명령행 출력도 그대로 읽을 수 있습니다.
+    """
+    frames = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            words = line.split()
+            if not words:
+                continue
+            try:
+                frames.append(bytes.fromhex(words[-1]))
+            except ValueError:
+                continue
+    return frames
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Commax 패킷 일괄 해석 (오프라인)')
+    parser.add_argument('--structure', default=DEFAULT_STRUCTURE, help='패킷 구조 파일')
+    parser.add_argument('--input', help='16진수 프레임 텍스트 파일 (주면 저널 대신 사용)')
+    parser.add_argument('--dir', default='/share/packet_journal', help='저널 디렉토리')
+    parser.add_argument('--start', help='시작 시각 (예: 03:00, "2025-03-21 03:00")')
+    parser.add_argument('--end', help='종료 시각 (예: 03:05)')
+    parser.add_argument('--date', help='시각만 입력한 경우 기준 날짜 (YYYY-MM-DD, 기본값: 오늘)')
+    parser.add_argument('--format', choices=('csv', 'npz'), default='csv', help='저장 형식')
+    parser.add_argument('--output', required=True, help='CSV는 저장할 디렉토리, NPZ는 파일 경로')
+    args = parser.parse_args(argv)
+
+    try:
+        require_numpy()
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    timestamps = None
+    if args.input:
+        frames = frames_to_array(read_hex_file(args.input))
+    else:
+        if not (args.start and args.end):
+            parser.error('--input이 없으면 --start와 --end가 필요합니다.')
+        try:
+            start_ns, end_ns = parse_time_range(args.start, args.end, args.date)
+        except ValueError as e:
+            parser.error(str(e))
+        journal = PacketJournal(args.dir)
+        records = [(frame['timestamp'], bytes.fromhex(frame['packet']))
+                   for frame in journal.query(start_ns, end_ns, direction='recv')]
+        records = [record for record in records if len(record[1]) == FRAME_SIZE]
+        frames = frames_to_array(packet for _, packet in records)
+        timestamps = [ts for ts, _ in records]
+
+    decoder = BulkDecoder(load_structure(args.structure))
+    tables = decoder.decode(frames, timestamps)
+    if args.format == 'csv':
+        outputs = save_csv(tables, args.output)
+    else:
+        outputs = [save_npz(tables, args.output)]
+    stats = decoder.stats
+    print(f"프레임 {stats['frames']}개 (체크섬 오류 {stats['bad_checksum']}개, "
+          f"알 수 없는 헤더 {stats['unknown_header']}개)")
+    for device, table in tables.items():
+        print(f"  {device}: {len(table['device_id'])}행")
+    for output in outputs:
+        print(f'저장: {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
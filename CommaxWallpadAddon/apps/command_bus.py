@@ -0,0 +1,253 @@
+"""컨트롤러 이벤트 루프로 명령 패킷을 보내고 결과를 돌려받는 명령 버스 모듈입니다.
+
+웹 UI 같은 도구는 ``submit``(루프 안) 또는 ``submit_threadsafe``(다른 스레드)로 패킷을 넣고,
+전송 큐(QUEUE)가 패킷을 보내고 예상 상태 패킷으로 확인한 뒤 결과(CommandResult)를 돌려줍니다.
+"""
+
+import time
+import asyncio
+import concurrent.futures
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from .utils import checksum
+from .command_scheduler import PRIORITY_LOW, PRIORITY_NORMAL
+
+# 한 번의 일괄 전송에서 허용하는 최대 패킷 수
+MAX_BATCH_PACKETS = 256
+
+
+@dataclass
+class CommandResult:
+    """명령 전송 결과
+
+    Attributes:
+        packet (str): 전송한 패킷 (16진수)
+        sent (bool): 한 번 이상 월패드로 전송되었는지 여부
+        confirmed (Optional[bool]): 예상 상태 패킷 수신 여부. 확인할 상태가 없는 패킷이면 None
+        attempts (int): 전송 시도 횟수
+        queued_ms (float): 큐에 들어간 뒤 처음 전송될 때까지 걸린 시간
+        confirm_ms (Optional[float]): 처음 전송한 뒤 확인될 때까지 걸린 시간
+        total_ms (float): 큐에 들어간 뒤 결과가 나올 때까지 걸린 시간
+        error (Optional[str]): 실패 사유
+    """
+    packet: str
+    sent: bool
+    confirmed: Optional[bool]
+    attempts: int
+    queued_ms: float
+    confirm_ms: Optional[float]
+    total_ms: float
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ResponseCapture:
+    """일괄 전송 중 한 패킷을 보낸 뒤 수신된 프레임을 모으는 클래스"""
+
+    def __init__(self, headers: Optional[Set[int]] = None) -> None:
+        self.headers = headers
+        self.started_at = time.monotonic()
+        self.frames: List[Dict[str, Any]] = []
+
+    def feed(self, packet_hex: str, now: float) -> None:
+        if self.headers and int(packet_hex[:2], 16) not in self.headers:
+            return
+        self.frames.append({'packet': packet_hex, 'offset_ms': round((now - self.started_at) * 1000, 1)})
+
+
+def normalize_packet(packet: str) -> str:
+    """7바이트면 체크섬을 붙이고, 8바이트면 체크섬을 검증한 대문자 16진수 패킷을 반환합니다.
+
+    Raises:
+        ValueError: 16진수가 아니거나 길이/체크섬이 맞지 않는 경우
+    """
+    packet = packet.strip().replace(' ', '').upper()
+    try:
+        bytes.fromhex(packet)
+    except ValueError:
+        raise ValueError(f'16진수 패킷이 아닙니다: {packet}')
+    if len(packet) == 14:
+        return checksum(packet) or ''
+    if len(packet) != 16:
+        raise ValueError(f'패킷은 7바이트(체크섬 제외) 또는 8바이트여야 합니다: {packet}')
+    if checksum(packet) != packet:
+        raise ValueError(f'체크섬이 맞지 않습니다: {packet}')
+    return packet
+
+
+def build_batch_packets(packets: Optional[Iterable[str]] = None, sweep: Optional[Dict[str, Any]] = None) -> List[str]:
+    """일괄 전송할 패킷 목록을 만들고 한 번에 검증합니다.
+
+    Args:
+        packets: 패킷 목록 (7바이트면 체크섬 자동 추가)
+        sweep: 한 바이트 위치를 훑는 템플릿
+            {'template': '31010100000000', 'position': 2, 'start': '00', 'end': 'FF', 'step': 1}
+
+    Raises:
+        ValueError: 잘못된 패킷이 하나라도 있거나 개수가 MAX_BATCH_PACKETS를 넘는 경우
+    """
+    result: List[str] = [normalize_packet(packet) for packet in (packets or [])]
+    if sweep:
+        template = bytearray.fromhex(normalize_packet(str(sweep.get('template', '')))[:14])
+        position = int(sweep.get('position', -1))
+        if not 1 <= position < len(template):
+            raise ValueError(f'position은 1~{len(template) - 1} 사이여야 합니다 (0은 헤더).')
+        start = int(str(sweep.get('start', '00')), 16)
+        end = int(str(sweep.get('end', 'FF')), 16)
+        step = int(sweep.get('step', 1))
+        if not (0 <= start <= 0xFF and 0 <= end <= 0xFF) or step < 1:
+            raise ValueError('start/end는 00~FF, step은 1 이상이어야 합니다.')
+        for value in range(start, end + 1, step):
+            template[position] = value
+            result.append(checksum(template.hex().upper()) or '')
+    if not result:
+        raise ValueError('전송할 패킷이 없습니다.')
+    if len(result) > MAX_BATCH_PACKETS:
+        raise ValueError(f'한 번에 최대 {MAX_BATCH_PACKETS}개까지 전송할 수 있습니다. ({len(result)}개)')
+    return result
+
+
+class CommandBus:
+    """명령 패킷을 컨트롤러의 전송 큐에 넣고 결과 future를 돌려주는 클래스
+
+    큐와 COLLECTDATA는 컨트롤러 루프에서만 만지므로, 다른 스레드에서 호출할 때는
+    반드시 ``submit_threadsafe``를 사용해야 합니다.
+
+    Args:
+        controller: WallpadController 인스턴스
+    """
+
+    def __init__(self, controller: Any) -> None:
+        self.controller = controller
+        self.logger = controller.logger
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.captures: Set[ResponseCapture] = set()
+        self.stats_data: Dict[str, float] = {
+            'submitted': 0, 'confirmed': 0, 'unconfirmed': 0, 'unsent': 0, 'confirm_ms_total': 0.0
+        }
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """명령을 처리할 컨트롤러 이벤트 루프를 지정합니다."""
+        self.loop = loop
+
+    def enqueue(self, packet_hex: str, max_send_count: Optional[int] = None,
+                priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None) -> 'asyncio.Future[CommandResult]':
+        """패킷을 전송 큐에 넣고 결과 future를 반환합니다. 컨트롤러 루프에서만 호출해야 합니다.
+
+        명령 헤더로 구조에서 예상 상태 패킷을 찾을 수 있으면 확인될 때까지 재전송하고
+        (max_send_count를 생략하면 재전송 정책이 기기별로 정한 횟수까지),
+        그렇지 않으면 max_send_count(기본값 1)번만 전송합니다.
+        deadline(초)이 주어지면 그 시간 안에 확인되지 않은 명령은 더 보내지 않고 실패로 끝냅니다.
+        """
+        packet_hex = packet_hex.upper()
+        loop = asyncio.get_running_loop()
+        future: 'asyncio.Future[CommandResult]' = loop.create_future()
+        expected_state = None
+        compiled = self.controller.compiled_structure
+        if compiled is not None and compiled.find_device('command', int(packet_hex[:2], 16)):
+            expected_state = self.controller.message_processor.generate_expected_state_packet(packet_hex)
+        if max_send_count is None and not expected_state:
+            max_send_count = 1
+
+        self.stats_data['submitted'] += 1
+        item: Dict[str, Any] = {
+            'sendcmd': packet_hex,
+            'count': 0,
+            'expected_state': expected_state,
+            'received_count': 0,
+            'future': future,
+            'enqueued_at': time.monotonic(),
+            'priority': priority,
+            'deadline': time.monotonic() + deadline if deadline is not None else None
+        }
+        if max_send_count is not None:
+            item['max_send_count'] = max_send_count
+        self.controller.QUEUE.append(item)  # type: ignore[arg-type]
+        return future
+
+    async def submit(self, packet_hex: str, max_send_count: Optional[int] = None,
+                     timeout: Optional[float] = None, priority: int = PRIORITY_NORMAL,
+                     deadline: Optional[float] = None) -> CommandResult:
+        """패킷을 전송하고 확인(또는 최대 전송 횟수 소진, 기한 초과)될 때까지 기다립니다."""
+        future = self.enqueue(packet_hex, max_send_count, priority, deadline)
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def submit_threadsafe(self, packet_hex: str, max_send_count: Optional[int] = None) -> 'concurrent.futures.Future[CommandResult]':
+        """다른 스레드에서 패킷을 전송합니다. 결과는 concurrent.futures.Future로 받습니다."""
+        if self.loop is None or self.loop.is_closed():
+            raise RuntimeError('명령 버스가 이벤트 루프에 연결되지 않았습니다.')
+        return asyncio.run_coroutine_threadsafe(self.submit(packet_hex, max_send_count), self.loop)
+
+    def resolve(self, item: Dict[str, Any], confirmed: Optional[bool], error: Optional[str] = None) -> None:
+        """전송 큐 처리 결과로 항목의 future를 완료합니다. future가 없는 항목(HA 명령)은 무시합니다."""
+        future = item.get('future')
+        if future is None or future.done():
+            return
+        now = time.monotonic()
+        enqueued_at = item.get('enqueued_at', now)
+        first_sent_at = item.get('first_sent_at')
+        sent = first_sent_at is not None
+        result = CommandResult(
+            packet=item['sendcmd'],
+            sent=sent,
+            confirmed=confirmed if sent else False,
+            attempts=item['count'],
+            queued_ms=((first_sent_at if sent else now) - enqueued_at) * 1000,
+            confirm_ms=(item.get('confirmed_at', now) - first_sent_at) * 1000 if sent and confirmed else None,
+            total_ms=(now - enqueued_at) * 1000,
+            error=error if error else (None if sent else '월패드가 연결되지 않아 전송하지 못했습니다.')
+        )
+        if not result.sent:
+            self.stats_data['unsent'] += 1
+        elif result.confirmed:
+            self.stats_data['confirmed'] += 1
+            self.stats_data['confirm_ms_total'] += result.confirm_ms or 0.0
+        elif result.confirmed is False:
+            self.stats_data['unconfirmed'] += 1
+        future.set_result(result)
+
+    def observe(self, raw_data: str) -> None:
+        """월패드에서 받은 데이터를 진행 중인 응답 수집기에 전달합니다."""
+        if not self.captures:
+            return
+        now = time.monotonic()
+        for k in range(0, len(raw_data) - 15, 16):
+            frame = raw_data[k:k + 16]
+            for capture in self.captures:
+                capture.feed(frame, now)
+
+    async def run_batch(self, packets: List[str], interval: float = 0.5, max_send_count: Optional[int] = None,
+                        response_headers: Optional[Set[int]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """패킷을 하나씩 전송 큐로 보내고 패킷별 결과를 순서대로 내보냅니다.
+
+        각 패킷의 결과가 나온 뒤 interval초 동안 더 기다리며 받은 프레임을 응답으로 모으고,
+        그 다음 패킷을 보냅니다. (응답 시각은 큐에 넣은 시점 기준)
+        """
+        started = time.monotonic()
+        for index, packet in enumerate(packets):
+            capture = ResponseCapture(response_headers)
+            self.captures.add(capture)
+            try:
+                result = await self.submit(packet, max_send_count, priority=PRIORITY_LOW)
+                await asyncio.sleep(interval)
+            finally:
+                self.captures.discard(capture)
+            yield {'index': index, 'packet': packet, 'result': result.to_dict(), 'responses': capture.frames}
+        yield {'done': True, 'count': len(packets), 'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        """명령 처리 통계를 반환합니다."""
+        confirmed = self.stats_data['confirmed']
+        return {
+            'submitted': int(self.stats_data['submitted']),
+            'confirmed': int(confirmed),
+            'unconfirmed': int(self.stats_data['unconfirmed']),
+            'unsent': int(self.stats_data['unsent']),
+            'pending': sum(1 for item in self.controller.QUEUE if item.get('future') is not None),
+            'avg_confirm_ms': self.stats_data['confirm_ms_total'] / confirmed if confirmed else None
+        }
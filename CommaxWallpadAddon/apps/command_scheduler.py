@@ -0,0 +1,92 @@
+"""전송 큐(QUEUE)에서 다음에 보낼 명령을 고르는 스케줄러 모듈입니다.
+
+명령은 대상 기기(기기 이름 + deviceId)별 레인으로 나뉘고, 레인마다 확인되지 않은 명령은
+하나만 전송 중일 수 있습니다. 레인의 첫 명령 중 보낼 수 있는 것(처음 보내거나 재전송 시각이
+지난 것) 가운데 우선순위가 가장 높고, 같은 우선순위에서는 가장 오래전에 보낸 명령을 고릅니다.
+그래서 가스 차단 같은 긴급 명령이 먼저 나가고, 응답하지 않는 기기의 재전송이 다른 기기의
+명령을 막지 않고 번갈아 나갑니다. 기한(deadline)이 지난 명령은 보내지 않고 버립니다.
+"""
+
+from typing import Any, Dict, Hashable, List, Optional
+
+# 우선순위 (숫자가 작을수록 먼저 전송)
+PRIORITY_CRITICAL = 0  # 가스 차단, 엘리베이터 호출
+PRIORITY_HIGH = 1      # HA에서 들어온 사용자 명령
+PRIORITY_NORMAL = 2    # 웹 UI 패킷 전송
+PRIORITY_LOW = 3       # 일괄 전송 등 백그라운드 작업
+PRIORITIES = {
+    'critical': PRIORITY_CRITICAL,
+    'high': PRIORITY_HIGH,
+    'normal': PRIORITY_NORMAL,
+    'low': PRIORITY_LOW
+}
+# 안전과 관련되어 기한 없이 가장 먼저 보내는 기기
+CRITICAL_DEVICES = {'Gas', 'EV'}
+
+
+def parse_priority(value: Any) -> int:
+    """'critical'/'high'/'normal'/'low' 또는 0~3을 우선순위로 바꿉니다.
+
+    Raises:
+        ValueError: 알 수 없는 우선순위인 경우
+    """
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    if isinstance(value, int) and not isinstance(value, bool) and PRIORITY_CRITICAL <= value <= PRIORITY_LOW:
+        return value
+    raise ValueError(f"priority는 {', '.join(PRIORITIES)} 중 하나여야 합니다: {value}")
+
+
+class CommandScheduler:
+    """기기별 레인을 번갈아가며 다음 전송 명령을 고르는 클래스
+
+    Args:
+        controller: WallpadController 인스턴스 (retry_policy로 대상 기기를 찾는 데 사용)
+    """
+
+    def __init__(self, controller: Any) -> None:
+        self.controller = controller
+
+    def lane_of(self, item: Dict[str, Any]) -> Hashable:
+        """명령의 레인. 구조에서 찾은 (기기 이름, deviceId), 찾지 못하면 헤더 바이트"""
+        if 'retry_key' not in item:
+            item['retry_key'] = self.controller.retry_policy.key_for(item['sendcmd'])
+        return item['retry_key'] or ('', item['sendcmd'][:2])
+
+    def lane_heads(self, queue: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """레인별로 큐에서 가장 먼저 들어온 명령 (큐 순서 유지)"""
+        heads: Dict[Hashable, Dict[str, Any]] = {}
+        for item in queue:
+            heads.setdefault(self.lane_of(item), item)
+        return list(heads.values())
+
+    @staticmethod
+    def is_due(item: Dict[str, Any], now: float) -> bool:
+        return item['count'] == 0 or now >= item.get('next_send_at', 0.0)
+
+    @staticmethod
+    def priority_for(device: Optional[str]) -> int:
+        """HA 명령의 기기별 우선순위"""
+        return PRIORITY_CRITICAL if device in CRITICAL_DEVICES else PRIORITY_HIGH
+
+    @staticmethod
+    def is_expired(item: Dict[str, Any], now: float) -> bool:
+        """기한이 지났고 아직 확인되지 않은 명령인지 확인합니다."""
+        deadline = item.get('deadline')
+        return deadline is not None and now > deadline and 'confirmed_at' not in item
+
+    def select(self, queue: List[Dict[str, Any]], now: float) -> Optional[Dict[str, Any]]:
+        """지금 보낼 명령을 고릅니다. 보낼 명령이 없으면 None
+
+        우선순위가 높은 명령이 먼저이고, 같은 우선순위에서는 처음 보내는 명령이 재전송보다 먼저,
+        재전송끼리는 마지막 전송이 오래된 순서입니다.
+        """
+        due = [item for item in self.lane_heads(queue) if self.is_due(item, now)]
+        if not due:
+            return None
+        return min(due, key=lambda item: (item.get('priority', PRIORITY_HIGH), item.get('last_sent_at', float('-inf'))))
+
+    def next_wakeup(self, queue: List[Dict[str, Any]], now: float) -> Optional[float]:
+        """레인의 첫 명령 중 가장 이른 전송 시각. 큐가 비었으면 None"""
+        times = [now if item['count'] == 0 else item.get('next_send_at', now) for item in self.lane_heads(queue)]
+        return min(times) if times else None
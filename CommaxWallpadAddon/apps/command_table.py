@@ -0,0 +1,162 @@
+"""HA 명령 토픽별 명령 패킷을 미리 만들어 두는 모듈입니다.
+
+구조를 불러오거나 기기를 검색할 때 (기기 토픽, action)마다 값별 완성 패킷(체크섬 포함)을 만들어 두고,
+온도나 대기전력 차단값처럼 한 바이트만 바뀌는 명령은 나머지 바이트와 체크섬 니블 합을 미리 계산한
+템플릿(CommandTemplate)으로 만듭니다. 명령을 받을 때는 딕셔너리 조회나 템플릿 채우기만 하므로
+YAML 구조를 다시 뒤지지 않습니다.
+"""
+
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from .utils import checksum
+
+
+class CommandTemplate:
+    """한 바이트(position)만 바뀌는 7바이트 명령 패킷 템플릿
+
+    checksum()은 각 바이트의 상위/하위 니블 합으로 계산되므로, 바뀌지 않는 바이트의 니블 합을
+    미리 구해 두면 값 하나만 더해 체크섬을 만들 수 있습니다.
+    """
+
+    __slots__ = ('prefix', 'suffix', 'high_sum', 'low_sum')
+
+    def __init__(self, packet: bytes, position: int) -> None:
+        fixed = bytes(packet[:position]) + bytes(packet[position + 1:7])
+        self.prefix = bytes(packet[:position]).hex().upper()
+        self.suffix = bytes(packet[position + 1:7]).hex().upper()
+        self.high_sum = sum(b >> 4 for b in fixed)
+        self.low_sum = sum(b & 0x0F for b in fixed)
+
+    def build(self, value: int) -> str:
+        """value(0~255)를 채우고 체크섬을 붙인 16진수 패킷을 반환합니다."""
+        low = self.low_sum + (value & 0x0F)
+        high = (self.high_sum + (value >> 4) + low // 16) % 16
+        return f'{self.prefix}{value:02X}{self.suffix}{high:X}{low % 16:X}'
+
+
+class ActionSpec(NamedTuple):
+    """HA action 하나로 명령 패킷을 만드는 방법
+
+    Attributes:
+        fixed: 항상 같은 값을 쓰는 필드 {필드 이름: 구조의 값 이름}
+        field: HA 값에 따라 바뀌는 필드 이름
+        values: HA 값 → 구조의 값 이름
+        default: values에 없는 HA 값일 때 쓸 구조의 값 이름 (None이면 거부)
+        template: 값을 그대로 채우는 필드 이름 (온도, 차단값 등)
+        param: 템플릿 값 해석 방법 ('temperature': 10진수 온도를 BCD로, 'hex': 16진수)
+    """
+    fixed: Dict[str, str]
+    field: Optional[str] = None
+    values: Dict[str, str] = {}
+    default: Optional[str] = None
+    template: Optional[str] = None
+    param: Optional[str] = None
+
+
+# 기기별로 받을 수 있는 HA 명령 action ('*'는 action과 관계없이 누르면 동작하는 버튼형 기기)
+COMMAND_SPECS: Dict[str, Dict[str, ActionSpec]] = {
+    'Light': {
+        'power': ActionSpec({}, 'power', {'ON': 'on'}, 'off'),
+        #TODO: dimmer 추가
+    },
+    'LightBreaker': {
+        'power': ActionSpec({'commandType': 'power'}, 'power', {'ON': 'on'}, 'off'),
+    },
+    'Outlet': {
+        'power': ActionSpec({'commandType': 'power'}, 'power', {'ON': 'on'}, 'off'),
+        'ecomode': ActionSpec({'commandType': 'ecomode'}, 'power', {'ON': 'on'}, 'off'),
+        'setCutoff': ActionSpec({'commandType': 'setCutoff'}, template='cutoffValue', param='hex'),
+    },
+    'Gas': {
+        # 가스밸브는 잠그는 명령만 있습니다
+        '*': ActionSpec({}, 'power', {'PRESS': 'off', 'ON': 'off'}),
+    },
+    'Thermo': {
+        'power': ActionSpec({'commandType': 'power'}, 'value', {'heat': 'on'}, 'off'),
+        'setTemp': ActionSpec({'commandType': 'change'}, template='value', param='temperature'),
+    },
+    'Fan': {
+        'power': ActionSpec({'commandType': 'power'}, 'value', {'ON': 'on'}, 'off'),
+        'speed': ActionSpec({'commandType': 'setSpeed'}, 'value', {'low': 'low', 'medium': 'medium', 'high': 'high'}),
+    },
+    'EV': {
+        '*': ActionSpec({'unknown1': 'fixed', 'unknown2': 'fixed', 'unknown3': 'fixed'},
+                        'power', {'PRESS': 'on', 'ON': 'on'}),
+    },
+}
+
+
+class TopicRoute(NamedTuple):
+    """HA 명령 토픽 하나가 가리키는 기기와 미리 만든 명령 패킷
+
+    Attributes:
+        device: 기기 이름
+        device_id: 기기 번호
+        packets: HA 값 → 체크섬까지 붙은 명령 패킷
+        default: packets에 없는 값일 때 보낼 패킷 (None이면 거부)
+        template: 값을 채워 만드는 명령의 템플릿
+        param: 템플릿 값 해석 방법
+    """
+    device: str
+    device_id: int
+    packets: Dict[str, str]
+    default: Optional[str] = None
+    template: Optional[CommandTemplate] = None
+    param: Optional[str] = None
+
+
+def _field_value(command: Dict[str, Any], field: str, value_name: str) -> Tuple[int, int]:
+    """명령 구조에서 field의 위치와 value_name에 해당하는 바이트 값을 찾습니다."""
+    position = str(command['fieldPositions'][field])
+    return int(position), int(command['structure'][position]['values'][value_name], 16)
+
+
+def compile_action(device: str, command: Dict[str, Any], spec: ActionSpec, device_id: int) -> TopicRoute:
+    """action 하나의 값별 패킷과 템플릿을 만듭니다.
+
+    Raises:
+        KeyError: 구조에 spec이 요구하는 필드나 값이 없는 경우
+    """
+    base = bytearray(7)
+    base[0] = int(command['header'], 16)
+    base[int(command['fieldPositions']['deviceId'])] = device_id
+    for field, value_name in spec.fixed.items():
+        position, byte = _field_value(command, field, value_name)
+        base[position] = byte
+
+    def packet_for(value_name: str) -> str:
+        packet = bytearray(base)
+        position, byte = _field_value(command, spec.field or '', value_name)
+        packet[position] = byte
+        return checksum(packet.hex().upper()) or ''
+
+    packets = {ha_value: packet_for(value_name) for ha_value, value_name in spec.values.items()}
+    default = packet_for(spec.default) if spec.default else None
+    template = None
+    if spec.template:
+        template = CommandTemplate(bytes(base), int(command['fieldPositions'][spec.template]))
+    return TopicRoute(device, device_id, packets, default, template, spec.param)
+
+
+def build_topic_routes(device_structure: Optional[Dict[str, Any]], device_list: Optional[Dict[str, Any]],
+                       logger: Any = None) -> Dict[Tuple[str, str], TopicRoute]:
+    """기기 목록의 모든 기기와 action에 대해 (기기 토픽, action) → TopicRoute 표를 만듭니다.
+
+    구조에 필요한 필드나 값이 없는 action은 건너뛰고 경고를 남깁니다.
+    """
+    routes: Dict[Tuple[str, str], TopicRoute] = {}
+    structure = device_structure or {}
+    for device, info in (device_list or {}).items():
+        specs = COMMAND_SPECS.get(device)
+        command = structure.get(device, {}).get('command')
+        if not specs or not command:
+            continue
+        for action, spec in specs.items():
+            for idx in range(1, int(info.get('count', 0)) + 1):
+                try:
+                    routes[(f'{device}{idx}', action)] = compile_action(device, command, spec, idx)
+                except (KeyError, ValueError, TypeError) as e:
+                    if logger:
+                        logger.warning(f'{device} {action} 명령을 만들 수 없어 건너뜁니다. 구조에 없는 항목: {e}')
+                    break
+    return routes
@@ -0,0 +1,213 @@
+"""EW11 복구(텔넷 재부팅)를 메인 루프와 별도의 태스크에서 처리하는 모듈입니다.
+
+EW11에서 신호가 끊기면 먼저 가벼운 TCP 접속으로 EW11에 닿는지 확인하고, 닿으면 텔넷으로
+재부팅합니다. 재부팅 후에도 신호가 돌아오지 않으면 시도 간격을 지수적으로 늘리고,
+연속 실패가 failure_threshold번에 이르면 회로 차단기를 열어 open_cooldown 동안 재부팅을
+멈춥니다. 쿨다운이 지나면 한 번만 다시 시도해 보고(half-open), 신호가 돌아오면 초기화합니다.
+재부팅과 그 뒤의 대기는 모두 이 태스크 안에서 일어나므로 명령 전송과 패킷 분석을 막지 않습니다.
+"""
+
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+import telnetlib3  # type: ignore
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class EW11Supervisor:
+    """EW11 신호를 감시하고 백오프와 회로 차단기로 재부팅을 관리하는 클래스
+
+    Args:
+        controller: WallpadController 인스턴스
+        silence_threshold (float): 이 시간(초) 동안 신호가 없으면 복구를 시도 (elfin_reboot_interval)
+        use_auto_reboot (bool): False면 재부팅하지 않고 상태만 알립니다
+        host (str): EW11 주소
+        username (str): EW11 관리자 아이디
+        password (str): EW11 관리자 비밀번호
+        probe_timeout (float): TCP 접속 확인 제한 시간 (초)
+        reboot_grace (float): 재부팅 후 다음 판단까지 기다릴 시간 (초)
+        max_backoff (float): 시도 간격의 상한 (초)
+        failure_threshold (int): 회로 차단기를 여는 연속 실패 횟수
+        open_cooldown (float): 회로 차단기가 열린 뒤 다시 시도하기까지의 시간 (초)
+        check_interval (float): 감시 주기 (초)
+    """
+
+    TELNET_PORT = 23
+
+    def __init__(self,
+                 controller: Any,
+                 silence_threshold: float = 60.0,
+                 use_auto_reboot: bool = True,
+                 host: str = '',
+                 username: str = '',
+                 password: str = '',
+                 probe_timeout: float = 2.0,
+                 reboot_grace: float = 10.0,
+                 max_backoff: float = 900.0,
+                 failure_threshold: int = 5,
+                 open_cooldown: float = 1800.0,
+                 check_interval: float = 1.0) -> None:
+        self.controller = controller
+        self.logger = controller.logger
+        self.silence_threshold = silence_threshold
+        self.use_auto_reboot = use_auto_reboot
+        self.host = host
+        self.username = username
+        self.password = password
+        self.probe_timeout = probe_timeout
+        self.reboot_grace = reboot_grace
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.open_cooldown = open_cooldown
+        self.check_interval = check_interval
+
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.attempts = 0
+        self.next_attempt_at = 0.0
+        self.opened_at: Optional[float] = None
+        self.last_probe: Optional[bool] = None
+        self.notified = False
+
+    @classmethod
+    def from_config(cls, controller: Any) -> 'EW11Supervisor':
+        elfin = controller.config.get('elfin', {})
+        return cls(
+            controller,
+            silence_threshold=float(elfin.get('elfin_reboot_interval', 60)),
+            use_auto_reboot=bool(elfin.get('use_auto_reboot', True)),
+            host=elfin.get('elfin_server') or '',
+            username=elfin.get('elfin_id') or '',
+            password=elfin.get('elfin_password') or ''
+        )
+
+    def silence(self) -> float:
+        """마지막으로 EW11 신호를 받은 뒤 지난 시간 (초)"""
+        return (time.time_ns() - self.controller.COLLECTDATA['last_recv_time']) / 1e9
+
+    def backoff(self) -> float:
+        """연속 실패 횟수에 따른 다음 시도까지의 간격 (초)"""
+        return min(self.silence_threshold * 2 ** max(self.failures - 1, 0), self.max_backoff)
+
+    async def probe(self) -> bool:
+        """EW11 텔넷 포트에 TCP로 접속되는지 확인합니다."""
+        if not self.host:
+            return False
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.TELNET_PORT), self.probe_timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    async def reboot(self) -> bool:
+        """텔넷으로 EW11에 재부팅 명령을 보냅니다. 보냈으면 True"""
+        self.logger.info(f"텔넷으로 EW11 재부팅 시도: {self.host}")
+        try:
+            async with asyncio.timeout(10):
+                reader, writer = await telnetlib3.open_connection(
+                    self.host,
+                    connect_minwait=0.1,
+                    connect_maxwait=1.0
+                )
+                await reader.readuntil(b"login: ")
+                writer.write(self.username + '\n')
+                await reader.readuntil(b"password: ")
+                writer.write(self.password + '\n')
+                writer.write('Restart\n')
+                await writer.drain()
+                writer.close()
+            self.logger.info("EW11 재부팅 명령 전송 완료.")
+            return True
+        except asyncio.TimeoutError:
+            self.logger.error('텔넷 연결 시간 초과')
+        except Exception as e:
+            self.logger.error(f'텔넷 연결/재부팅 중 오류 발생: {str(e)}')
+        return False
+
+    async def _update_availability(self, silence: float) -> None:
+        """오래 신호가 없으면 HA에 offline을 알리고, 더 길어지면 알림을 보냅니다."""
+        controller = self.controller
+        if silence > self.silence_threshold * 10 and controller.is_available:
+            await controller.publish_to_ha(f"{controller.HA_TOPIC}/status", "offline")
+            controller.is_available = False
+        if (controller.elfin_unavailable_notification_enabled and not self.notified
+                and silence > self.silence_threshold * 20):
+            self.notified = True
+            self.logger.error('EW11 응답 없음. HA로 알림을 보냅니다.')
+            controller.notification_queue.enqueue(
+                title='[Commax Wallpad Addon] EW11 점검 및 재시작 필요',
+                message=f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] EW11에서 응답이 없습니다. EW11 상태를 점검 후 애드온을 재시작 해주세요.'
+            )
+
+    async def check(self, now: Optional[float] = None) -> None:
+        """감시 한 단계: 신호가 돌아왔으면 초기화하고, 끊겼으면 필요할 때 복구를 시도합니다."""
+        now = time.monotonic() if now is None else now
+        silence = self.silence()
+        if silence < self.silence_threshold:
+            if self.failures or self.state != CIRCUIT_CLOSED:
+                self.logger.info(f'EW11 신호가 돌아왔습니다. (복구 시도 {self.failures}회)')
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self.next_attempt_at = 0.0
+            self.opened_at = None
+            self.notified = False
+            return
+
+        await self._update_availability(silence)
+        if not self.use_auto_reboot or now < self.next_attempt_at:
+            return
+        if self.state == CIRCUIT_OPEN:
+            if self.opened_at is not None and now - self.opened_at < self.open_cooldown:
+                return
+            self.state = CIRCUIT_HALF_OPEN
+            self.logger.info('EW11 재부팅 회로 차단기 반열림: 한 번 더 재부팅을 시도합니다.')
+
+        self.attempts += 1
+        self.controller.elfin_reboot_count += 1
+        self.logger.warning(f'{silence:.0f}초간 신호를 받지 못했습니다. EW11 복구를 시도합니다. '
+                            f'(연속 {self.failures + 1}회째)')
+        self.last_probe = await self.probe()
+        if self.last_probe:
+            await self.reboot()
+        else:
+            self.logger.warning(f'EW11({self.host or "주소 미설정"})에 접속할 수 없습니다. 네트워크나 전원을 확인해주세요.')
+
+        # 신호가 돌아오면 다음 check에서 초기화되므로, 여기서는 일단 실패로 셉니다
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = CIRCUIT_OPEN
+            self.opened_at = now
+            self.logger.error(f'EW11 복구가 {self.failures}회 연속 실패했습니다. '
+                              f'{self.open_cooldown / 60:.0f}분 동안 재부팅을 멈춥니다.')
+        self.next_attempt_at = now + self.reboot_grace + self.backoff()
+
+    async def run(self) -> None:
+        """감시 루프"""
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                self.logger.error(f'EW11 감시 중 오류: {e}')
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'attempts': self.attempts,
+            'silence': round(self.silence(), 1),
+            'last_probe': self.last_probe,
+            'next_attempt_in': round(max(self.next_attempt_at - now, 0.0), 1) if self.failures else None
+        }
@@ -0,0 +1,278 @@
+"""상태 패킷 필드의 해석 방법(codec)을 YAML 선언에서 읽어 헤더별 디코더로 컴파일하는 모듈입니다.
+
+state 구조의 필드에 ``decode``로 출력 이름과 codec을 선언합니다::
+
+    "1":
+      name: power
+      values:
+        "on": "01"
+        "off": "00"
+      decode:
+        power:
+          type: enum
+          map:
+            "on": "ON"
+          default: "OFF"
+
+codec 종류:
+    - enum: 바이트 값을 values의 값 이름으로 바꾸고, map이 있으면 다시 출력 값으로 바꿉니다.
+      (values/map에 없는 값은 default)
+    - bcd: 10진수 자릿수를 그대로 쓴 바이트 (0x24 -> 24). length 바이트를 이어 읽습니다.
+    - scaled: 부호 없는 빅엔디언 정수. length 바이트를 읽어 scale을 곱하고 offset을 더합니다.
+    - hex: 바이트를 16진수 문자열로 ('23'). length 바이트를 이어 붙입니다.
+    - raw: 바이트 값 그대로
+
+bcd/scaled의 scale에는 숫자나 같은 state에 있는 설정 이름(예: wattage_scailing_factor)을 쓸 수 있고,
+``when: {stateType: wattage}``처럼 다른 필드가 특정 값일 때만 해석하게 할 수도 있습니다.
+컴파일하면 enum/1바이트 bcd/hex는 256칸 조회표가 되므로, 해석할 때 문자열 연산을 하지 않습니다.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# 0x00~0xFF의 BCD 해석값 (자릿수가 10 이상이면 None)
+BCD_TABLE: Tuple[Optional[int], ...] = tuple(
+    (b >> 4) * 10 + (b & 0x0F) if (b >> 4) < 10 and (b & 0x0F) < 10 else None for b in range(256)
+)
+HEX_TABLE: Tuple[str, ...] = tuple(f'{b:02X}' for b in range(256))
+
+# decode 선언이 없는 예전 사용자 구조(packet_structures_custom.yaml)를 위한 기본 codec
+# {기기: {필드 이름: {출력 이름: codec}}}
+LEGACY_FIELD_CODECS: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {
+    'Light': {
+        'power': {'power': {'type': 'enum', 'map': {'on': 'ON'}, 'default': 'OFF'}},
+    },
+    'LightBreaker': {
+        'power': {'power': {'type': 'enum', 'map': {'on': 'ON'}, 'default': 'OFF'}},
+    },
+    'Thermo': {
+        'power': {
+            'mode': {'type': 'enum', 'map': {'off': 'off'}, 'default': 'heat'},
+            'action': {'type': 'enum', 'map': {'heating': 'heating'}, 'default': 'idle'},
+        },
+        'currentTemp': {'current_temp': {'type': 'bcd'}},
+        'targetTemp': {'target_temp': {'type': 'bcd'}},
+    },
+    'Gas': {
+        'power': {'power': {'type': 'enum', 'map': {'on': 'ON'}, 'default': 'OFF'}},
+    },
+    'Outlet': {
+        'power': {
+            'power': {'type': 'enum', 'map': {'on': 'ON', 'on_with_eco': 'ON'}, 'default': 'OFF'},
+            'eco': {'type': 'enum', 'map': {'on_with_eco': True, 'off_with_eco': True}, 'default': False},
+        },
+        'data1': {
+            'watt': {'type': 'bcd', 'length': 3, 'scale': 'wattage_scailing_factor', 'scale_default': 0.1,
+                     'when': {'stateType': 'wattage'}},
+            'cutoff': {'type': 'bcd', 'length': 3, 'scale': 'ecomode_scailing_factor', 'scale_default': 1,
+                       'when': {'stateType': 'ecomode'}},
+        },
+    },
+    'Fan': {
+        'power': {'power': {'type': 'enum', 'map': {'off': 'OFF'}, 'default': 'ON'}},
+        'speed': {'speed': {'type': 'enum', 'default': 'low'}},
+    },
+    'EV': {
+        'power': {'power': {'type': 'enum', 'map': {'on': 'ON'}, 'default': 'OFF'}},
+        'floor': {'floor': {'type': 'hex'}},
+    },
+}
+
+
+class CodecError(ValueError):
+    """codec 선언이 잘못된 경우"""
+
+
+class CodecDeclaration(NamedTuple):
+    """state 필드 하나에 선언된 출력 codec
+
+    Attributes:
+        output (str): 출력 이름
+        spec (Dict[str, Any]): codec 선언
+        position (int): 필드 위치
+        values (Dict[str, int]): 필드의 {값 이름: 바이트 값}
+        condition (Optional[Tuple[int, int]]): when 조건 (위치, 바이트 값)
+        where (str): 로그용 위치 이름 (기기.state.위치.출력)
+    """
+    output: str
+    spec: Dict[str, Any]
+    position: int
+    values: Dict[str, int]
+    condition: Optional[Tuple[int, int]]
+    where: str
+
+
+def resolve_scale(spec: Dict[str, Any], packet: Dict[str, Any], logger: Any, where: str) -> float:
+    """scale 선언(숫자 또는 state 설정 이름)을 숫자로 바꿉니다. 0이거나 해석할 수 없으면 scale_default"""
+    scale = spec.get('scale', 1)
+    default = float(spec.get('scale_default', 1))
+    if isinstance(scale, str) and scale in packet:
+        scale = packet[scale]
+    try:
+        value = float(scale)
+    except (TypeError, ValueError):
+        if logger:
+            logger.warning(f'{where}의 scale({scale})을 해석할 수 없습니다. 기본값인 {default}로 대체합니다.')
+        return default
+    if value == 0:
+        if logger:
+            logger.warning(f'{where}의 scale이 0으로 해석되고있습니다. 기본값인 {default}로 대체합니다.')
+        return default
+    return value
+
+
+def compile_codec(spec: Dict[str, Any], position: int, values: Dict[str, int],
+                  packet: Dict[str, Any], logger: Any = None, where: str = '') -> Callable[[bytes], Any]:
+    """codec 선언 하나를 frame(bytes) -> 값 함수로 컴파일합니다.
+
+    Raises:
+        CodecError: 알 수 없는 codec이거나 길이가 맞지 않는 경우
+    """
+    kind = spec.get('type')
+    length = int(spec.get('length', 1))
+    if length < 1 or position + length > 7:
+        raise CodecError(f'{where}: 위치 {position}에서 {length}바이트를 읽을 수 없습니다.')
+    end = position + length
+
+    if kind == 'enum':
+        if length != 1:
+            raise CodecError(f'{where}: enum은 1바이트만 해석할 수 있습니다.')
+        mapping = spec.get('map')
+        default = spec.get('default')
+        table: List[Any] = [default] * 256
+        # 같은 바이트에 이름이 여럿이면 먼저 선언된 이름을 씁니다
+        for name, byte in reversed(list(values.items())):
+            table[byte] = name if mapping is None else mapping.get(name, default)
+        lookup = tuple(table)
+        return lambda frame: lookup[frame[position]]
+
+    if kind == 'bcd':
+        scale = resolve_scale(spec, packet, logger, where) if 'scale' in spec else None
+        if length == 1:
+            if scale is None:
+                return lambda frame: BCD_TABLE[frame[position]]
+            scaled = tuple(None if v is None else v * scale for v in BCD_TABLE)
+            return lambda frame: scaled[frame[position]]
+
+        def decode_bcd(frame: bytes) -> Optional[float]:
+            value = 0
+            for byte in frame[position:end]:
+                digits = BCD_TABLE[byte]
+                if digits is None:
+                    return None
+                value = value * 100 + digits
+            return value if scale is None else value * scale
+        return decode_bcd
+
+    if kind == 'scaled':
+        scale = resolve_scale(spec, packet, logger, where)
+        offset = float(spec.get('offset', 0))
+        return lambda frame: int.from_bytes(frame[position:end], 'big') * scale + offset
+
+    if kind == 'hex':
+        if length == 1:
+            return lambda frame: HEX_TABLE[frame[position]]
+        return lambda frame: ''.join(HEX_TABLE[byte] for byte in frame[position:end])
+
+    if kind == 'raw':
+        return lambda frame: frame[position]
+
+    raise CodecError(f'{where}: 알 수 없는 codec 종류입니다: {kind}')
+
+
+class StateDecoder:
+    """상태 패킷 헤더 하나에 대한 디코더
+
+    Attributes:
+        device (str): 기기 이름
+        device_id_position (Optional[int]): deviceId 위치 (없으면 항상 1번 기기)
+        fields: (출력 이름, 해석 함수, 조건) 목록. 조건은 (위치, 바이트 값) 또는 None
+    """
+
+    __slots__ = ('device', 'device_id_position', 'fields')
+
+    def __init__(self, device: str, device_id_position: Optional[int],
+                 fields: List[Tuple[str, Callable[[bytes], Any], Optional[Tuple[int, int]]]]) -> None:
+        self.device = device
+        self.device_id_position = device_id_position
+        self.fields = tuple(fields)
+
+    def decode(self, frame: bytes) -> Tuple[int, Dict[str, Any]]:
+        """프레임에서 (기기 번호, {출력 이름: 값})을 읽습니다. 조건이 맞지 않는 출력은 None입니다."""
+        device_id = frame[self.device_id_position] if self.device_id_position is not None else 1
+        result: Dict[str, Any] = {}
+        for name, decode, condition in self.fields:
+            if condition is not None and frame[condition[0]] != condition[1]:
+                result[name] = None
+            else:
+                result[name] = decode(frame)
+        return device_id, result
+
+
+def iter_codec_declarations(device_name: str, packet: Dict[str, Any],
+                            value_tables: Dict[Tuple[str, str, int], Dict[str, int]],
+                            logger: Any = None) -> Iterator[CodecDeclaration]:
+    """state 패킷 구조에서 해석할 codec 선언을 위치 순서대로 내보냅니다.
+
+    decode 선언이 하나도 없으면 LEGACY_FIELD_CODECS의 기본 선언을 필드 이름으로 찾아 씁니다.
+    형식이 잘못된 선언(딕셔너리가 아니거나 when 조건을 찾을 수 없는 경우)은 로그를 남기고 건너뜁니다.
+    """
+    structure = packet.get('structure', {})
+    field_positions = {field.get('name'): int(pos) for pos, field in structure.items()}
+    declared = any(isinstance(field.get('decode'), dict) for field in structure.values())
+    legacy = LEGACY_FIELD_CODECS.get(device_name, {})
+
+    for pos, field in structure.items():
+        position = int(pos)
+        codecs = field.get('decode') if declared else legacy.get(field.get('name', ''))
+        if not isinstance(codecs, dict):
+            continue
+        values = value_tables.get((device_name, 'state', position), {})
+        for output, spec in codecs.items():
+            where = f'{device_name}.state.{pos}.{output}'
+            try:
+                if not isinstance(spec, dict):
+                    raise CodecError(f'{where}: codec 선언은 딕셔너리여야 합니다.')
+                condition = None
+                when = spec.get('when')
+                if when:
+                    (when_field, when_value), = dict(when).items()
+                    when_position = field_positions[when_field]
+                    when_byte = value_tables[(device_name, 'state', when_position)][str(when_value)]
+                    condition = (when_position, when_byte)
+            except (CodecError, KeyError, TypeError, ValueError) as e:
+                if logger:
+                    logger.error(f'상태 필드 codec을 컴파일할 수 없습니다 ({where}): {e}')
+                continue
+            yield CodecDeclaration(str(output), spec, position, values, condition, where)
+
+
+def compile_state_decoder(device_name: str, packet: Dict[str, Any],
+                          value_tables: Dict[Tuple[str, str, int], Dict[str, int]],
+                          logger: Any = None) -> Optional[StateDecoder]:
+    """state 패킷 구조의 decode 선언으로 디코더를 만듭니다. 해석할 필드가 없으면 None
+
+    잘못된 선언은 로그를 남기고 그 출력만 건너뜁니다.
+    """
+    fields: List[Tuple[str, Callable[[bytes], Any], Optional[Tuple[int, int]]]] = []
+    for declaration in iter_codec_declarations(device_name, packet, value_tables, logger):
+        try:
+            decode = compile_codec(declaration.spec, declaration.position, declaration.values,
+                                   packet, logger, declaration.where)
+        except (CodecError, KeyError, TypeError, ValueError) as e:
+            if logger:
+                logger.error(f'상태 필드 codec을 컴파일할 수 없습니다 ({declaration.where}): {e}')
+            continue
+        fields.append((declaration.output, decode, declaration.condition))
+
+    if not fields:
+        return None
+    device_id_position = state_device_id_position(packet)
+    return StateDecoder(device_name, device_id_position, fields)
+
+
+def state_device_id_position(packet: Dict[str, Any]) -> Optional[int]:
+    """state 패킷 구조에서 deviceId 필드의 위치를 찾습니다. 없으면 None"""
+    for pos, field in packet.get('structure', {}).items():
+        if field.get('name') == 'deviceId':
+            return int(pos)
+    return None
@@ -0,0 +1,271 @@
+"""기기 상태 값(전력, 온도, 전원 등)의 최근 추이를 메모리에 보관하는 시계열 저장소 모듈입니다.
+
+시계열 하나는 세 단계의 고정 크기 링 버퍼로 이루어집니다.
+    - raw: 받은 값 그대로
+    - minute: 1분 단위 평균/최소/최대
+    - hour: 1시간 단위 평균/최소/최대
+값은 ``array('d')``에 저장하므로 시계열마다 메모리 사용량이 정해져 있고, 버퍼가 차면
+가장 오래된 값부터 덮어씁니다. 별도의 데이터베이스 없이 웹UI 차트가 바로 읽을 수 있습니다.
+"""
+
+import math
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+TIERS = ('raw', 'minute', 'hour')
+# 단계별 구간 길이 (초). raw는 구간으로 묶지 않습니다.
+TIER_SECONDS = {'minute': 60, 'hour': 3600}
+
+# 숫자로 기록할 상태 문자열 (전원/동작 상태)
+STATE_VALUES: Dict[str, float] = {
+    'ON': 1.0, 'OFF': 0.0,
+    'heat': 1.0, 'off': 0.0,
+    'heating': 1.0, 'idle': 0.0,
+}
+
+
+def to_number(value: Any) -> Optional[float]:
+    """상태 값을 기록할 숫자로 바꿉니다. 기록할 수 없는 값이면 None"""
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        return STATE_VALUES.get(value)
+    return None
+
+
+class Ring:
+    """열(column)마다 array('d')를 쓰는 고정 크기 링 버퍼"""
+
+    __slots__ = ('capacity', 'columns', 'head', 'size')
+
+    def __init__(self, capacity: int, width: int) -> None:
+        self.capacity = capacity
+        self.columns = [array('d', bytes(8 * capacity)) for _ in range(width)]
+        self.head = 0  # 다음에 쓸 위치
+        self.size = 0
+
+    def append(self, *row: float) -> None:
+        for column, value in zip(self.columns, row):
+            column[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def oldest(self) -> Optional[float]:
+        """가장 오래된 행의 시각 (비어 있으면 None)"""
+        if not self.size:
+            return None
+        return self.columns[0][(self.head - self.size) % self.capacity]
+
+    def rows(self, start: float, end: float) -> List[Tuple[float, ...]]:
+        """시각이 [start, end]인 행을 오래된 순서로 반환합니다."""
+        result = []
+        first = self.head - self.size
+        for i in range(first, self.head):
+            row = tuple(column[i % self.capacity] for column in self.columns)
+            if start <= row[0] <= end:
+                result.append(row)
+        return result
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self.columns)
+
+
+class Bucket:
+    """집계 중인 구간 하나 (시작 시각, 합계, 개수, 최소, 최대)"""
+
+    __slots__ = ('start', 'total', 'count', 'low', 'high')
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.total = 0.0
+        self.count = 0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def add(self, total: float, count: int, low: float, high: float) -> None:
+        self.total += total
+        self.count += count
+        self.low = min(self.low, low)
+        self.high = max(self.high, high)
+
+    def row(self) -> Tuple[float, float, float, float]:
+        return (self.start, self.total / self.count, self.low, self.high)
+
+
+class Series:
+    """상태 값 하나(예: Outlet1/watt)의 3단계 시계열"""
+
+    __slots__ = ('raw', 'minute', 'hour', 'buckets', 'last')
+
+    def __init__(self, raw_points: int, minute_points: int, hour_points: int) -> None:
+        self.raw = Ring(raw_points, 2)          # 시각, 값
+        self.minute = Ring(minute_points, 4)    # 구간 시작, 평균, 최소, 최대
+        self.hour = Ring(hour_points, 4)
+        # 아직 끝나지 않은 1분/1시간 구간
+        self.buckets: Dict[str, Optional[Bucket]] = {'minute': None, 'hour': None}
+        self.last: Optional[Tuple[float, float]] = None
+
+    def record(self, timestamp: float, value: float) -> None:
+        self.raw.append(timestamp, value)
+        self.last = (timestamp, value)
+        self._aggregate('minute', timestamp, value, 1, value, value)
+
+    def _aggregate(self, tier: str, timestamp: float, total: float, count: int, low: float, high: float) -> None:
+        start = timestamp - timestamp % TIER_SECONDS[tier]
+        bucket = self.buckets[tier]
+        if bucket is not None and bucket.start != start:
+            self._close(tier, bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self.buckets[tier] = Bucket(start)
+        bucket.add(total, count, low, high)
+
+    def _close(self, tier: str, bucket: Bucket) -> None:
+        """끝난 구간을 링 버퍼에 넣고, 1분 구간은 1시간 구간에 더합니다."""
+        getattr(self, tier).append(*bucket.row())
+        if tier == 'minute':
+            self._aggregate('hour', bucket.start, bucket.total, bucket.count, bucket.low, bucket.high)
+
+    def ring(self, tier: str) -> Ring:
+        return getattr(self, tier)
+
+    def query(self, tier: str, start: float, end: float) -> Dict[str, List[float]]:
+        """단계 하나의 [start, end] 구간 값을 열 단위로 반환합니다. 집계 중인 구간도 포함합니다."""
+        rows = self.ring(tier).rows(start, end)
+        if tier == 'raw':
+            return {'t': [row[0] for row in rows], 'value': [row[1] for row in rows]}
+        pending = [self.buckets[tier]]
+        minute = self.buckets['minute']
+        if tier == 'hour' and minute is not None:
+            # 집계 중인 1분 구간까지 더한 현재 1시간 구간
+            hour = pending.pop()
+            current = Bucket(minute.start - minute.start % TIER_SECONDS['hour'])
+            if hour is not None and hour.start == current.start:
+                current.add(hour.total, hour.count, hour.low, hour.high)
+            else:
+                pending.append(hour)
+            current.add(minute.total, minute.count, minute.low, minute.high)
+            pending.append(current)
+        for bucket in pending:
+            if bucket is not None and bucket.count and start <= bucket.start <= end:
+                rows.append(bucket.row())
+        return {
+            't': [row[0] for row in rows],
+            'value': [round(row[1], 3) for row in rows],
+            'min': [row[2] for row in rows],
+            'max': [row[3] for row in rows]
+        }
+
+    def nbytes(self) -> int:
+        return self.raw.nbytes() + self.minute.nbytes() + self.hour.nbytes()
+
+
+class HistoryStore:
+    """기기 상태 값의 시계열을 보관하는 클래스
+
+    Args:
+        raw_points (int): 시계열마다 보관할 원본 값 개수
+        minute_points (int): 1분 구간 개수 (기본값 1440 = 24시간)
+        hour_points (int): 1시간 구간 개수 (기본값 720 = 30일)
+        max_series (int): 최대 시계열 개수. 넘으면 새 시계열은 기록하지 않습니다.
+        logger: 로거 (시계열 개수 초과를 한 번 알림)
+    """
+
+    def __init__(self,
+                 raw_points: int = 720,
+                 minute_points: int = 1440,
+                 hour_points: int = 720,
+                 max_series: int = 256,
+                 logger: Any = None) -> None:
+        self.raw_points = max(1, raw_points)
+        self.minute_points = max(1, minute_points)
+        self.hour_points = max(1, hour_points)
+        self.max_series = max_series
+        self.logger = logger
+        self.series: Dict[str, Series] = {}
+        self.dropped = 0
+
+    @classmethod
+    def from_config(cls, controller: Any) -> Optional['HistoryStore']:
+        settings = controller.config.get('history', {})
+        if not settings.get('enabled', True):
+            return None
+        return cls(
+            raw_points=int(settings.get('raw_points', 720)),
+            minute_points=int(settings.get('minute_points', 1440)),
+            hour_points=int(settings.get('hour_points', 720)),
+            logger=controller.logger
+        )
+
+    @staticmethod
+    def key(device_id: str, field: str) -> str:
+        return f'{device_id}/{field}'
+
+    def record(self, device_id: str, fields: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        """기기 하나(예: 'Outlet1')의 상태 값들을 기록합니다. 숫자로 바꿀 수 없는 값은 건너뜁니다."""
+        now = time.time() if timestamp is None else timestamp
+        for field, value in fields.items():
+            number = to_number(value)
+            if number is None:
+                continue
+            key = self.key(device_id, field)
+            series = self.series.get(key)
+            if series is None:
+                if len(self.series) >= self.max_series:
+                    if not self.dropped and self.logger:
+                        self.logger.warning(f'상태 기록 시계열이 {self.max_series}개를 넘어 {key}는 기록하지 않습니다.')
+                    self.dropped += 1
+                    continue
+                series = self.series[key] = Series(self.raw_points, self.minute_points, self.hour_points)
+            series.record(now, number)
+
+    def pick_tier(self, series: Series, start: float) -> str:
+        """start부터의 구간을 담고 있는 가장 촘촘한 단계를 고릅니다."""
+        for tier in TIERS:
+            ring = series.ring(tier)
+            oldest = ring.oldest()
+            if ring.size < ring.capacity or (oldest is not None and oldest <= start):
+                return tier
+        return TIERS[-1]
+
+    def query(self, device_id: str, field: str, tier: str = 'auto',
+              start: Optional[float] = None, end: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """시계열 하나를 조회합니다. 없는 시계열이면 None
+
+        Raises:
+            ValueError: 알 수 없는 단계인 경우
+        """
+        if tier != 'auto' and tier not in TIERS:
+            raise ValueError(f"tier는 auto, {', '.join(TIERS)} 중 하나여야 합니다: {tier}")
+        series = self.series.get(self.key(device_id, field))
+        if series is None:
+            return None
+        end = time.time() if end is None else end
+        start = 0.0 if start is None else start
+        if tier == 'auto':
+            tier = self.pick_tier(series, start)
+        return {'series': self.key(device_id, field), 'tier': tier, **series.query(tier, start, end)}
+
+    def catalog(self) -> List[Dict[str, Any]]:
+        """기록 중인 시계열 목록과 마지막 값을 반환합니다."""
+        result = []
+        for key, series in sorted(self.series.items()):
+            device_id, field = key.split('/', 1)
+            result.append({
+                'device': device_id,
+                'field': field,
+                'last': series.last[1] if series.last else None,
+                'last_time': series.last[0] if series.last else None
+            })
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'series': len(self.series),
+            'bytes': sum(series.nbytes() for series in self.series.values()),
+            'dropped': self.dropped,
+            'points': {'raw': self.raw_points, 'minute': self.minute_points, 'hour': self.hour_points}
+        }
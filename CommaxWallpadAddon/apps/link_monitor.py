@@ -0,0 +1,177 @@
+"""EW11/HA TCP 연결이 죽었는지 빠르게 알아채는 모듈입니다.
+
+- 소켓에는 TCP keepalive와 TCP_USER_TIMEOUT을 짧게 걸어, 상대가 사라진 반쯤 열린 연결을
+  커널이 몇 초 안에 끊도록 합니다.
+- 월패드는 버스 상태 패킷을 일정한 주기로 계속 내보내므로, 평소 수신 간격(EWMA)의 몇 배 동안
+  아무것도 오지 않으면 EW11 링크가 죽은 것으로 봅니다. (elfin_reboot_interval보다 훨씬 빠름)
+- 링크가 죽으면 HA에 offline을 알리고, 전송 큐의 명령을 실패로 끝내 버립니다.
+- 쓰기가 write_timeout 안에 끝나지 않거나 실패한 소켓은 닫아서 핸들러가 정리하게 합니다.
+"""
+
+import time
+import socket
+import asyncio
+from typing import Any, Dict, Optional
+
+LINK_UNKNOWN = 'unknown'
+LINK_ALIVE = 'alive'
+LINK_DEAD = 'dead'
+
+
+def set_tcp_keepalive(writer: asyncio.StreamWriter, idle: int = 3, interval: int = 1,
+                      count: int = 3, user_timeout_ms: int = 10_000) -> bool:
+    """소켓에 TCP keepalive(와 지원하면 TCP_USER_TIMEOUT)를 설정합니다. 설정했으면 True
+
+    idle초 동안 조용하면 interval초 간격으로 count번 확인하고, 응답이 없으면 커널이 연결을 끊습니다.
+    TCP_USER_TIMEOUT은 보낸 데이터가 그 시간 안에 확인되지 않을 때 연결을 끊습니다.
+    """
+    sock = writer.get_extra_info('socket')
+    if sock is None:
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval),
+                              ('TCP_KEEPCNT', count), ('TCP_USER_TIMEOUT', user_timeout_ms)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+    except OSError:
+        return False
+    return True
+
+
+class LinkMonitor:
+    """EW11 수신 주기로 링크 상태를 판단하고, 죽은 연결을 정리하는 클래스
+
+    Args:
+        controller: WallpadController 인스턴스
+        min_silence (float): 링크가 죽었다고 보는 최소 무수신 시간 (초)
+        max_silence (float): 학습 전이나 주기가 느릴 때 쓰는 최대 무수신 시간 (초)
+        cadence_multiplier (float): 평소 수신 간격의 몇 배를 넘으면 죽었다고 볼지
+        min_samples (int): 평소 수신 간격을 믿기 시작하는 표본 수
+        write_timeout (float): 소켓 쓰기(drain) 제한 시간 (초)
+        check_interval (float): 감시 주기 (초)
+    """
+
+    ALPHA = 0.1
+
+    def __init__(self,
+                 controller: Any,
+                 min_silence: float = 2.0,
+                 max_silence: float = 10.0,
+                 cadence_multiplier: float = 20.0,
+                 min_samples: int = 20,
+                 write_timeout: float = 2.0,
+                 check_interval: float = 0.5) -> None:
+        self.controller = controller
+        self.logger = controller.logger
+        self.min_silence = min_silence
+        self.max_silence = max_silence
+        self.cadence_multiplier = cadence_multiplier
+        self.min_samples = min_samples
+        self.write_timeout = write_timeout
+        self.check_interval = check_interval
+
+        self.state = LINK_UNKNOWN
+        self.last_seen: Optional[float] = None
+        self.gap_ewma: Optional[float] = None
+        self.samples = 0
+        self.dead_count = 0
+        self.shed_count = 0
+        self.dropped: Dict[str, int] = {'ha': 0, 'wallpad': 0}
+
+    @classmethod
+    def from_config(cls, controller: Any) -> 'LinkMonitor':
+        # 아무리 느린 버스라도 EW11 재부팅 판단보다 늦게 알아채지는 않도록 합니다
+        reboot_interval = float(controller.config.get('elfin', {}).get('elfin_reboot_interval', 60))
+        return cls(controller, max_silence=min(10.0, reboot_interval))
+
+    def silence_threshold(self) -> float:
+        """지금까지 학습한 수신 주기로 계산한 무수신 허용 시간 (초)"""
+        if self.gap_ewma is None or self.samples < self.min_samples:
+            return self.max_silence
+        return min(max(self.gap_ewma * self.cadence_multiplier, self.min_silence), self.max_silence)
+
+    def observe(self, now: Optional[float] = None) -> None:
+        """월패드에서 데이터를 받을 때마다 호출합니다."""
+        now = time.monotonic() if now is None else now
+        if self.last_seen is not None:
+            gap = now - self.last_seen
+            # 끊겼다 돌아온 간격은 평소 주기가 아니므로 학습하지 않습니다
+            if gap < self.silence_threshold():
+                self.gap_ewma = gap if self.gap_ewma is None else (1 - self.ALPHA) * self.gap_ewma + self.ALPHA * gap
+                self.samples += 1
+        self.last_seen = now
+        if self.state != LINK_ALIVE:
+            if self.state == LINK_DEAD:
+                self.logger.info('EW11 링크가 다시 살아났습니다.')
+            self.state = LINK_ALIVE
+
+    def shed_queue(self, reason: str) -> int:
+        """전송 큐의 명령을 모두 실패로 끝내고 비웁니다. 버린 개수를 반환합니다."""
+        controller = self.controller
+        items = list(controller.QUEUE)
+        controller.QUEUE.clear()
+        for item in items:
+            controller.command_bus.resolve(item, False, reason)
+        self.shed_count += len(items)
+        return len(items)
+
+    async def check(self, now: Optional[float] = None) -> None:
+        """감시 한 단계: 살아 있던 EW11 링크가 허용 시간보다 오래 조용하면 죽은 것으로 처리합니다."""
+        now = time.monotonic() if now is None else now
+        if self.state == LINK_UNKNOWN or self.last_seen is None:
+            return
+        silence = now - self.last_seen
+        if self.state == LINK_ALIVE and silence > self.silence_threshold():
+            self.state = LINK_DEAD
+            self.dead_count += 1
+            self.logger.warning(f'EW11에서 {silence:.1f}초간 패킷이 없습니다 '
+                                f'(평소 간격 {(self.gap_ewma or 0) * 1000:.0f}ms). 링크가 끊긴 것으로 봅니다.')
+            controller = self.controller
+            if controller.is_available:
+                controller.is_available = False
+                await controller.publish_to_ha(f"{controller.HA_TOPIC}/status", "offline")
+        if self.state == LINK_DEAD and self.controller.QUEUE:
+            shed = self.shed_queue('EW11 링크가 끊겨 명령을 보내지 않았습니다.')
+            self.logger.warning(f'EW11 링크가 끊겨 대기 중인 명령 {shed}개를 취소했습니다.')
+
+    def drop(self, client_type: str, writer: asyncio.StreamWriter) -> None:
+        """쓰기에 실패한 연결을 즉시 끊고 목록에서 뺍니다. 읽기 쪽 핸들러가 나머지를 정리합니다."""
+        writers = self.controller.writers
+        if writers.get(client_type) is writer:
+            del writers[client_type]
+        self.dropped[client_type] = self.dropped.get(client_type, 0) + 1
+        transport = writer.transport
+        if transport is not None and not transport.is_closing():
+            transport.abort()
+
+    async def drain(self, client_type: str, writer: asyncio.StreamWriter) -> None:
+        """write_timeout 안에 쓰기를 마칩니다. 끝나지 않거나 실패하면 연결을 끊고 예외를 다시 올립니다."""
+        try:
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except asyncio.TimeoutError:
+            self.drop(client_type, writer)
+            raise ConnectionError(f'{self.write_timeout}초 안에 전송하지 못했습니다')
+        except (ConnectionError, OSError):
+            self.drop(client_type, writer)
+            raise
+
+    async def run(self) -> None:
+        """감시 루프"""
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                self.logger.error(f'링크 감시 중 오류: {e}')
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'silence': round(time.monotonic() - self.last_seen, 2) if self.last_seen is not None else None,
+            'threshold': round(self.silence_threshold(), 2),
+            'gap_ms': round(self.gap_ewma * 1000, 1) if self.gap_ewma is not None else None,
+            'dead_count': self.dead_count,
+            'shed': self.shed_count,
+            'dropped': dict(self.dropped)
+        }
@@ -1,19 +1,27 @@
-from gevent import monkey; monkey.patch_all()  # type: ignore
 import time
 import asyncio
 import os
 import json
 import yaml  # type: ignore #PyYAML
 import shutil
-import telnetlib3  # type: ignore
 from .logger import Logger
 from .web_server import WebServer
-from .utils import byte_to_hex_str, checksum
-from .supervisor_api import SupervisorAPI
-from .message_processor import MessageProcessor
+from .utils import byte_to_hex_str, checksum, StartupTimer
+from .supervisor_api import SupervisorAPI, NotificationQueue
+from .message_processor import MessageProcessor, ExpectedStateMatcher
 from .discovery_publisher import DiscoveryPublisher
 from .state_updater import StateUpdater
-from typing import Any, Dict, Union, List, Optional, Set, TypedDict, Callable, TypeVar
+from .packet_journal import PacketJournal
+from .packet_structure import CompiledStructure, load_structure
+from .command_bus import CommandBus, CommandResult
+from .state_poller import StatePoller
+from .retry_policy import RetryKey, RetryPolicy
+from .command_scheduler import CommandScheduler
+from .ew11_supervisor import EW11Supervisor
+from .link_monitor import LinkMonitor, set_tcp_keepalive
+from .history_store import HistoryStore
+from .structure_watcher import StructureWatcher
+from typing import Any, Dict, Union, List, Optional, Tuple, TypedDict, NotRequired, Callable, TypeVar
 
 T = TypeVar('T')
 
@@ -33,24 +41,39 @@ def require_device_structure(default_return: Any = None) -> Callable:
 class CollectData(TypedDict):
     send_data: List[str]
     recv_data: List[str]
-    recent_recv_data: Set[str]
     last_recv_time: int
 
 class ExpectedStatePacket(TypedDict):
-    required_bytes: List[int]
-    possible_values: List[List[str]]
+    required_bytes: Tuple[int, ...]
+    possible_values: Tuple[Tuple[str, ...], ...]
 
 class QueueItem(TypedDict):
     sendcmd: str
     count: int
     expected_state: Optional[ExpectedStatePacket]
     received_count: int
+    # 명령 버스로 들어온 항목에만 있는 필드
+    max_send_count: NotRequired[int]
+    future: NotRequired['asyncio.Future[CommandResult]']
+    enqueued_at: NotRequired[float]
+    first_sent_at: NotRequired[float]
+    last_sent_at: NotRequired[float]
+    confirmed_at: NotRequired[float]
+    # 재전송 정책이 사용하는 필드
+    retry_key: NotRequired[Optional[RetryKey]]
+    next_send_at: NotRequired[float]
+    # 스케줄러가 사용하는 필드 (없으면 PRIORITY_HIGH, 기한 없음)
+    priority: NotRequired[int]
+    deadline: NotRequired[Optional[float]]
+    # confirm_inflight가 처음 확인할 때 expected_state로 만드는 판별기
+    expected_matcher: NotRequired[ExpectedStateMatcher]
 
 class WallpadController:
     def __init__(self, config: Dict[str, Any], logger: Logger) -> None:
         self.supervisor_api = SupervisorAPI()
         self.config: Dict[str, Any] = config
         self.logger: Logger = logger
+        self.notification_queue = NotificationQueue(self.supervisor_api, logger=logger)
         self.share_dir: str = '/share'
     
         self.ELFIN_TOPIC: str = config.get('elfin_TOPIC', 'ew11')
@@ -68,27 +91,65 @@ class WallpadController:
         self.max_send_count: int = self.config['command_settings'].get('max_send_count', 20)
         self.min_receive_count: int = self.config['command_settings'].get('min_receive_count', 3)
         self.COLLECTDATA: CollectData = {
-            'send_data': [], 'recv_data': [], 'recent_recv_data': set(), 'last_recv_time': time.time_ns()
+            'send_data': [], 'recv_data': [], 'last_recv_time': time.time_ns()
         }
     
         self.tcp_server: Optional[asyncio.Server] = None
         self.writers: Dict[str, asyncio.StreamWriter] = {} 
         self.device_list: Optional[Dict[str, Any]] = None
-        self.DEVICE_STRUCTURE: Optional[Dict[str, Any]] = None
-    
-        self.load_devices_and_packets_structures()
-        self.web_server = WebServer(self)
+        # 구조는 apply_structure()로만 통째로 교체합니다 (DEVICE_STRUCTURE는 여기서 파생)
+        self.compiled_structure: Optional[CompiledStructure] = None
+        self.custom_structure_path: str = os.path.join(self.share_dir, 'packet_structures_custom.yaml')
+        self.structure_lock = asyncio.Lock()
+        # /share는 다른 애드온도 쓸 수 있으므로 캐시는 애드온 전용 /data에 둡니다.
+        self.cache_dir: str = '/data/.cache'
+
+        journal_config = self.config.get('packet_journal', {})
+        self.packet_journal: Optional[PacketJournal] = None
+        if journal_config.get('enabled', True):
+            self.packet_journal = PacketJournal(
+                os.path.join(self.share_dir, 'packet_journal'),
+                segment_size=int(journal_config.get('segment_size_mb', 4)) * 1024 * 1024,
+                max_segments=int(journal_config.get('max_segments', 64)),
+                logger=self.logger
+            )
+
+        # 패킷 구조와 웹서버는 run()에서 TCP 서버를 연 뒤에 준비합니다.
+        self.structure_ready = asyncio.Event()
+        self.web_server: Optional[WebServer] = None
+        self.web_server_task: Optional[asyncio.Task] = None
         self.elfin_reboot_count: int = 0
         self.elfin_unavailable_notification_enabled: bool = self.config['elfin'].get('elfin_unavailable_notification', False)
         self.send_command_on_idle: bool = self.config['command_settings'].get('send_command_on_idle', True)
+        # HA 명령을 보내지 않고 버리기까지의 시간 (0이면 기한 없음)
+        self.command_deadline: float = float(self.config['command_settings'].get('command_deadline_in_second', 30))
     
         self.message_processor = MessageProcessor(self)
+        self.command_bus = CommandBus(self)
+        self.retry_policy = RetryPolicy.from_config(self)
+        self.command_scheduler = CommandScheduler(self)
+        self.state_poller = StatePoller.from_config(self)
+        self.state_poller_task: Optional[asyncio.Task] = None
+        self.ew11_supervisor = EW11Supervisor.from_config(self)
+        self.link_monitor = LinkMonitor.from_config(self)
+        self.history: Optional[HistoryStore] = HistoryStore.from_config(self)
         self.discovery_publisher = DiscoveryPublisher(self)
         self.state_updater = StateUpdater(self.STATE_TOPIC, self.publish_to_ha) 
+        self.structure_watcher = StructureWatcher.from_config(self, self.custom_structure_path)
         self.is_available: bool = False
 
-    def load_devices_and_packets_structures(self) -> None:
-        """기기 및 패킷 구조를 로드하는 함수"""
+    @property
+    def DEVICE_STRUCTURE(self) -> Optional[Dict[str, Any]]:
+        """현재 구조의 기기 정의 (compiled_structure.devices). 직접 바꾸지 않습니다."""
+        compiled = self.compiled_structure
+        return compiled.devices if compiled is not None else None
+
+    def read_packet_structure(self) -> Optional[CompiledStructure]:
+        """vendor에 맞는 패킷 구조 파일을 읽어 컴파일합니다. 실패하면 None
+
+        YAML 파싱 결과는 /data/.cache에 캐시되어 원본 파일이 바뀌지 않았다면 YAML을 다시 파싱하지 않습니다.
+        컨트롤러 상태는 바꾸지 않으므로 이벤트 루프 밖(asyncio.to_thread)에서 실행해도 됩니다.
+        """
         try:
             vendor = self.config.get('vendor', 'commax').lower()
             if 'packet_file' in self.config:
@@ -96,58 +157,85 @@ class WallpadController:
             else:
                 default_file_path = f'/apps/packet_structures_commax.yaml'
             
-            custom_file_path = f'/share/packet_structures_custom.yaml'
+            custom_file_path = self.custom_structure_path
 
             if vendor == 'custom':
                 try:
-                    with open(custom_file_path, 'r', encoding='utf-8') as file:
-                        self.DEVICE_STRUCTURE = yaml.safe_load(file)
+                    compiled = load_structure(custom_file_path, self.cache_dir, self.logger)
                     self.logger.info(f'{vendor} 패킷 구조를 로드했습니다.')
                 except FileNotFoundError:
                     self.logger.info(f'{custom_file_path} 파일이 없습니다. 기본 파일을 복사합니다.')
                     os.makedirs(os.path.dirname(custom_file_path), exist_ok=True)
                     shutil.copy(default_file_path, custom_file_path)
-                    with open(custom_file_path, 'r', encoding='utf-8') as file:
-                        self.DEVICE_STRUCTURE = yaml.safe_load(file)
+                    compiled = load_structure(custom_file_path, self.cache_dir, self.logger)
                     self.logger.info(f'기본 패킷 구조를 {custom_file_path}로 복사하고 로드했습니다.')
             else:
                 try:
-                    with open(default_file_path, 'r', encoding='utf-8') as file:
-                        self.DEVICE_STRUCTURE = yaml.safe_load(file)
+                    compiled = load_structure(default_file_path, self.cache_dir, self.logger)
                     self.logger.info(f'{vendor} 패킷 구조를 로드했습니다.')
                 except FileNotFoundError:
                     self.logger.error(f'{vendor} 패킷 구조 파일을 찾을 수 없습니다.')
-                    return
-
-            if self.DEVICE_STRUCTURE is not None:
-                for device_name, device in self.DEVICE_STRUCTURE.items():
-                    for packet_type in ['command', 'state']:
-                        if packet_type in device:
-                            structure = device[packet_type]['structure']
-                            field_positions = {}
-                            for pos, field in structure.items():
-                                field_name = field['name']
-                                if field_name != 'empty':
-                                    if field_name in field_positions:
-                                        self.logger.error(
-                                            f"중복된 필드 이름 발견: {device_name}.{packet_type} - "
-                                            f"'{field_name}' (위치: {field_positions[field_name]}, {pos})"
-                                        )
-                                    else:
-                                        field_positions[field_name] = pos
-                            device[packet_type]['fieldPositions'] = field_positions
+                    return None
+            return compiled
         except FileNotFoundError:
             self.logger.error('기기 및 패킷 구조 파일을 찾을 수 없습니다.')
         except yaml.YAMLError as e:
             self.logger.error(f'기기 및 패킷 구조 파일의 YAML 형식이 잘못되었습니다: {e}')
+        return None
+
+    def apply_structure(self, compiled: CompiledStructure) -> bool:
+        """컴파일된 구조로 교체합니다. 구조 버전이 같으면 아무것도 하지 않고 False
+
+        토픽 라우터와 상태 조회 요청 패킷처럼 구조에서 파생된 값을 먼저 모두 만든 뒤
+        await 없이 한 번에 바꾸므로, 이벤트 루프에서 도는 파서/명령 생성/상태 조회/분석기/디스커버리는
+        이전 구조와 새 구조가 섞인 상태를 볼 수 없습니다. 반드시 이벤트 루프 스레드(또는 루프 시작 전)에서 호출합니다.
+        """
+        previous = self.compiled_structure
+        if previous is not None and previous.version == compiled.version:
+            return False
+        routes = self.message_processor.compile_topic_routes(compiled)
+        poll_targets = self.state_poller.targets
+        if poll_targets:
+            # 상태 조회가 이미 돌고 있으면 요청 패킷도 새 구조로 다시 만듭니다
+            poll_targets = self.state_poller.build_targets(self.device_list, compiled.devices)
+
+        self.compiled_structure = compiled
+        self.message_processor.topic_routes = routes
+        self.state_poller.targets = poll_targets
+        self.state_updater.publish_filter.set_rules(compiled.publish_rules)
+
+        if previous is not None:
+            self.logger.info(f'패킷 구조를 교체했습니다: version {previous.version} -> {compiled.version}')
+        return True
+
+    def load_devices_and_packets_structures(self) -> None:
+        """기기 및 패킷 구조를 읽어 바로 적용하는 함수 (이벤트 루프가 돌기 전에 사용)"""
+        compiled = self.read_packet_structure()
+        if compiled is not None:
+            self.apply_structure(compiled)
+
+    async def reload_structure(self) -> bool:
+        """패킷 구조를 이벤트 루프 밖에서 다시 읽고, 루프에서 한 번에 교체합니다. 교체했으면 True
+
+        읽기에 실패하면(YAML 오류 등) 지금 구조를 그대로 씁니다. 동시에 여러 번 불려도
+        늦게 읽은 결과가 먼저 읽은 결과를 덮어쓰는 일이 없도록 차례로 실행합니다.
+        """
+        async with self.structure_lock:
+            compiled = await asyncio.to_thread(self.read_packet_structure)
+            if compiled is None:
+                return False
+            return self.apply_structure(compiled)
     
     async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
         """개별 TCP 클라이언트 연결을 처리하고 클라이언트 종류를 식별합니다."""
         peername = writer.get_extra_info('peername')
         self.logger.info(f"새로운 클라이언트 연결: {peername}")
         client_type = 'unknown'
+        set_tcp_keepalive(writer)
 
         try:
+            # 패킷 구조 로드가 끝날 때까지 수신 데이터는 소켓 버퍼에 남겨둡니다.
+            await self.structure_ready.wait()
             first_data = await reader.read(100)
             if not first_data:
                 return
@@ -156,6 +244,8 @@ class WallpadController:
                 client_type = 'ha'
                 self.writers['ha'] = writer
                 self.logger.info(f"HA 클라이언트 등록: {peername}")
+                # 연결이 없던 동안 보내지 못한 값도 발행한 것으로 기록되어 있으므로 새로 시작합니다
+                self.state_updater.publish_filter.reset()
             else:
                 client_type = 'wallpad'
                 self.writers['wallpad'] = writer
@@ -185,21 +275,29 @@ class WallpadController:
         if source == 'wallpad':
             raw_data = data.hex().upper()
             self.logger.signal(f'->> [WALLPAD] 수신: {raw_data}')
+            if self.packet_journal:
+                self.packet_journal.append_frames(data, 'recv')
             
             if not self.is_available:
                 await self.publish_to_ha(f"{self.HA_TOPIC}/status", "online")
                 self.is_available = True
             
             self.elfin_reboot_count = 0
+            self.link_monitor.observe()
+            self.confirm_inflight(raw_data)
+            self.command_bus.observe(raw_data)
+            self.state_poller.observe(raw_data)
             await self.message_processor.process_elfin_data(raw_data)
             self.COLLECTDATA['last_recv_time'] = time.time_ns()
-            self.web_server.add_tcp_message(f"wallpad/recv", raw_data)
+            if self.web_server:
+                self.web_server.add_tcp_message("wallpad/recv", raw_data)
 
         elif source == 'ha':
             try:
                 message = data.decode('utf-8')
                 self.logger.debug(f'->> [HA] 수신: {message}')
-                self.web_server.add_tcp_message("ha/command", message)
+                if self.web_server:
+                    self.web_server.add_tcp_message("ha/command", message)
                 
                 parts = message.split(':', 1)
                 if len(parts) == 2:
@@ -213,15 +311,19 @@ class WallpadController:
         else:
             self.logger.warning(f"알 수 없는 소스로부터 데이터 수신: {source}")
 
-    async def publish_to_wallpad(self, command: bytes) -> None:
-        """월패드(Elfin)로 명령(raw bytes)을 전송합니다."""
+    async def publish_to_wallpad(self, command: bytes) -> bool:
+        """월패드(Elfin)로 명령(raw bytes)을 전송합니다. 전송했으면 True를 반환합니다."""
         if 'wallpad' in self.writers:
             writer = self.writers['wallpad']
             try:
                 writer.write(command)
-                await writer.drain()
+                await self.link_monitor.drain('wallpad', writer)
+                if self.packet_journal:
+                    self.packet_journal.append(command, 'send')
                 self.logger.signal(f'<<- [WALLPAD] 송신: {command.hex().upper()}')
-                self.web_server.add_tcp_message("wallpad/send", command.hex().upper())
+                if self.web_server:
+                    self.web_server.add_tcp_message("wallpad/send", command.hex().upper())
+                return True
 
             except ConnectionError as e:
                 self.logger.error(f"월패드 전송 오류: 연결이 끊겼습니다. {e}")
@@ -229,6 +331,7 @@ class WallpadController:
                 self.logger.error(f"월패드 전송 중 알 수 없는 오류: {e}")
         else:
             self.logger.warning("월패드가 연결되지 않아 명령을 전송할 수 없습니다.")
+        return False
 
     async def publish_to_ha(self, topic: str, value: str) -> None:
         """Home Assistant로 상태(topic:value)를 전송합니다."""
@@ -237,8 +340,8 @@ class WallpadController:
             message = f"{topic}:{value}".encode('utf-8')
             try:
                 writer.write(message)
-                await writer.drain()
-                self.logger.tcp(f'>> [HA] 송신: {topic} -> {value}')
+                await self.link_monitor.drain('ha', writer)
+                self.logger.mqtt(f'>> [HA] 송신: {topic} -> {value}')
             except ConnectionError as e:
                 self.logger.error(f"HA 전송 오류: 연결이 끊겼습니다. {e}")
             except Exception as e:
@@ -269,12 +372,13 @@ class WallpadController:
             
             save_path = os.path.join(self.share_dir, 'commax_found_device.json')
             
-            assert isinstance(self.DEVICE_STRUCTURE, dict), "DEVICE_STRUCTURE must be a dictionary"
+            structure = self.DEVICE_STRUCTURE
+            assert isinstance(structure, dict), "DEVICE_STRUCTURE must be a dictionary"
             
             state_headers = {
-                self.DEVICE_STRUCTURE[name]["state"]["header"]: name 
-                for name in self.DEVICE_STRUCTURE 
-                if "state" in self.DEVICE_STRUCTURE[name]
+                structure[name]["state"]["header"]: name 
+                for name in structure 
+                if "state" in structure[name]
             }
             self.logger.info(f'검색 대상 기기 headers: {state_headers}')
             
@@ -288,7 +392,7 @@ class WallpadController:
                     name = state_headers[header]
                     self.logger.debug(f'감지된 기기: {data} {name} ')
                     try:
-                        device_id_pos = self.DEVICE_STRUCTURE[name]["state"]["fieldPositions"]["deviceId"]
+                        device_id_pos = structure[name]["state"]["fieldPositions"]["deviceId"]
                         device_count[name] = max(
                             device_count[name],
                             int(byte_to_hex_str(data_bytes[int(device_id_pos)]), 16)
@@ -303,9 +407,8 @@ class WallpadController:
             
             device_list = {}
             for name, count in device_count.items():
-                assert isinstance(self.DEVICE_STRUCTURE, dict)
                 device_list[name] = {
-                    "type": self.DEVICE_STRUCTURE[name]["type"],
+                    "type": structure[name]["type"],
                     "count": count
                 }
                 self.logger.info(f'DEVICE: {name} COUNT: {count}')
@@ -322,90 +425,126 @@ class WallpadController:
             self.logger.error(f'기기 검색 중 오류 발생: {str(e)}')
             return {}
 
-    async def reboot_elfin_device(self):
-        """Elfin 장치를 텔넷으로 재부팅합니다."""
-        try:
-            if self.elfin_reboot_count > 10 and self.is_available:
-                await self.publish_to_ha(f"{self.HA_TOPIC}/status", "offline")
-                self.is_available = False
-
-            if self.elfin_unavailable_notification_enabled and self.elfin_reboot_count == 20:
-                self.logger.error('EW11 응답 없음. HA로 알림을 보냅니다.')
-                self.supervisor_api.send_notification(
-                    title='[Commax Wallpad Addon] EW11 점검 및 재시작 필요',
-                    message=f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] EW11에서 응답이 없습니다. EW11 상태를 점검 후 애드온을 재시작 해주세요.'
-                )
+    @staticmethod
+    def expected_matcher(item: QueueItem) -> ExpectedStateMatcher:
+        """항목의 예상 상태 판별기. 처음 확인할 때 한 번 만들어 항목에 붙여 둡니다."""
+        matcher = item.get('expected_matcher')
+        if matcher is None:
+            assert item['expected_state'] is not None
+            matcher = item['expected_matcher'] = ExpectedStateMatcher(item['expected_state'])
+        return matcher
+
+    def confirm_inflight(self, raw_data: str) -> None:
+        """월패드에서 받은 프레임으로 전송 중인 명령들을 바로 확인합니다.
+
+        응답은 전송(drain) 이후에 도착하므로, 다음 큐 처리 주기가 아니라 수신 시점에 세어야
+        불필요한 재전송이 없고 확인 시간도 큐 처리 주기에 묶이지 않습니다.
+        """
+        inflight = [
+            (item, self.expected_matcher(item)) for item in self.QUEUE
+            if item['count'] > 0 and 'confirmed_at' not in item and isinstance(item.get('expected_state'), dict)
+        ]
+        if not inflight:
+            return
+        for k in range(0, len(raw_data) - 15, 16):
+            frame = raw_data[k:k + 16]
+            if frame != checksum(frame):
+                continue
+            frame_value = int(frame, 16)
+            for send_data, matcher in inflight:
+                if matcher.matches(frame_value):
+                    send_data['received_count'] = send_data.get('received_count', 0) + 1
+                    if send_data['received_count'] >= self.min_receive_count and 'confirmed_at' not in send_data:
+                        send_data['confirmed_at'] = time.monotonic()
+
+    def remove_queue_item(self, send_data: Any) -> None:
+        """큐에서 항목을 뺍니다. 내용이 같은 다른 명령이 있을 수 있어 동일 객체로 찾습니다."""
+        for index, item in enumerate(self.QUEUE):
+            if item is send_data:
+                del self.QUEUE[index]
                 return
 
-            self.logger.info(f"텔넷으로 EW11 재부팅 시도: {self.config['elfin'].get('elfin_server')}")
-            async with asyncio.timeout(10):
-                reader, writer = await telnetlib3.open_connection(
-                    self.config['elfin'].get('elfin_server'),
-                    connect_minwait=0.1,
-                    connect_maxwait=1.0
-                )
-                await reader.readuntil(b"login: ")
-                writer.write(self.config['elfin'].get('elfin_id') + '\n')
-                await reader.readuntil(b"password: ")
-                writer.write(self.config['elfin'].get('elfin_password') + '\n')
-                writer.write('Restart\n')
-                await writer.drain()
-                writer.close()
-            self.logger.info("EW11 재부팅 명령 전송 완료.")
-            await asyncio.sleep(10)
-        except asyncio.TimeoutError:
-            self.logger.error('텔넷 연결 시간 초과')
-        except Exception as e:
-            self.logger.error(f'텔넷 연결/재부팅 중 오류 발생: {str(e)}')
-            
+    def finish_queue_item(self, send_data: QueueItem, now: float) -> bool:
+        """전송한 명령이 확인되었거나 최대 전송 횟수를 다 썼거나 기한이 지났으면 큐에서 빼고 결과를 알립니다."""
+        if self.command_scheduler.is_expired(send_data, now):  # type: ignore[arg-type]
+            self.remove_queue_item(send_data)
+            self.logger.warning(f"명령 기한이 지나 전송을 중단합니다 (시도 {send_data['count']}회): {send_data['sendcmd']}")
+            self.command_bus.resolve(send_data, False, '기한이 지나 전송하지 않았습니다.')
+            return True
+        if send_data['count'] == 0:
+            return False
+        retry_key = send_data.get('retry_key')
+        if 'confirmed_at' in send_data:
+            self.remove_queue_item(send_data)
+            # 재전송한 명령은 어느 전송에 대한 응답인지 알 수 없어 응답 시간 표본으로 쓰지 않습니다
+            latency = send_data['confirmed_at'] - send_data['last_sent_at'] if send_data['count'] == 1 else None
+            self.retry_policy.record_success(retry_key, send_data['count'], latency)
+            self.logger.debug(f"명령 확인 완료 (시도 {send_data['count']}회): {send_data['sendcmd']}")
+            self.command_bus.resolve(send_data, True)
+            return True
+        max_send_count = send_data.get('max_send_count') or self.retry_policy.retry_cap(retry_key)
+        if send_data['count'] >= max_send_count and now >= send_data.get('next_send_at', 0.0):
+            self.remove_queue_item(send_data)
+            self.retry_policy.record_failure(retry_key)
+            self.logger.warning(f"최대 전송 횟수 초과. 응답을 받지 못했습니다: {send_data['sendcmd']}")
+            self.command_bus.resolve(send_data, False, '최대 전송 횟수 안에 예상 상태 패킷을 받지 못했습니다.')
+            return True
+        return False
+
     async def process_queue(self) -> None:
-        """큐에 있는 명령을 처리합니다."""
+        """큐에 있는 명령을 처리합니다.
+
+        먼저 확인되었거나 재전송 횟수를 다 썼거나 기한이 지난 명령을 정리한 뒤, command_scheduler가
+        기기별 레인에서 우선순위대로 고른 명령 하나를 보냅니다. 레인마다 확인되지 않은 명령은 하나만 전송 중이므로 응답하지 않는
+        기기가 다른 기기의 명령을 막지 않습니다. 재전송 간격과 횟수는 retry_policy가 기기별로 정합니다.
+        """
         if not self.QUEUE:
             return
-        
-        send_data = self.QUEUE.pop(0)
-        
+
+        now = time.monotonic()
+        for item in list(self.QUEUE):
+            self.finish_queue_item(item, now)
+        send_data = self.command_scheduler.select(self.QUEUE, now)  # type: ignore[arg-type]
+        if send_data is None:
+            return
+
+        retry_key = send_data.get('retry_key')
+        max_send_count = send_data.get('max_send_count') or self.retry_policy.retry_cap(retry_key)
+        if send_data['count'] > 0:
+            self.logger.debug(f"명령 재전송 (시도 {send_data['count'] + 1}/{max_send_count}): {send_data['sendcmd']}")
+
         try:
             cmd_bytes = bytes.fromhex(send_data['sendcmd'])
-            await self.publish_to_wallpad(cmd_bytes)
-            send_data['count'] += 1
         except (ValueError, TypeError) as e:
+            self.remove_queue_item(send_data)
             self.logger.error(f"명령 전송 중 오류 발생 (잘못된 16진수 문자열): {str(e)}")
+            self.command_bus.resolve(send_data, False, f'잘못된 16진수 문자열: {e}')
             return
-            
-        max_send_count = self.max_send_count
-        expected_state = send_data.get('expected_state')
-        if isinstance(expected_state, dict):
-            required_bytes = expected_state['required_bytes']
-            possible_values = expected_state['possible_values']
-            
-            recv_data_set = self.COLLECTDATA['recent_recv_data']
-            for received_packet in recv_data_set:
-                # ... (이하 응답 확인 로직은 기존과 동일)
-                pass
 
-            if send_data.get('received_count', 0) >= self.min_receive_count:
-                return # 성공
-        
-        if send_data['count'] < max_send_count:
-            self.logger.debug(f"명령 재전송 예약 (시도 {send_data['count']}/{max_send_count}): {send_data['sendcmd']}")
-            self.QUEUE.insert(0, send_data)
-        else:
-            self.logger.warning(f"최대 전송 횟수 초과. 응답을 받지 못했습니다: {send_data['sendcmd']}")
+        # 전송 중에 도착한 응답도 이 전송으로 확인되도록 전송 전에 기록합니다
+        send_data['count'] += 1
+        send_data['last_sent_at'] = now
+        send_data['next_send_at'] = now + self.retry_policy.retry_interval(retry_key, send_data['count'])
+        if await self.publish_to_wallpad(cmd_bytes) and 'first_sent_at' not in send_data:
+            send_data['first_sent_at'] = now
+
+        if not isinstance(send_data.get('expected_state'), dict) and send_data['count'] >= max_send_count:
+            self.remove_queue_item(send_data)
+            self.command_bus.resolve(send_data, None)
+
+    def next_queue_wakeup(self, default: float) -> float:
+        """다음 큐 처리까지 기다릴 시간. 어떤 레인의 (재)전송 시각이 더 이르면 그때 깨어납니다."""
+        now = time.monotonic()
+        next_send_at = self.command_scheduler.next_wakeup(self.QUEUE, now)  # type: ignore[arg-type]
+        if next_send_at is None:
+            return default
+        return min(default, max(next_send_at - now, 0.005))
 
     async def process_queue_and_monitor(self) -> None:
         """메시지 큐를 처리하고 장치 상태를 모니터링합니다."""
         try:
-            elfin_reboot_interval = self.config['elfin'].get('elfin_reboot_interval', 60)
+            # EW11 복구는 ew11_supervisor 태스크가 따로 처리합니다
             signal_interval_ms = (time.time_ns() - self.COLLECTDATA['last_recv_time']) / 1_000_000
-            
-            if signal_interval_ms > elfin_reboot_interval * 1_000:
-                self.logger.warning(f'{elfin_reboot_interval}초간 신호를 받지 못했습니다.')
-                self.COLLECTDATA['last_recv_time'] = time.time_ns()
-                self.elfin_reboot_count += 1
-                if self.config['elfin'].get("use_auto_reboot", True):
-                    self.logger.warning(f'EW11 재시작을 시도합니다. (시도 횟수: {self.elfin_reboot_count})')
-                    await self.reboot_elfin_device()
 
             if self.send_command_on_idle:
                 if signal_interval_ms > 130:
@@ -430,16 +569,19 @@ class WallpadController:
                  self.device_list = self.find_device()
 
         if self.device_list:
+            routes = self.message_processor.build_topic_routes()
+            self.logger.info(f"HA 명령 토픽 {routes}개를 등록했습니다.")
             self.logger.info("HA에 디바이스 정보를 게시합니다 (Discovery).")
             await self.discovery_publisher.publish_discovery_message()
+            self.start_state_polling()
         else:
             self.logger.warning("찾은 기기가 없어 HA Discovery를 건너뜁니다.")
 
-        queue_interval = self.config['command_settings'].get('queue_interval_in_second', 0.05)
+        queue_interval = float(self.config['command_settings'].get('queue_interval_in_second', 0.05))
         while True:
             try:
                 await self.process_queue_and_monitor()
-                await asyncio.sleep(queue_interval)
+                await asyncio.sleep(self.next_queue_wakeup(queue_interval))
             except asyncio.CancelledError:
                 self.logger.info("메인 루프가 종료됩니다.")
                 break
@@ -447,8 +589,19 @@ class WallpadController:
                 self.logger.error(f"메인 루프 오류: {e}")
                 await asyncio.sleep(5)
     
-    def run(self) -> None:
-        """애드온의 메인 실행 함수."""
+    def start_state_polling(self) -> None:
+        """기기 목록으로 상태 조회 대상을 만들고, 시작 상태 버스트와 백그라운드 조회를 시작합니다."""
+        polling_config = self.config.get('state_polling', {})
+        poll = polling_config.get('enabled', True)
+        burst = polling_config.get('startup_burst', True)
+        if not (poll or burst):
+            return
+        self.state_poller.set_targets(self.device_list)
+        if self.state_poller.targets and self.state_poller_task is None:
+            self.state_poller_task = asyncio.create_task(self.state_poller.run(burst=burst, poll=poll))
+
+    def load_device_list(self) -> None:
+        """저장된 기기 목록(/share/commax_found_device.json)을 읽어옵니다."""
         self.logger.info("저장된 기기정보 확인: /share/commax_found_device.json")
         try:
             with open(os.path.join(self.share_dir, 'commax_found_device.json')) as file:
@@ -461,12 +614,57 @@ class WallpadController:
             self.logger.info('저장된 기기 정보가 없거나 잘못되었습니다.')
             self.device_list = None
 
-        self.web_server.run()
+    async def start_web_server(self) -> None:
+        """웹서버를 같은 이벤트 루프의 작업으로 실행합니다."""
+        try:
+            self.web_server = WebServer(self)
+            self.web_server_task = asyncio.create_task(self.web_server.run())
+        except Exception as e:
+            self.logger.error(f"웹서버 시작 실패: {e}")
+
+    async def startup(self, timer: StartupTimer) -> None:
+        """애드온 시작 단계를 실행합니다.
+
+        1. TCP 서버를 가장 먼저 열어 EW11/HA 연결을 바로 받습니다.
+        2. 패킷 구조, 저장된 기기 목록, 웹서버를 동시에 준비합니다.
+           구조 로드가 끝나기 전까지 수신 데이터는 처리하지 않고 대기합니다.
+        """
+        self.command_bus.bind(asyncio.get_running_loop())
+        with timer.phase('TCP 서버 시작'):
+            await self.start_tcp_server()
+
+        async def load_structures():
+            try:
+                with timer.phase('패킷 구조 로드'):
+                    await self.reload_structure()
+            finally:
+                self.structure_ready.set()
+
+        async def load_device_list():
+            with timer.phase('기기 목록 로드'):
+                await asyncio.to_thread(self.load_device_list)
+
+        async def start_web_server():
+            with timer.phase('웹서버 시작'):
+                await self.start_web_server()
+
+        await asyncio.gather(load_structures(), load_device_list(), start_web_server())
+
+    def run(self) -> None:
+        """애드온의 메인 실행 함수."""
+        timer = StartupTimer(self.logger)
 
         async def main():
-            server_task = asyncio.create_task(self.start_tcp_server())
+            await self.startup(timer)
+            timer.report()
             main_loop_task = asyncio.create_task(self.main_loop())
-            await asyncio.gather(server_task, main_loop_task)
+            notification_task = asyncio.create_task(self.notification_queue.run())
+            supervisor_task = asyncio.create_task(self.ew11_supervisor.run())
+            link_monitor_task = asyncio.create_task(self.link_monitor.run())
+            tasks = [main_loop_task, notification_task, supervisor_task, link_monitor_task]
+            if self.structure_watcher:
+                tasks.append(asyncio.create_task(self.structure_watcher.run()))
+            await asyncio.gather(*tasks)
 
         try:
             asyncio.run(main())
@@ -478,6 +676,13 @@ class WallpadController:
             self.logger.info("리소스 정리 중...")
             if self.tcp_server:
                 self.tcp_server.close()
+            if self.web_server:
+                self.web_server.stop()
+            if self.state_poller_task:
+                self.state_poller_task.cancel()
+            if self.packet_journal:
+                self.packet_journal.close()
+            self.supervisor_api.close()
 
     def __del__(self):
         """인스턴스 삭제 시 리소스 정리."""
@@ -1,109 +1,129 @@
-from typing import Any, Dict, List, Optional, TypedDict, Union
-import re
+from typing import Any, Dict, List, Optional, Tuple, TypedDict, Union
+from collections import OrderedDict
+import time
 from .utils import byte_to_hex_str, checksum
+from .command_scheduler import PRIORITY_CRITICAL
+from .command_table import TopicRoute, build_topic_routes
+from .packet_structure import CompiledStructure
 
 class ExpectedStatePacket(TypedDict):
-    required_bytes: List[int]
-    possible_values: List[List[str]]
+    required_bytes: Tuple[int, ...]
+    possible_values: Tuple[Tuple[str, ...], ...]
+
+class ExpectedStateMatcher:
+    """예상 상태 패킷을 8바이트 프레임 정수에 대한 비트 연산으로 바꾼 판별기
+
+    값이 하나뿐인 위치는 (frame & mask) == value 한 번으로 비교하고, 값이 여러 개인 위치는
+    256비트 허용 마스크에서 해당 바이트 값의 비트를 확인합니다.
+    """
+
+    __slots__ = ('mask', 'value', 'multi')
+
+    def __init__(self, expected_state: 'ExpectedStatePacket', frame_size: int = 8) -> None:
+        self.mask = 0
+        self.value = 0
+        multi: List[Tuple[int, int]] = []
+        for pos in expected_state['required_bytes']:
+            if pos >= frame_size or pos >= len(expected_state['possible_values']):
+                # 프레임에 없는 위치는 어떤 프레임과도 맞지 않습니다
+                multi.append((0, 0))
+                continue
+            values = expected_state['possible_values'][pos]
+            accept = 0
+            for value_hex in values:
+                accept |= 1 << int(value_hex, 16)
+            shift = (frame_size - 1 - pos) * 8
+            if len(values) == 1:
+                self.mask |= 0xFF << shift
+                self.value |= int(values[0], 16) << shift
+            else:
+                multi.append((shift, accept))
+        self.multi = tuple(multi)
+
+    def matches(self, frame: int) -> bool:
+        """프레임(int(16진수, 16))이 예상 상태와 맞는지 확인합니다."""
+        if frame & self.mask != self.value:
+            return False
+        for shift, accept in self.multi:
+            if not (accept >> ((frame >> shift) & 0xFF)) & 1:
+                return False
+        return True
+
+# 기기별 상태 발행 방법: (StateUpdater 메서드, 디코더 출력 이름 순서, None이어도 되는 출력)
+STATE_UPDATERS: Dict[str, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {
+    'Light': ('update_light', ('power',), ()),
+    'LightBreaker': ('update_light_breaker', ('power',), ()),
+    'Thermo': ('update_temperature', ('mode', 'action', 'current_temp', 'target_temp'), ()),
+    'Outlet': ('update_outlet', ('power', 'watt', 'cutoff', 'eco'), ('watt', 'cutoff')),
+    'Fan': ('update_fan', ('power', 'speed'), ()),
+    'Gas': ('update_gas', ('power',), ()),
+    'EV': ('update_ev', ('power', 'floor'), ()),
+}
+
+# 예상 상태 패킷 메모의 최대 항목 수 (명령 패킷 종류는 기기 수 x 명령 수 정도로 많지 않음)
+EXPECTED_STATE_MEMO_SIZE = 512
 
 class MessageProcessor:
     def __init__(self, controller: Any) -> None:
         self.controller = controller
         self.logger = controller.logger
-        self.DEVICE_STRUCTURE = controller.DEVICE_STRUCTURE
         self.COLLECTDATA = controller.COLLECTDATA
         self.QUEUE = controller.QUEUE
         self.HA_TOPIC = controller.HA_TOPIC
         self.ELFIN_TOPIC = controller.ELFIN_TOPIC
         self.config = controller.config
+        self.topic_routes: Dict[Tuple[str, str], TopicRoute] = {}
+        self._expected_state_memo: 'OrderedDict[Tuple[str, str], Optional[ExpectedStatePacket]]' = OrderedDict()
+        self.expected_state_hits = 0
+        self.expected_state_misses = 0
 
-    def make_climate_command(self, device_id: int, target_temp: int, command_type: str) -> Union[str, None]:
-        """
-        온도 조절기의 16진수 명령어를 생성하는 함수
-        
-        Args:
-            device_id (int): 온도 조절기 장치 id
-            current_temp (int): 현재 온도 값
-            target_temp (int): 설정하고자 하는 목표 온도 값
-            command_type (str): 명령어 타입
-                - 'commandOFF': 전원 끄기 명령
-                - 'commandON': 전원 켜기 명령
-                - 'commandCHANGE': 온도 변경 명령
-        
-        Returns:
-            Union[str, None]: 
-                - 성공 시: 체크섬이 포함된 16진수 명령어 문자열
-                - 실패 시: None
-        
-        Examples:
-            >>> make_climate_command(0, 24, 'commandON')  # 온도절기 1번 켜기
-            >>> make_climate_command(1, 26, 'commandCHANGE')  # 온도조절기 2번 온도 변경
-        """
-        try:
-            assert isinstance(self.DEVICE_STRUCTURE, dict), "DEVICE_STRUCTURE must be a dictionary"
-            
-            thermo_structure = self.DEVICE_STRUCTURE["Thermo"]
-            command = thermo_structure["command"]
-            
-            # 패킷 초기화
-            packet = bytearray([0] * 7)
-
-            # 헤더 설정
-            packet[0] = int(command["header"], 16)
-            
-            # 기기 번호 설정 
-            device_id_pos = command["fieldPositions"]["deviceId"]
-            packet[int(device_id_pos)] = device_id
-            
-            # 명령 타입 및 값 설정
-            command_type_pos = command["fieldPositions"]["commandType"]
-            value_pos = command["fieldPositions"]["value"]
-            
-            if command_type == 'commandOFF':
-                packet[int(command_type_pos)] = int(command["structure"][command_type_pos]["values"]["power"], 16)
-                packet[int(value_pos)] = int(command["structure"][value_pos]["values"]["off"], 16)
-            elif command_type == 'commandON':
-                packet[int(command_type_pos)] = int(command["structure"][command_type_pos]["values"]["power"], 16)
-                packet[int(value_pos)] = int(command["structure"][value_pos]["values"]["on"], 16)
-            elif command_type == 'commandCHANGE':
-                packet[int(command_type_pos)] = int(command["structure"][command_type_pos]["values"]["change"], 16)
-                packet[int(value_pos)] = int(str(target_temp), 16)
-            else:
-                self.logger.error(f'온도조절기에 잘못된 명령 타입: {command_type}, 가능한 명령 타입: [commandOFF, commandON, commandCHANGE]')
-                return None
-            
-            # 패킷을 16진수 문자열로 변환
-            packet_hex = packet.hex().upper()
-            
-            # 체크섬 추가하여 return
-            return checksum(packet_hex)
-        
-        except KeyError as e:
-            # DEVICE_STRUCTURE에 필요한 키가 없는 경우
-            self.logger.error(f'DEVICE_STRUCTURE에 필요한 키가 없습니다: {e}')
-            return None
-        except Exception as e:
-            # 기타 예외 처리
-            self.logger.error(f'예외 발생: {e}')
-            return None
+    @property
+    def DEVICE_STRUCTURE(self) -> Optional[Dict[str, Any]]:
+        """컨트롤러가 현재 사용 중인 패킷 구조 (재로드 시에도 항상 최신 구조를 가리킴)"""
+        return self.controller.DEVICE_STRUCTURE
 
     def generate_expected_state_packet(self, command_str: str) -> Union[ExpectedStatePacket, None]:
         """명령 패킷으로부터 예상되는 상태 패킷을 생성합니다.
-        
+
+        결과는 명령 패킷과 구조 버전만으로 정해지므로 (구조 버전, 명령 패킷)을 키로 최근
+        EXPECTED_STATE_MEMO_SIZE개를 기억해 두고, 같은 명령이 다시 오면 계산하지 않고 돌려줍니다.
+        메모에는 바뀌지 않도록 튜플로 저장합니다.
+
         Args:
             command_str (str): 16진수 형태의 명령 패킷 문자열
             
         Returns:
             Union[ExpectedStatePacket, None]: 예상되는 상태 패킷 정보를 담은 딕셔너리 또는 None
         """
+        if len(command_str) != 16:
+            self.logger.error("예상패킷 생성 중 오류: 명령 패킷 길이가 16자가 아닙니다.")
+            return None
+        compiled = self.controller.compiled_structure
+        if compiled is None:
+            self.logger.error("예상패킷 생성 중 오류: 패킷 구조가 로드되지 않았습니다.")
+            return None
+        key = (compiled.version, command_str.upper())
+        memo = self._expected_state_memo
+        if key in memo:
+            memo.move_to_end(key)
+            self.expected_state_hits += 1
+            cached = memo[key]
+            return ExpectedStatePacket(**cached) if cached is not None else None
+
+        self.expected_state_misses += 1
+        result = self._build_expected_state_packet(compiled, key[1])
+        memo[key] = result
+        while len(memo) > EXPECTED_STATE_MEMO_SIZE:
+            memo.popitem(last=False)
+        return ExpectedStatePacket(**result) if result is not None else None
+
+    def _build_expected_state_packet(self, compiled: CompiledStructure,
+                                     command_str: str) -> Union[ExpectedStatePacket, None]:
+        """generate_expected_state_packet의 실제 계산 (메모 없이)
+
+        메모 키의 버전과 계산에 쓰는 구조가 어긋나지 않도록 같은 compiled만 사용합니다.
+        """
         try:
-            assert isinstance(self.DEVICE_STRUCTURE, dict)
-            
-            # 명령 패킷 검증
-            if len(command_str) != 16:
-                self.logger.error("예상패킷 생성 중 오류: 명령 패킷 길이가 16자가 아닙니다.")
-                return None
-                
             # 명령 패킷을 바이트로 변환
             command_packet = bytes.fromhex(command_str)
 
@@ -111,18 +131,14 @@ class MessageProcessor:
             possible_values: List[List[str]] = [[] for _ in range(7)]
 
             # 헤더로 기기 타입 찾기
-            device_type = None
-            for name, structure in self.DEVICE_STRUCTURE.items():
-                if command_packet[0] == int(structure['command']['header'], 16):
-                    device_type = name
-                    break
+            device_type = compiled.find_device('command', command_packet[0])
                     
             if not device_type:
                 self.logger.error("예상패킷 생성 중 오류: 정의되지 않은 device type입니다.")
                 return None
                         
             # 기기별 상태 패킷 생성
-            device_structure = self.DEVICE_STRUCTURE[device_type]
+            device_structure = compiled.devices[device_type]
             command_structure = device_structure['command']['structure']
             state_structure = device_structure['state']['structure']
             command_field_positions = device_structure['command']['fieldPositions']
@@ -241,8 +257,8 @@ class MessageProcessor:
                     possible_values[int(state_speed_pos)] = [state_structure[str(state_speed_pos)]['values'][str(speed)]]
             
             return ExpectedStatePacket(
-                required_bytes=sorted(required_bytes),
-                possible_values=possible_values
+                required_bytes=tuple(sorted(required_bytes)),
+                possible_values=tuple(tuple(values) for values in possible_values)
             )
             
         except Exception as e:
@@ -256,279 +272,130 @@ class MessageProcessor:
             return None
 
     async def process_elfin_data(self, raw_data: str) -> None:
-        """Elfin 장치에서 전송된 raw_data를 분석합니다."""
+        """Elfin 장치에서 전송된 raw_data를 분석합니다.
+
+        상태 패킷은 구조를 불러올 때 컴파일한 헤더별 디코더(field_codecs)로 해석합니다.
+        다른 패킷과 헤더가 겹치면(예: A0 일괄조명차단기 상태/엘리베이터 호출) 헤더 인덱스로 구분합니다.
+        """
         try:
-            assert isinstance(self.DEVICE_STRUCTURE, dict), "DEVICE_STRUCTURE must be a dictionary"
-            
+            compiled = self.controller.compiled_structure
+            assert compiled is not None, "패킷 구조가 로드되지 않았습니다"
+
             for k in range(0, len(raw_data), 16):
                 data = raw_data[k:k + 16]
-                if data == checksum(data):
-                    self.COLLECTDATA['recv_data'].append(data)
-                    self.COLLECTDATA['recent_recv_data'].add(data)
-                    if len(self.COLLECTDATA['recv_data']) > 300:
-                        self.COLLECTDATA['recv_data'] = self.COLLECTDATA['recv_data'][-300:]
-                    
-                    byte_data = bytearray.fromhex(data)
-                    
-                    for device_name, structure in self.DEVICE_STRUCTURE.items():
-                        state_structure = structure['state']
-                        field_positions = state_structure['fieldPositions']
-                        if byte_data[0] == int(state_structure['header'], 16):
-                            try:
-                                device_id_pos = field_positions['deviceId']
-                                device_id = byte_data[int(device_id_pos)]
-                            except KeyError:
-                                # Gas같은 deviceId가 없는 기기 처리 여기에..
-                                if device_name == 'Gas':
-                                    power_pos = field_positions.get('power', 1)
-                                    power = byte_data[int(power_pos)]
-                                    power_hex = byte_to_hex_str(power)
-                                    power_values = state_structure['structure'][power_pos]['values']
-                                    power_text = "ON" if power_hex == power_values.get('on', '').upper() else "OFF"
-                                    self.logger.signal(f'{byte_data.hex()}: 가스차단기 ### 상태: {power_text}')
-                                    await self.controller.state_updater.update_gas(1, power_text) #deviceId 항상 1
-                                break
-                            except IndexError:
-                                self.logger.error(f"{device_name}의 deviceId 위치({device_id_pos})가 패킷 범위를 벗어났습니다.")
-                                break
-                            if device_name == 'Thermo':
-                                power_pos = field_positions.get('power', 1)
-                                power = byte_data[int(power_pos)]
-                                # 온도값을 10진수로 직접 해석
-                                current_temp = int(format(byte_data[int(field_positions.get('currentTemp', 3))], '02x'))
-                                target_temp = int(format(byte_data[int(field_positions.get('targetTemp', 4))], '02x'))
-                                power_hex = byte_to_hex_str(power)
-                                power_values = state_structure['structure'][power_pos]['values']
-                                power_off_hex = power_values.get('off', '').upper()
-                                power_heating_hex = power_values.get('heating', '').upper()
-                                mode_text = 'off' if power_hex == power_off_hex else 'heat'
-                                action_text = 'heating' if power_hex == power_heating_hex else 'idle'
-                                self.logger.signal(f'{byte_data.hex()}: 온도조절기 ### {device_id}번, 모드: {mode_text}, 현재 온도: {current_temp}°C, 설정 온도: {target_temp}°C')
-                                await self.controller.state_updater.update_temperature(device_id, mode_text, action_text, current_temp, target_temp)
-                            
-                            elif device_name == 'Light':
-                                power_pos = field_positions.get('power', 1)
-                                power = byte_data[int(power_pos)]
-                                power_values = state_structure['structure'][power_pos]['values']
-                                power_hex = byte_to_hex_str(power)
-                                state = "ON" if power_hex == power_values.get('on', '').upper() else "OFF"
-                                
-                                self.logger.signal(f'{byte_data.hex()}: 조명 ### {device_id}번, 상태: {state}')
-                                await self.controller.state_updater.update_light(device_id, state)
-
-                            elif device_name == 'LightBreaker':
-                                power_pos = field_positions.get('power', 1)
-                                power = byte_data[int(power_pos)]
-                                power_values = state_structure['structure'][power_pos]['values']
-                                power_hex = byte_to_hex_str(power)
-                                state = "ON" if power_hex == power_values.get('on', '').upper() else "OFF"
-                                
-                                self.logger.signal(f'{byte_data.hex()}: 조명차단기 ### {device_id}번, 상태: {state}')
-                                await self.controller.state_updater.update_light_breaker(device_id, state)
-                                
-                            elif device_name == 'Outlet':
-                                power_pos = field_positions.get('power', 1)
-                                power = byte_data[int(power_pos)]
-                                power_values = state_structure['structure'][power_pos]['values']
-                                power_hex = byte_to_hex_str(power)
-                                power_text = "ON" if power_hex in [power_values.get('on', '').upper(), power_values.get('on_with_eco', '').upper()] else "OFF"
-                                is_eco = True if power_hex in [power_values.get('on_with_eco', '').upper(), power_values.get('off_with_eco', '').upper()] else False
-                                state_type_pos = field_positions.get('stateType', 3)
-                                state_type = byte_data[int(state_type_pos)]
-                                state_type_values = state_structure['structure'][state_type_pos]['values']
-                                state_type_hex = byte_to_hex_str(state_type)
-                                state_type_text = 'wattage' if state_type_hex in [state_type_values.get('wattage','')] else 'ecomode'
-
-                                try:
-                                    wattage_scailing_factor = float(state_structure.get("wattage_scailing_factor", 0.1))
-                                    if wattage_scailing_factor == 0:
-                                        self.logger.warning("outlet의 wattage scailing factor가 0으로 해석되고있습니다. 기본값인 0.1로 대체합니다.")
-                                        wattage_scailing_factor = 0.1
-                                except (ValueError, TypeError):
-                                    self.logger.warning("outlet의 wattage scailing factor를 해석할 수 없습니다. 기본값인 0.1로 대체합니다.")
-                                    wattage_scailing_factor = 0.1
-                                try:
-                                    ecomode_scailing_factor = float(state_structure.get("ecomode_scailing_factor", 1))
-                                    if ecomode_scailing_factor == 0:
-                                        self.logger.warning("outlet의 ecomode scailing factor가 0으로 해석되고있습니다. 기본값인 1로 대체합니다.")
-                                        ecomode_scailing_factor = 1
-                                except (ValueError, TypeError):
-                                    self.logger.warning("outlet의 ecomode scailing factor를 해석할 수 없습니다. 기본값인 1로 대체합니다.")
-                                    ecomode_scailing_factor = 1
-
-                                consecutive_bytes = byte_data[4:7]
-                                try:
-                                    watt = int(consecutive_bytes.hex())
-                                except ValueError:
-                                    self.logger.error(f"콘센트 {device_id} 전력값/자동대기전력차단값 변환 중 오류 발생: {consecutive_bytes.hex()}")
-                                    watt = 0
-                                    
-                                if state_type_text == 'wattage':
-                                    self.logger.signal(f'{byte_data.hex()}: 콘센트 ### {device_id}번, 상태: {power_text}, 전력: {watt} x {wattage_scailing_factor}W')
-                                    await self.controller.state_updater.update_outlet(device_id, power_text, watt * wattage_scailing_factor, None, is_eco)
-                                elif state_type_text == 'ecomode':
-                                    self.logger.signal(f'{byte_data.hex()}: 콘센트 ### {device_id}번, 상태: {power_text}, 자동대기전력차단값: {watt} x {ecomode_scailing_factor} W')
-                                    await self.controller.state_updater.update_outlet(device_id, power_text, None, watt * ecomode_scailing_factor, is_eco)
-
-                            elif device_name == 'Fan':
-                                power_pos = field_positions.get('power', 1)
-                                power = byte_data[int(power_pos)]
-                                power_values = state_structure['structure'][power_pos]['values']
-                                power_hex = byte_to_hex_str(power)
-                                power_text = "OFF" if power_hex == power_values.get('off', '').upper() else "ON"
-                                speed_pos = field_positions.get('speed', 3)  
-                                speed = byte_data[int(speed_pos)]
-                                speed_values = state_structure['structure'][speed_pos]['values']
-                                speed_hex = byte_to_hex_str(speed)
-                                speed_text = speed_values.get(speed_hex, 'low')
-                                
-                                self.logger.signal(f'{byte_data.hex()}: 환기장치 ### {device_id}번, 상태: {power_text}, 속도: {speed_text}')
-                                await self.controller.state_updater.update_fan(device_id, power_text, speed_text)
-                            
-                            elif device_name == 'EV':
-                                power_pos = field_positions.get('power', 1)
-                                power = byte_data[int(power_pos)]
-                                power_values = state_structure['structure'][power_pos]['values']
-                                power_hex = byte_to_hex_str(power)
-                                power_text = "ON" if power_hex == power_values.get('on', '').upper() else "OFF"
-                                floor_pos = field_positions.get('floor', 3)
-                                floor = byte_data[int(floor_pos)]
-                                floor_hex = byte_to_hex_str(floor)
-                                self.logger.signal(f'{byte_data.hex()}: 엘리베이터 ### {device_id}번, 상태: {power_text}, 층: {floor_hex}')
-                                await self.controller.state_updater.update_ev(device_id, power_text, floor_hex)
-
-                            break
-                else:
+                if data != checksum(data):
                     self.logger.signal(f'체크섬 불일치: {data}')
-        
+                    continue
+                self.COLLECTDATA['recv_data'].append(data)
+                if len(self.COLLECTDATA['recv_data']) > 300:
+                    self.COLLECTDATA['recv_data'] = self.COLLECTDATA['recv_data'][-300:]
+
+                frame = bytes.fromhex(data)
+                decoder = compiled.state_decoder(frame)
+                if decoder is None:
+                    continue
+                device_id, fields = decoder.decode(frame)
+                self.logger.signal(f'{data}: {decoder.device} ### {device_id}번, {fields}')
+                await self.publish_state(decoder.device, device_id, fields)
+
         except Exception as e:
             self.logger.error(f"Elfin 데이터 처리 중 오류 발생: {str(e)}")
-            self.logger.debug(f"오류 상세 - raw_data: {raw_data}, device_name: {device_name if 'device_name' in locals() else 'N/A'}")
+            self.logger.debug(f"오류 상세 - raw_data: {raw_data}")
 
-    async def process_ha_command(self, topics: List[str], value: str) -> None:
-        try:
-            device = ''.join(re.findall('[a-zA-Z]', topics[1]))
-            device_id = int(''.join(re.findall('[0-9]', topics[1])))
-            action = topics[2]
+    async def publish_state(self, device: str, device_id: int, fields: Dict[str, Any]) -> None:
+        """해석한 상태를 기기별 StateUpdater 메서드로 보냅니다.
+
+        STATE_UPDATERS에 없는 기기는 출력 이름마다 상태 토픽으로 그대로 발행합니다.
+        숫자로 나타낼 수 있는 값(전력, 온도, 전원 등)은 상태 기록(history)에도 남깁니다.
+        """
+        if self.controller.history is not None:
+            self.controller.history.record(f'{device}{device_id}', fields)
+        state_updater = self.controller.state_updater
+        updater = STATE_UPDATERS.get(device)
+        if updater is None:
+            await state_updater.update_fields(device, device_id, fields)
+            return
+        method, arguments, optional = updater
+        values = [fields.get(name) for name in arguments]
+        missing = [name for name, value in zip(arguments, values) if value is None and name not in optional]
+        if missing:
+            self.logger.signal(f'{device} {device_id}번 상태를 해석할 수 없습니다: {missing}')
+            return
+        await getattr(state_updater, method)(device_id, *values)
 
-            assert isinstance(self.DEVICE_STRUCTURE, dict), "DEVICE_STRUCTURE must be a dictionary"
+    def build_topic_routes(self) -> int:
+        """기기 목록과 패킷 구조로 HA 명령 토픽 라우터를 만듭니다. 만든 경로 수를 반환합니다.
 
-            if device not in self.DEVICE_STRUCTURE:
-                self.logger.error(f'장치 {device}가 DEVICE_STRUCTURE에 존재하지 않습니다.')
-                return
+        ('Light1', 'power') 같은 (기기 토픽, action) 쌍마다 값별 명령 패킷을 미리 만들어 두므로
+        process_ha_command는 토픽을 해석하거나 YAML 구조를 뒤지지 않고 딕셔너리 조회로 명령을 찾습니다.
+        """
+        self.topic_routes = self.compile_topic_routes(self.controller.compiled_structure)
+        return len(self.topic_routes)
 
-            packet_hex = None
-            packet = bytearray(7)
-            device_structure = self.DEVICE_STRUCTURE[device]
-            command = device_structure["command"]
-            field_positions = command["fieldPositions"]
-            
-            packet[0] = int(device_structure["command"]["header"], 16)
-            packet[int(field_positions["deviceId"])] = device_id
-
-            if device == 'Light':
-                if action == 'power':
-                    power_value = command["structure"][str(field_positions["power"])]["values"]["on" if value == "ON" else "off"]
-                    packet[int(field_positions["power"])] = int(power_value, 16)
-                    self.logger.info(f'조명 {device_id} {action} {value} 명령 생성 {packet.hex().upper()}')
-                #TODO: dimmer 추가
-            elif device == 'LightBreaker':
-                command_type_value = command["structure"][str(field_positions["commandType"])]["values"]["power"]
-                packet[int(field_positions["commandType"])] = int(command_type_value, 16)
-                power_value = command["structure"][str(field_positions["power"])]["values"]["on" if value == "ON" else "off"]
-                packet[int(field_positions["power"])] = int(power_value, 16)
-                self.logger.info(f'조명차단기 {device_id} {action} {value} 명령 생성 {packet.hex().upper()}')
-            elif device == 'Outlet':
-                if action == 'power':
-                    command_type_value = command["structure"][str(field_positions["commandType"])]["values"]["power"]
-                    packet[int(field_positions["commandType"])] = int(command_type_value, 16)
-                    power_value = command["structure"][str(field_positions["power"])]["values"]["on" if value == "ON" else "off"]
-                    packet[int(field_positions["power"])] = int(power_value, 16)
-                    self.logger.info(f'콘센트 {device_id} {action} {value} 명령 생성 {packet.hex().upper()}')
-                elif action == 'ecomode':
-                    command_type_value = command["structure"][str(field_positions["commandType"])]["values"]["ecomode"]
-                    packet[int(field_positions["commandType"])] = int(command_type_value, 16)
-                    power_value = command["structure"][str(field_positions["power"])]["values"]["on" if value == "ON" else "off"]
-                    packet[int(field_positions["power"])] = int(power_value, 16)
-                    self.logger.info(f'콘센트 {device_id} {action} {value} 명령 생성 {packet.hex().upper()}')
-                elif action == 'setCutoff':
-                    command_type_value = command["structure"][str(field_positions["commandType"])]["values"]["setCutoff"]
-                    packet[int(field_positions["commandType"])] = int(command_type_value, 16)
-                    packet[int(field_positions["cutoffValue"])] = int(value, 16)
-                    self.logger.info(f'콘센트 {device_id} {action} {value} 명령 생성 {packet.hex().upper()}')
-            elif device == 'Gas':
-                # 가스밸브 차단 명령
-                if value == "PRESS" or value == "ON":
-                    power_value = command["structure"][str(field_positions["power"])]["values"]["off"]
-                    packet[int(field_positions["power"])] = int(power_value, 16)
-                    self.logger.info(f'가스차단기 {device_id} 차단 명령 생성 {packet.hex().upper()}')
-            elif device == 'Thermo':                
-                if action == 'power':
-                    if value == 'heat':
-                        packet_hex = self.make_climate_command(device_id, 0, 'commandON')
-                    else:
-                        packet_hex = self.make_climate_command(device_id, 0, 'commandOFF')
-                elif action == 'setTemp':
-                    try:
-                        set_temp = int(float(value))
-                        min_temp = int(self.config['climate_settings'].get('min_temp', 5))
-                        max_temp = int(self.config['climate_settings'].get('max_temp', 40))
-                        
-                        if not min_temp <= set_temp <= max_temp:
-                            self.logger.error(f"설정 온도가 허용 범위를 벗어났습니다: {set_temp}°C (허용범위: {min_temp}~{max_temp}°C)")
-                            return
-                    except ValueError as e:
-                        self.logger.error(f"온도 값이 올바르지 않습니다: {value}")
-                        return
-                    packet_hex = self.make_climate_command(device_id, set_temp, 'commandCHANGE')
-                self.logger.info(f'온도조절기 {device_id} {action} {value} 명령 생성 {packet_hex}')
-            elif device == 'Fan':
-                if action == 'power':
-                    command_type_value = command["structure"][str(field_positions["commandType"])]["values"]["power"]
-                    packet[int(field_positions["commandType"])] = int(command_type_value, 16)
-                    power_value = command["structure"][str(field_positions["value"])]["values"]["on" if value == "ON" else "off"]
-                    packet[int(field_positions["value"])] = int(power_value, 16)
-                elif action == 'speed':
-                    if value not in ["low", "medium", "high"]:
-                        self.logger.error(f"잘못된 팬 속도입니다: {value}")
-                        return
-                    command_type_value = command["structure"][str(field_positions["commandType"])]["values"]["setSpeed"]
-                    packet[int(field_positions["commandType"])] = int(command_type_value, 16)
-                    value_value = command["structure"][str(field_positions["value"])]["values"][value]
-                    packet[int(field_positions["value"])] = int(value_value, 16)
-                self.logger.info(f'환기장치 {device_id} {action} {value} 명령 생성 {packet.hex().upper()}')
-            elif device == 'EV':
-                # 엘리베이터 호출 명령
-                if value == "PRESS" or value == "ON":
-                    # EV 헤더 A0가 중복이라 따로 처리함..
-                    packet[0] = int("A0", 16)
-                    packet[int(field_positions["power"])] = int(command["structure"][str(field_positions["power"])]["values"]["on"], 16)
-                    packet[int(field_positions["unknown1"])] = int(command["structure"][str(field_positions["unknown1"])]["values"]["fixed"], 16)
-                    packet[int(field_positions["unknown2"])] = int(command["structure"][str(field_positions["unknown2"])]["values"]["fixed"], 16)
-                    packet[int(field_positions["unknown3"])] = int(command["structure"][str(field_positions["unknown3"])]["values"]["fixed"], 16)
-                    self.logger.info(f'엘리베이터 {device_id} 호출 명령 생성 {packet.hex().upper()}')
+    def compile_topic_routes(self, compiled: Optional[CompiledStructure]) -> Dict[Tuple[str, str], TopicRoute]:
+        """주어진 구조로 토픽 라우터를 만들어 반환합니다. 현재 라우터는 바꾸지 않습니다."""
+        devices = compiled.devices if compiled is not None else None
+        return build_topic_routes(devices, self.controller.device_list, self.logger)
 
-            if packet_hex is None:
-                packet_hex = packet.hex().upper()
-                packet_hex = checksum(packet_hex)
+    def route_topic(self, topics: List[str]) -> Optional[TopicRoute]:
+        """HA 명령 토픽(['commax', 'Light1', 'power', 'command'])에 해당하는 경로를 찾습니다."""
+        if len(topics) < 3:
+            return None
+        return self.topic_routes.get((topics[1], topics[2])) or self.topic_routes.get((topics[1], '*'))
+
+    def command_packet(self, route: TopicRoute, value: str) -> Optional[str]:
+        """경로에 미리 만들어 둔 패킷에서 HA 값에 맞는 명령 패킷을 찾거나 템플릿으로 만듭니다."""
+        if route.template is None:
+            return route.packets.get(value, route.default)
+        if route.param == 'temperature':
+            try:
+                set_temp = int(float(value))
+            except ValueError:
+                self.logger.error(f"온도 값이 올바르지 않습니다: {value}")
+                return None
+            min_temp = int(self.config['climate_settings'].get('min_temp', 5))
+            max_temp = int(self.config['climate_settings'].get('max_temp', 40))
+            if not min_temp <= set_temp <= max_temp:
+                self.logger.error(f"설정 온도가 허용 범위를 벗어났습니다: {set_temp}°C (허용범위: {min_temp}~{max_temp}°C)")
+                return None
+            # 온도는 10진수 자릿수를 그대로 16진수 바이트로 씁니다 (24°C -> 0x24)
+            return route.template.build(int(str(set_temp), 16))
+        try:
+            byte = int(value, 16)
+        except ValueError:
+            byte = -1
+        if not 0 <= byte <= 0xFF:
+            self.logger.error(f"명령 값이 올바르지 않습니다: {value}")
+            return None
+        return route.template.build(byte)
 
-            if packet_hex:
+    async def process_ha_command(self, topics: List[str], value: str) -> None:
+        route = self.route_topic(topics)
+        if route is None:
+            self.logger.warning(f'처리할 수 없는 HA 명령 토픽입니다: {"/".join(topics)}')
+            return
+        try:
+            packet_hex = self.command_packet(route, value)
+            if packet_hex is None:
+                self.logger.warning(f'{topics[1]} {topics[2]}에 보낼 수 없는 값입니다: {value}')
+            else:
+                self.logger.info(f'{topics[1]} {topics[2]} {value} 명령 생성 {packet_hex}')
                 expected_state = self.generate_expected_state_packet(packet_hex)
                 if expected_state:
                     self.logger.debug(f'예상 상태 패킷: {expected_state}')
-                    self.QUEUE.append({
-                        'sendcmd': packet_hex, 
-                        'count': 0, 
-                        'expected_state': expected_state,
-                        'received_count': 0
-                    })
                 else:
                     self.logger.debug('예상 상태 패킷 없음. 최대 전송 횟수만큼 전송합니다.')
-                    self.QUEUE.append({
-                        'sendcmd': packet_hex, 
-                        'count': 0, 
-                        'expected_state': None,
-                        'received_count': 0
-                    })
+                # 긴급 기기(가스, 엘리베이터)는 먼저 보내고 기한 없이 재전송합니다
+                priority = self.controller.command_scheduler.priority_for(route.device)
+                deadline_seconds = self.controller.command_deadline
+                self.QUEUE.append({
+                    'sendcmd': packet_hex,
+                    'count': 0,
+                    'expected_state': expected_state,
+                    'received_count': 0,
+                    'priority': priority,
+                    'deadline': (time.monotonic() + deadline_seconds
+                                 if deadline_seconds > 0 and priority != PRIORITY_CRITICAL else None)
+                })
         except Exception as e:
-            self.logger.error(f"HA 명령 처리 중 오류 발생: {str(e)}") 
\ No newline at end of file
+            self.logger.error(f"HA 명령 처리 중 오류 발생: {str(e)}")
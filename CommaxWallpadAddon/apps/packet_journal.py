@@ -0,0 +1,365 @@
+"""원시 패킷을 바이너리로 기록하는 추가 전용(append-only) 저널 모듈입니다.
+
+저널은 크기 기준으로 회전하는 세그먼트 파일(``*.bin``)과 세그먼트마다 하나씩 있는
+희소 시간 인덱스(``*.idx``)로 구성됩니다. 시간 범위 조회 시 인덱스에서 시작 위치를
+찾아 바로 seek 하므로 전체 로그를 처음부터 훑지 않아도 됩니다.
+
+레코드 형식 (little endian):
+    timestamp_ns (uint64) | direction (uint8) | length (uint8) | payload (length 바이트)
+
+인덱스 형식 (little endian):
+    timestamp_ns (uint64) | offset (uint64)
+
+명령행 사용 예:
+    python3 -m apps.packet_journal --header 82 --start 03:00 --end 03:05
+"""
+
+import os
+import sys
+import time
+import struct
+import bisect
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+RECORD_HEADER = struct.Struct('<QBB')
+INDEX_ENTRY = struct.Struct('<QQ')
+
+DIRECTION_RECV = 0
+DIRECTION_SEND = 1
+DIRECTIONS = {'recv': DIRECTION_RECV, 'send': DIRECTION_SEND}
+DIRECTION_NAMES = {value: key for key, value in DIRECTIONS.items()}
+
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.bin'
+INDEX_SUFFIX = '.idx'
+
+
+class JournalFrame(TypedDict):
+    timestamp: int
+    direction: str
+    packet: str
+
+
+class _Segment:
+    """세그먼트 파일 하나의 경로와 시작 시각 정보"""
+
+    def __init__(self, directory: str, start_ns: int) -> None:
+        self.start_ns = start_ns
+        base = os.path.join(directory, f'{SEGMENT_PREFIX}{start_ns:020d}')
+        self.data_path = base + SEGMENT_SUFFIX
+        self.index_path = base + INDEX_SUFFIX
+
+    def load_index(self) -> Tuple[List[int], List[int]]:
+        """희소 인덱스를 (timestamps, offsets) 두 리스트로 읽어옵니다."""
+        timestamps: List[int] = []
+        offsets: List[int] = []
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return timestamps, offsets
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for ts, offset in INDEX_ENTRY.iter_unpack(data[:usable]):
+            timestamps.append(ts)
+            offsets.append(offset)
+        return timestamps, offsets
+
+
+class PacketJournal:
+    """원시 패킷을 세그먼트 파일에 기록하고 시간 범위로 조회하는 클래스
+
+    Args:
+        directory (str): 세그먼트를 저장할 디렉토리
+        segment_size (int): 세그먼트 회전 기준 크기 (바이트)
+        max_segments (int): 보관할 최대 세그먼트 수. 초과 시 가장 오래된 세그먼트부터 삭제
+        index_interval (int): 몇 개의 레코드마다 인덱스 항목을 남길지
+        flush_interval (float): 버퍼를 디스크로 내보내는 최대 간격 (초)
+    """
+
+    def __init__(self,
+                 directory: str,
+                 segment_size: int = 4 * 1024 * 1024,
+                 max_segments: int = 64,
+                 index_interval: int = 256,
+                 flush_interval: float = 1.0,
+                 logger: Any = None) -> None:
+        self.directory = directory
+        self.segment_size = max(int(segment_size), 1024)
+        self.max_segments = max(int(max_segments), 1)
+        self.index_interval = max(int(index_interval), 1)
+        self.flush_interval = flush_interval
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._segment: Optional[_Segment] = None
+        self._data_file: Any = None
+        self._index_file: Any = None
+        self._records_since_index = 0
+        self._last_ts = 0
+        self._last_flush = 0.0
+
+    # ------------------------------------------------------------------
+    # 기록
+    # ------------------------------------------------------------------
+    def append(self, payload: bytes, direction: str = 'recv', timestamp_ns: Optional[int] = None) -> None:
+        """패킷 하나를 저널에 기록합니다. 기록 실패는 로그만 남기고 무시합니다."""
+        if not payload:
+            return
+        ts = time.time_ns() if timestamp_ns is None else timestamp_ns
+        direction_code = DIRECTIONS.get(direction, DIRECTION_RECV)
+        try:
+            with self._lock:
+                # 시간 인덱스의 이진 탐색을 위해 타임스탬프가 줄어들지 않도록 보정
+                ts = max(ts, self._last_ts)
+                self._last_ts = ts
+                self._ensure_segment(ts)
+                for start in range(0, len(payload), 255):
+                    self._write_record(ts, direction_code, payload[start:start + 255])
+                now = time.monotonic()
+                if now - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+                    self._last_flush = now
+        except OSError as e:
+            self._log_error(f'패킷 저널 기록 실패: {e}')
+
+    def append_frames(self, data: bytes, direction: str = 'recv', frame_size: int = 8) -> None:
+        """수신 버퍼를 frame_size 단위의 프레임으로 나누어 같은 시각으로 기록합니다."""
+        ts = time.time_ns()
+        for start in range(0, len(data), frame_size):
+            self.append(data[start:start + frame_size], direction, ts)
+
+    def _write_record(self, ts: int, direction_code: int, payload: bytes) -> None:
+        assert self._data_file is not None and self._index_file is not None
+        if self._records_since_index == 0:
+            self._index_file.write(INDEX_ENTRY.pack(ts, self._data_file.tell()))
+        self._data_file.write(RECORD_HEADER.pack(ts, direction_code, len(payload)))
+        self._data_file.write(payload)
+        self._records_since_index = (self._records_since_index + 1) % self.index_interval
+
+    def _ensure_segment(self, ts: int) -> None:
+        if self._data_file is not None and self._data_file.tell() < self.segment_size:
+            return
+        self._close_locked()
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment = _Segment(self.directory, ts)
+        self._data_file = open(self._segment.data_path, 'ab')
+        self._index_file = open(self._segment.index_path, 'ab')
+        self._records_since_index = 0
+        self._prune_segments()
+
+    def _prune_segments(self) -> None:
+        segments = self._list_segments()
+        for segment in segments[:-self.max_segments]:
+            for path in (segment.data_path, segment.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._data_file is not None:
+            self._data_file.flush()
+        if self._index_file is not None:
+            self._index_file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self) -> None:
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+        self._data_file = None
+        self._index_file = None
+        self._segment = None
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def _list_segments(self) -> List[_Segment]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    start_ns = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                segments.append(_Segment(self.directory, start_ns))
+        segments.sort(key=lambda segment: segment.start_ns)
+        return segments
+
+    def query(self,
+              start_ns: int,
+              end_ns: int,
+              header: Optional[int] = None,
+              direction: Optional[str] = None,
+              limit: Optional[int] = None) -> Iterator[JournalFrame]:
+        """[start_ns, end_ns] 구간의 프레임을 시간순으로 반환합니다.
+
+        Args:
+            start_ns (int): 시작 시각 (epoch ns)
+            end_ns (int): 종료 시각 (epoch ns)
+            header (Optional[int]): 첫 바이트가 일치하는 프레임만 반환
+            direction (Optional[str]): 'recv' 또는 'send'
+            limit (Optional[int]): 최대 반환 개수 (1 미만이면 아무것도 반환하지 않음)
+
+        Raises:
+            ValueError: 알 수 없는 direction인 경우
+        """
+        if direction and direction not in DIRECTIONS:
+            raise ValueError(f"direction은 {', '.join(sorted(DIRECTIONS))} 중 하나여야 합니다: {direction}")
+        if limit is not None and limit < 1:
+            return
+        self.flush()
+        direction_code = DIRECTIONS.get(direction) if direction else None
+        segments = self._list_segments()
+        count = 0
+        for i, segment in enumerate(segments):
+            next_start = segments[i + 1].start_ns if i + 1 < len(segments) else None
+            if segment.start_ns > end_ns:
+                break
+            if next_start is not None and next_start < start_ns:
+                continue
+            for ts, code, payload in self._scan_segment(segment, start_ns, end_ns):
+                if direction_code is not None and code != direction_code:
+                    continue
+                if header is not None and payload[0] != header:
+                    continue
+                yield JournalFrame(
+                    timestamp=ts,
+                    direction=DIRECTION_NAMES.get(code, 'recv'),
+                    packet=payload.hex().upper()
+                )
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+    def _scan_segment(self, segment: _Segment, start_ns: int, end_ns: int) -> Iterator[Tuple[int, int, bytes]]:
+        timestamps, offsets = segment.load_index()
+        # start_ns 이전의 마지막 인덱스 지점부터 읽기 시작
+        pos = bisect.bisect_left(timestamps, start_ns) - 1
+        offset = offsets[pos] if pos >= 0 else 0
+        try:
+            f = open(segment.data_path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            while True:
+                head = f.read(RECORD_HEADER.size)
+                if len(head) < RECORD_HEADER.size:
+                    return
+                ts, code, length = RECORD_HEADER.unpack(head)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                if ts > end_ns:
+                    return
+                if ts >= start_ns and payload:
+                    yield ts, code, payload
+
+    def stats(self) -> Dict[str, Any]:
+        """저널 디렉토리의 세그먼트 수, 총 크기, 보관 구간 정보를 반환합니다."""
+        segments = self._list_segments()
+        total = 0
+        for segment in segments:
+            try:
+                total += os.path.getsize(segment.data_path)
+            except OSError:
+                pass
+        return {
+            'directory': self.directory,
+            'segments': len(segments),
+            'bytes': total,
+            'oldest': segments[0].start_ns if segments else None,
+            'last': self._last_ts or None
+        }
+
+    def _log_error(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.error(message)
+        else:
+            print(message, file=sys.stderr)
+
+
+def parse_time(value: str, base_date: Optional[datetime] = None) -> int:
+    """'HH:MM', 'HH:MM:SS', 'YYYY-MM-DD HH:MM[:SS]' 또는 epoch 초를 epoch ns로 변환합니다.
+
+    시각만 주어진 경우 base_date(기본값: 오늘)의 해당 시각으로 해석합니다.
+    """
+    value = value.strip()
+    try:
+        return int(float(value) * 1_000_000_000)
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M'):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp() * 1_000_000_000)
+        except ValueError:
+            continue
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        base = base_date or datetime.now()
+        combined = base.replace(hour=parsed.hour, minute=parsed.minute, second=parsed.second, microsecond=0)
+        return int(combined.timestamp() * 1_000_000_000)
+    raise ValueError(f'시간 형식을 해석할 수 없습니다: {value}')
+
+
+def parse_time_range(start: str, end: str, date: Optional[str] = None) -> Tuple[int, int]:
+    """시작/종료 문자열을 epoch ns 구간으로 변환합니다. 종료가 시작보다 이르면 다음날로 봅니다."""
+    base_date = datetime.strptime(date, '%Y-%m-%d') if date else None
+    start_ns = parse_time(start, base_date)
+    end_ns = parse_time(end, base_date)
+    if end_ns < start_ns and ':' in end and '-' not in end:
+        end_ns += int(timedelta(days=1).total_seconds() * 1_000_000_000)
+    return start_ns, end_ns
+
+
+def format_timestamp(timestamp_ns: int) -> str:
+    dt = datetime.fromtimestamp(timestamp_ns / 1_000_000_000)
+    return dt.strftime('%Y-%m-%d %H:%M:%S.') + f'{(timestamp_ns // 1_000_000) % 1000:03d}'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Commax 패킷 저널 조회')
+    parser.add_argument('--dir', default='/share/packet_journal', help='저널 디렉토리')
+    parser.add_argument('--start', required=True, help='시작 시각 (예: 03:00, "2025-03-21 03:00")')
+    parser.add_argument('--end', required=True, help='종료 시각 (예: 03:05)')
+    parser.add_argument('--date', help='시각만 입력한 경우 기준 날짜 (YYYY-MM-DD, 기본값: 오늘)')
+    parser.add_argument('--header', help='헤더 바이트 필터 (16진수, 예: 82)')
+    parser.add_argument('--direction', choices=sorted(DIRECTIONS), help='송수신 방향 필터')
+    parser.add_argument('--limit', type=int, help='최대 출력 개수')
+    args = parser.parse_args(argv)
+
+    try:
+        start_ns, end_ns = parse_time_range(args.start, args.end, args.date)
+        header = int(args.header, 16) if args.header else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    journal = PacketJournal(args.dir)
+    for frame in journal.query(start_ns, end_ns, header, args.direction, args.limit):
+        print(f"{format_timestamp(frame['timestamp'])} {frame['direction']:<4} {frame['packet']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
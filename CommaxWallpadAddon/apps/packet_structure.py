@@ -0,0 +1,307 @@
+"""패킷 구조 YAML을 읽어 컴파일하고, 컴파일 결과를 캐시 파일로 보관하는 모듈입니다.
+
+YAML 파싱은 armhf 같은 느린 기기에서 눈에 띄게 오래 걸리므로 파싱 결과를 캐시 파일로
+저장해 두고, 원본 파일의 경로/mtime/해시가 같으면 YAML을 다시 파싱하지 않습니다.
+캐시는 코드를 실행할 수 없는 데이터 전용 형식(marshal)으로 저장하고, 읽을 때 구조를 다시
+컴파일합니다. libyaml이 설치되어 있으면 C 로더를 사용합니다.
+"""
+
+import os
+import copy
+import marshal
+import hashlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml  # type: ignore #PyYAML
+
+from .field_codecs import StateDecoder, compile_state_decoder
+from .publish_filter import PublishRule, compile_publish_rules
+
+try:
+    from yaml import CSafeLoader as YamlLoader  # type: ignore
+    from yaml import CSafeDumper as YamlDumper  # type: ignore
+except ImportError:  # libyaml이 없는 환경
+    from yaml import SafeLoader as YamlLoader  # type: ignore
+    from yaml import SafeDumper as YamlDumper  # type: ignore
+
+# 컴파일 결과의 형태가 바뀌면 올려서 이전 캐시를 무효화합니다.
+CACHE_FORMAT_VERSION = 2
+PACKET_TYPES = ('command', 'state', 'state_request', 'ack')
+
+# 예전 기본 파일을 복사한 커스텀 구조에 남아 있는 헤더 -> 지금 헤더
+# (엘리베이터 호출 헤더는 예전 기본 파일에서 FF였고 command_table이 A0으로 덮어썼습니다)
+LEGACY_HEADERS: Dict[Tuple[str, str], Dict[str, str]] = {
+    ('EV', 'command'): {'FF': 'A0'},
+}
+
+
+class HeaderCandidate(NamedTuple):
+    """헤더 바이트 하나를 쓰는 (기기, 패킷 타입) 후보
+
+    Attributes:
+        device (str): 기기 이름
+        packet_type (str): 패킷 타입
+        length (int): 패킷 길이 (체크섬 포함 바이트 수)
+        fixed (Tuple[Tuple[int, int], ...]): 항상 같은 값인 바이트의 (위치, 값).
+            'fixed' 값 하나만 있는 필드와 empty(00) 필드로 만듭니다.
+    """
+    device: str
+    packet_type: str
+    length: int
+    fixed: Tuple[Tuple[int, int], ...]
+
+    def matches(self, frame: bytes) -> bool:
+        """프레임이 길이와 고정 바이트에 맞는지 확인합니다. (체크섬이 없는 프레임도 허용)"""
+        if len(frame) > self.length:
+            return False
+        return all(frame[pos] == byte for pos, byte in self.fixed if pos < len(frame))
+
+
+def _header_candidate(device_name: str, packet_type: str, packet: Dict[str, Any]) -> HeaderCandidate:
+    structure = packet.get('structure', {})
+    fixed = []
+    for pos, field in structure.items():
+        values = field.get('values')
+        if field.get('name') == 'empty':
+            fixed.append((int(pos), 0))
+        elif isinstance(values, dict) and list(values) == ['fixed']:
+            try:
+                fixed.append((int(pos), int(str(values['fixed']), 16)))
+            except ValueError:
+                continue
+    length = max((int(pos) for pos in structure), default=6) + 1
+    return HeaderCandidate(device_name, packet_type, length, tuple(sorted(fixed)))
+
+
+def load_yaml(text: str) -> Any:
+    """YAML 문자열을 (가능하면 C 로더로) 파싱합니다."""
+    return yaml.load(text, Loader=YamlLoader)
+
+
+def dump_yaml(data: Any, stream: Any) -> None:
+    """패킷 구조를 기존 저장 형식(유니코드 허용, 키 순서 유지)으로 YAML에 씁니다."""
+    yaml.dump(data, stream, Dumper=YamlDumper, allow_unicode=True, sort_keys=False)
+
+
+class CompiledStructure:
+    """파싱 및 컴파일이 끝난 패킷 구조
+
+    Attributes:
+        raw (Dict[str, Any]): YAML 원본 그대로의 구조 (편집기용)
+        devices (Dict[str, Any]): fieldPositions가 추가된 구조 (DEVICE_STRUCTURE)
+        header_index (Dict[str, Dict[int, str]]): 패킷 타입별 {헤더 바이트: 기기 이름}
+        header_candidates (Dict[int, Tuple[HeaderCandidate, ...]]):
+            헤더 바이트별로 그 헤더를 쓰는 모든 (기기, 패킷 타입) 후보 (구조 순서)
+        value_tables (Dict[Tuple[str, str, int], Dict[str, int]]):
+            (기기, 패킷 타입, 위치)별 {값 이름: 바이트 값}
+        reverse_value_tables (Dict[Tuple[str, str, int], Dict[int, str]]):
+            (기기, 패킷 타입, 위치)별 {바이트 값: 값 이름}
+        state_decoders (Dict[int, StateDecoder]): 상태 헤더 바이트별 필드 디코더
+        device_state_decoders (Dict[str, StateDecoder]): 기기 이름별 상태 필드 디코더
+        publish_rules (Dict[Tuple[str, str], PublishRule]): (기기, 상태 이름)별 HA 발행 규칙
+        version (str): 원본 내용 해시로 만든 구조 버전
+
+    컴파일이 끝난 뒤에는 속성을 바꿀 수 없습니다. 구조를 바꾸려면 새 객체를 만들어
+    컨트롤러의 apply_structure()로 통째로 교체합니다. 그래서 소비자는 한 작업 동안
+    참조 하나를 잡고 있으면 항상 같은 버전의 구조만 보게 됩니다.
+    """
+
+    def __init__(self, raw: Dict[str, Any], source_path: str = '', mtime_ns: int = 0,
+                 digest: str = '', logger: Any = None) -> None:
+        self.format_version = CACHE_FORMAT_VERSION
+        self.source_path = source_path
+        self.mtime_ns = mtime_ns
+        self.digest = digest or hashlib.sha256(repr(raw).encode('utf-8')).hexdigest()
+        self.version = self.digest[:12]
+        self.raw = raw
+        self.devices: Dict[str, Any] = copy.deepcopy(raw)
+        self.header_index: Dict[str, Dict[int, str]] = {packet_type: {} for packet_type in PACKET_TYPES}
+        self.header_candidates: Dict[int, Tuple[HeaderCandidate, ...]] = {}
+        self.value_tables: Dict[Tuple[str, str, int], Dict[str, int]] = {}
+        self.reverse_value_tables: Dict[Tuple[str, str, int], Dict[int, str]] = {}
+        self.state_decoders: Dict[int, StateDecoder] = {}
+        self.device_state_decoders: Dict[str, StateDecoder] = {}
+        self.publish_rules: Dict[Tuple[str, str], PublishRule] = {}
+        self._compile(logger)
+        self._frozen = True
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'컴파일된 패킷 구조는 바꿀 수 없습니다: {name}')
+        super().__setattr__(name, value)
+
+    def _compile(self, logger: Any) -> None:
+        candidates: Dict[int, List[HeaderCandidate]] = {}
+        for device_name, device in self.devices.items():
+            self.publish_rules.update(compile_publish_rules(device_name, device, logger))
+            for packet_type in PACKET_TYPES:
+                if packet_type not in device:
+                    continue
+                packet = device[packet_type]
+                legacy = LEGACY_HEADERS.get((device_name, packet_type), {}).get(str(packet.get('header', '')).upper())
+                if legacy:
+                    if logger:
+                        logger.warning(f"{device_name}.{packet_type}의 헤더 {packet['header']}는 예전 값입니다. "
+                                       f"{legacy}로 바꿔 사용합니다. (커스텀 패킷 구조 파일도 고쳐주세요)")
+                    packet['header'] = legacy
+                try:
+                    header = int(packet['header'], 16)
+                except (KeyError, TypeError, ValueError):
+                    if logger:
+                        logger.error(f"잘못된 헤더: {device_name}.{packet_type} - {packet.get('header')}")
+                else:
+                    owner = self.header_index[packet_type].setdefault(header, device_name)
+                    if owner != device_name and logger:
+                        logger.warning(f"{device_name}.{packet_type}의 헤더 {packet['header']}를 "
+                                       f"{owner}.{packet_type}도 사용합니다. 고정 바이트로 구분합니다.")
+                    candidates.setdefault(header, []).append(_header_candidate(device_name, packet_type, packet))
+
+                structure = packet.get('structure', {})
+                field_positions = {}
+                for pos, field in structure.items():
+                    field_name = field['name']
+                    if field_name != 'empty':
+                        if field_name in field_positions:
+                            if logger:
+                                logger.error(
+                                    f"중복된 필드 이름 발견: {device_name}.{packet_type} - "
+                                    f"'{field_name}' (위치: {field_positions[field_name]}, {pos})"
+                                )
+                        else:
+                            field_positions[field_name] = pos
+
+                    values = field.get('values')
+                    if isinstance(values, dict):
+                        table: Dict[str, int] = {}
+                        for value_name, value_hex in values.items():
+                            try:
+                                table[str(value_name)] = int(str(value_hex), 16)
+                            except ValueError:
+                                continue
+                        key = (device_name, packet_type, int(pos))
+                        self.value_tables[key] = table
+                        self.reverse_value_tables[key] = {byte: name for name, byte in reversed(list(table.items()))}
+
+                if packet_type in ('command', 'state'):
+                    packet['fieldPositions'] = field_positions
+
+            if 'state' in device:
+                decoder = compile_state_decoder(device_name, device['state'], self.value_tables, logger)
+                try:
+                    header = int(device['state']['header'], 16)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if decoder is not None:
+                    self.state_decoders.setdefault(header, decoder)
+                    self.device_state_decoders[device_name] = decoder
+
+        self.header_candidates = {header: tuple(found) for header, found in candidates.items()}
+
+    def find_device(self, packet_type: str, header: int) -> Optional[str]:
+        """헤더 바이트로 기기 이름을 찾습니다."""
+        return self.header_index.get(packet_type, {}).get(header)
+
+    def identify(self, frame: bytes, packet_type: Optional[str] = None) -> Optional[HeaderCandidate]:
+        """프레임의 (기기, 패킷 타입)을 찾습니다. 맞는 후보가 없으면 None
+
+        같은 헤더를 쓰는 후보가 여럿이면 길이와 고정 바이트가 맞는 후보 중
+        고정 바이트가 가장 많은(가장 구체적인) 후보를, 같으면 구조에 먼저 나온 후보를 고릅니다.
+        """
+        if not frame:
+            return None
+        best: Optional[HeaderCandidate] = None
+        for candidate in self.header_candidates.get(frame[0], ()):
+            if packet_type is not None and candidate.packet_type != packet_type:
+                continue
+            if candidate.matches(frame) and (best is None or len(candidate.fixed) > len(best.fixed)):
+                best = candidate
+        return best
+
+    def state_decoder(self, frame: bytes) -> Optional[StateDecoder]:
+        """수신 프레임을 해석할 상태 디코더를 찾습니다. 상태 패킷이 아니면 None"""
+        candidates = self.header_candidates.get(frame[0], ()) if frame else ()
+        if len(candidates) == 1:
+            return self.state_decoders.get(frame[0])
+        candidate = self.identify(frame)
+        if candidate is None or candidate.packet_type != 'state':
+            return None
+        return self.device_state_decoders.get(candidate.device)
+
+
+def _cache_file(cache_dir: str, source_path: str) -> str:
+    name = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'packet_structure_{name}.marshal')
+
+
+def _read_cache(cache_path: str, source_path: str, mtime_ns: int, digest: str) -> Optional[Dict[str, Any]]:
+    """캐시에서 YAML 파싱 결과(raw)를 읽습니다. 원본과 맞지 않거나 손상되었으면 None"""
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = marshal.load(f)
+    except Exception:
+        return None
+    if (isinstance(cached, dict)
+            and cached.get('format_version') == CACHE_FORMAT_VERSION
+            and cached.get('source_path') == source_path
+            and cached.get('mtime_ns') == mtime_ns
+            and cached.get('digest') == digest
+            and isinstance(cached.get('raw'), dict)):
+        return cached['raw']
+    return None
+
+
+def _write_cache(cache_path: str, compiled: CompiledStructure, logger: Any) -> None:
+    try:
+        try:
+            os.mkdir(os.path.dirname(cache_path))
+        except FileExistsError:
+            pass
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            marshal.dump({
+                'format_version': CACHE_FORMAT_VERSION,
+                'source_path': compiled.source_path,
+                'mtime_ns': compiled.mtime_ns,
+                'digest': compiled.digest,
+                'raw': compiled.raw
+            }, f)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        if logger:
+            logger.debug(f'패킷 구조 캐시 저장 실패: {e}')
+
+
+def load_structure(source_path: str, cache_dir: Optional[str] = None, logger: Any = None) -> CompiledStructure:
+    """패킷 구조 파일을 읽어 컴파일된 구조를 반환합니다.
+
+    cache_dir이 주어지면 원본의 경로, mtime, 내용 해시가 모두 같은 캐시의 파싱 결과를
+    재사용하고, 다르면 YAML을 다시 파싱하여 캐시를 갱신합니다.
+
+    Raises:
+        FileNotFoundError: 원본 파일이 없는 경우
+        yaml.YAMLError: YAML 형식이 잘못된 경우
+    """
+    with open(source_path, 'r', encoding='utf-8') as file:
+        text = file.read()
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    try:
+        mtime_ns = os.stat(source_path).st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+
+    cache_path = _cache_file(cache_dir, source_path) if cache_dir and mtime_ns else None
+    if cache_path:
+        cached = _read_cache(cache_path, source_path, mtime_ns, digest)
+        if cached is not None:
+            compiled = CompiledStructure(cached, source_path, mtime_ns, digest, logger)
+            if logger:
+                logger.debug(f'패킷 구조 캐시 사용: {cache_path} (version {compiled.version})')
+            return compiled
+
+    raw = load_yaml(text)
+    if not isinstance(raw, dict):
+        raise yaml.YAMLError(f'패킷 구조의 최상위는 기기 이름을 키로 하는 딕셔너리여야 합니다: {source_path}')
+    compiled = CompiledStructure(raw, source_path, mtime_ns, digest, logger)
+    if cache_path:
+        _write_cache(cache_path, compiled, logger)
+    return compiled
@@ -0,0 +1,110 @@
+"""숫자 상태 값(전력, 온도 등)의 HA 발행 횟수를 줄이는 발행 필터 모듈입니다.
+
+패킷 구조 파일의 기기 항목에 ``publish``로 상태 이름별 규칙을 선언합니다::
+
+    Outlet:
+      publish:
+        watt:
+          deadband: 1            # 마지막 발행 값과 이만큼 이상 달라야 발행
+          deadband_percent: 5    # 마지막 발행 값의 이 비율(%) 이상 달라야 발행 (deadband와 둘 중 큰 값)
+          min_interval: 5        # 마지막 발행 후 이 시간(초)이 지나기 전에는 발행하지 않음
+          max_interval: 300      # 값이 그대로여도 이 시간(초)이 지나면 다시 발행
+
+규칙이 없는 상태는 지금처럼 받을 때마다 발행합니다. 숫자가 아닌 값은 값이 바뀌었을 때만 변화로 봅니다.
+"""
+
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+
+class PublishRule(NamedTuple):
+    """상태 하나의 발행 규칙 (0이면 사용하지 않음)"""
+    deadband: float = 0.0
+    deadband_percent: float = 0.0
+    min_interval: float = 0.0
+    max_interval: float = 0.0
+
+
+def compile_publish_rules(device_name: str, device: Dict[str, Any],
+                          logger: Any = None) -> Dict[Tuple[str, str], PublishRule]:
+    """기기 항목의 publish 선언을 {(기기 이름, 상태 이름): 규칙}으로 컴파일합니다.
+
+    잘못된 선언은 로그를 남기고 그 상태만 건너뜁니다.
+    """
+    rules: Dict[Tuple[str, str], PublishRule] = {}
+    declared = device.get('publish')
+    if not isinstance(declared, dict):
+        return rules
+    for state, spec in declared.items():
+        try:
+            if not isinstance(spec, dict):
+                raise ValueError('규칙은 딕셔너리여야 합니다.')
+            unknown = set(spec) - set(PublishRule._fields)
+            if unknown:
+                raise ValueError(f'알 수 없는 항목입니다: {sorted(unknown)}')
+            rule = PublishRule(**{name: float(value) for name, value in spec.items()})
+            if min(rule) < 0:
+                raise ValueError('값은 0 이상이어야 합니다.')
+        except (TypeError, ValueError) as e:
+            if logger:
+                logger.error(f'발행 규칙을 해석할 수 없습니다 ({device_name}.publish.{state}): {e}')
+            continue
+        rules[(device_name, str(state))] = rule
+    return rules
+
+
+class PublishFilter:
+    """상태 토픽별 마지막 발행 값을 기억하고 규칙에 따라 발행 여부를 정하는 클래스"""
+
+    def __init__(self, rules: Optional[Dict[Tuple[str, str], PublishRule]] = None) -> None:
+        self.rules: Dict[Tuple[str, str], PublishRule] = rules or {}
+        # {토픽: (발행한 값, 숫자 값, 발행 시각)}
+        self.last: Dict[str, Tuple[str, Optional[float], float]] = {}
+        self.published = 0
+        self.suppressed = 0
+
+    def set_rules(self, rules: Dict[Tuple[str, str], PublishRule]) -> None:
+        """패킷 구조를 다시 로드했을 때 규칙을 바꿉니다. 마지막 발행 기록은 유지합니다."""
+        self.rules = dict(rules)
+
+    def reset(self) -> None:
+        """마지막 발행 기록을 지웁니다. HA가 다시 연결되면 모든 값을 처음처럼 다시 발행하도록 합니다."""
+        self.last.clear()
+
+    def allow(self, device: str, state: str, topic: str, value: str, now: Optional[float] = None) -> bool:
+        """topic에 value를 지금 발행해야 하는지 판단하고, 발행한다면 기록합니다."""
+        rule = self.rules.get((device, state))
+        if rule is None:
+            return True
+        now = time.monotonic() if now is None else now
+        try:
+            number: Optional[float] = float(value)
+        except ValueError:
+            number = None
+
+        last = self.last.get(topic)
+        if last is not None and not self._should_publish(rule, last, value, number, now):
+            self.suppressed += 1
+            return False
+        self.last[topic] = (value, number, now)
+        self.published += 1
+        return True
+
+    @staticmethod
+    def _should_publish(rule: PublishRule, last: Tuple[str, Optional[float], float],
+                        value: str, number: Optional[float], now: float) -> bool:
+        last_value, last_number, last_time = last
+        elapsed = now - last_time
+        if elapsed < rule.min_interval:
+            return False
+        if rule.max_interval and elapsed >= rule.max_interval:
+            return True
+        if number is None or last_number is None:
+            return value != last_value
+        delta = abs(number - last_number)
+        threshold = max(rule.deadband, abs(last_number) * rule.deadband_percent / 100)
+        # 부동소수점 오차로 경계값(예: 10.3 -> 11.3)이 걸러지지 않도록 약간 여유를 둡니다
+        return delta > 0 and delta >= threshold - 1e-9
+
+    def stats(self) -> Dict[str, Any]:
+        return {'rules': len(self.rules), 'published': self.published, 'suppressed': self.suppressed}
@@ -0,0 +1,150 @@
+"""기기별 응답 시간과 성공률을 학습해 명령 재전송 간격과 횟수를 정하는 모듈입니다.
+
+재전송 간격은 TCP 재전송 타이머처럼 (평균 응답 시간 + 4 x 편차)로 정하고,
+응답 시간 표본은 첫 전송에 바로 확인된 경우에만 사용합니다 (Karn 알고리즘).
+재전송할 때마다 간격을 BACKOFF배씩 늘려, 응답이 느린 기기에서도 표본을 얻을 수 있게 합니다.
+"""
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+RetryKey = Tuple[str, int]
+
+
+class DeviceRetryStats:
+    """기기 하나(기기 이름 + deviceId)의 응답 통계"""
+
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None  # 평균 응답 시간 (초, EWMA)
+        self.latency_dev = 0.0                # 응답 시간 편차 (초, EWMA)
+        self.attempts = 1.0                   # 확인까지 필요한 평균 전송 횟수 (EWMA)
+        self.success_rate = 1.0               # 확인 성공률 (EWMA)
+        self.samples = 0
+        self.failures = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'latency_dev_ms': round(self.latency_dev * 1000, 1),
+            'attempts': round(self.attempts, 2),
+            'success_rate': round(self.success_rate, 3),
+            'samples': self.samples,
+            'failures': self.failures
+        }
+
+
+class RetryPolicy:
+    """기기별 재전송 간격과 최대 전송 횟수를 정하는 클래스
+
+    Args:
+        controller: WallpadController 인스턴스 (명령 헤더로 기기를 찾는 데 사용)
+        default_interval (float): 학습 전 재전송 간격 (초)
+        min_interval (float): 재전송 간격 하한 (초)
+        max_interval (float): 재전송 간격 상한 (초)
+        min_count (int): 최대 전송 횟수 하한
+        max_count (int): 최대 전송 횟수 상한 (학습 전 기본값)
+        enabled (bool): False면 학습하지 않고 고정 간격/횟수를 사용
+    """
+
+    ALPHA = 0.2
+    BACKOFF = 1.5
+    # 성공률이 이보다 낮으면 횟수를 줄이지 않습니다
+    RELIABLE_SUCCESS_RATE = 0.8
+
+    def __init__(self,
+                 controller: Any,
+                 default_interval: float = 0.1,
+                 min_interval: float = 0.03,
+                 max_interval: float = 1.0,
+                 min_count: int = 3,
+                 max_count: int = 15,
+                 enabled: bool = True) -> None:
+        self.controller = controller
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.max_count = max_count
+        self.min_count = min(min_count, max_count)
+        self.enabled = enabled
+        self.devices: Dict[RetryKey, DeviceRetryStats] = {}
+
+    @classmethod
+    def from_config(cls, controller: Any) -> 'RetryPolicy':
+        settings = controller.config.get('command_settings', {})
+        return cls(
+            controller,
+            default_interval=float(settings.get('queue_interval_in_second', 0.1)),
+            min_interval=float(settings.get('min_retry_interval', 0.03)),
+            max_interval=float(settings.get('max_retry_interval', 1.0)),
+            max_count=int(settings.get('max_send_count', 15)),
+            enabled=bool(settings.get('adaptive_retry', True))
+        )
+
+    def key_for(self, packet_hex: str) -> Optional[RetryKey]:
+        """명령 패킷의 (기기 이름, deviceId)를 찾습니다. 구조에 없는 패킷이면 None"""
+        compiled = self.controller.compiled_structure
+        if compiled is None or len(packet_hex) < 4:
+            return None
+        device = compiled.find_device('command', int(packet_hex[:2], 16))
+        if device is None:
+            return None
+        device_id_pos = compiled.devices[device]['command'].get('fieldPositions', {}).get('deviceId')
+        device_id = int(packet_hex[int(device_id_pos) * 2:int(device_id_pos) * 2 + 2], 16) if device_id_pos else 1
+        return (device, device_id)
+
+    def retry_interval(self, key: Optional[RetryKey], attempt: int) -> float:
+        """attempt번째 전송 후 다음 전송까지 기다릴 시간 (초)"""
+        stats = self.devices.get(key) if key and self.enabled else None
+        if stats is None or stats.latency is None:
+            base = self.default_interval
+        else:
+            base = stats.latency + 4 * stats.latency_dev
+        if self.enabled:
+            base *= self.BACKOFF ** max(attempt - 1, 0)
+        return min(max(base, self.min_interval), self.max_interval)
+
+    def retry_cap(self, key: Optional[RetryKey]) -> int:
+        """기기의 최대 전송 횟수
+
+        성공률이 충분히 높은 기기는 평소 필요한 전송 횟수의 2배 + 2회로 줄이고,
+        그렇지 않은 기기나 학습 전에는 max_count를 사용합니다.
+        """
+        stats = self.devices.get(key) if key and self.enabled else None
+        if stats is None or stats.samples < 3 or stats.success_rate < self.RELIABLE_SUCCESS_RATE:
+            return self.max_count
+        return min(max(math.ceil(stats.attempts * 2) + 2, self.min_count), self.max_count)
+
+    def record_success(self, key: Optional[RetryKey], attempts: int, latency: Optional[float]) -> None:
+        """확인 성공을 기록합니다. latency는 첫 전송에 바로 확인된 경우에만 넘깁니다."""
+        if key is None:
+            return
+        stats = self.devices.setdefault(key, DeviceRetryStats())
+        stats.samples += 1
+        stats.attempts += self.ALPHA * (attempts - stats.attempts)
+        stats.success_rate += self.ALPHA * (1.0 - stats.success_rate)
+        if latency is not None:
+            if stats.latency is None:
+                stats.latency = latency
+                stats.latency_dev = latency / 2
+            else:
+                stats.latency_dev += self.ALPHA * (abs(latency - stats.latency) - stats.latency_dev)
+                stats.latency += self.ALPHA * (latency - stats.latency)
+
+    def record_failure(self, key: Optional[RetryKey]) -> None:
+        """최대 전송 횟수 안에 확인되지 않았음을 기록합니다."""
+        if key is None:
+            return
+        stats = self.devices.setdefault(key, DeviceRetryStats())
+        stats.samples += 1
+        stats.failures += 1
+        stats.success_rate += self.ALPHA * (0.0 - stats.success_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            f'{device}{device_id}': {
+                **stats.to_dict(),
+                'retry_interval_ms': round(self.retry_interval((device, device_id), 1) * 1000, 1),
+                'retry_cap': self.retry_cap((device, device_id))
+            }
+            for (device, device_id), stats in self.devices.items()
+        }
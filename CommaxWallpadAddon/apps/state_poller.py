@@ -0,0 +1,390 @@
+"""state_request 패킷으로 기기 상태를 백그라운드에서 조회하는 모듈입니다.
+
+월패드가 스스로 보내는 상태 패킷만으로는 일부 기기의 상태가 오래 갱신되지 않으므로,
+버스가 쉬는 틈에만 state_request 패킷을 보냅니다. 기기별 조회 간격은 최근에 얼마나
+자주/최근에 상태가 바뀌었는지에 따라 달라지고, 전체 조회량은 버스 점유율 한도를 넘지 않습니다.
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .utils import checksum
+
+# 8N1 직렬 통신에서 1바이트는 10비트
+BITS_PER_BYTE = 10
+PACKET_LENGTH = 8
+
+
+class PollTarget:
+    """조회 대상 기기 하나 (기기 이름 + deviceId)의 상태 관측 기록"""
+
+    def __init__(self, device: str, device_id: int, packet: str) -> None:
+        self.device = device
+        self.device_id = device_id
+        self.packet = packet
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.last_poll: Optional[float] = None
+        self.change_rate = 0.0  # 분당 상태 변화 횟수 (EWMA)
+        self.polls = 0
+        self.payloads: Dict[Tuple[int, ...], str] = {}
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.device, self.device_id)
+
+    def to_dict(self, now: float, interval: float) -> Dict[str, Any]:
+        def age(t: Optional[float]) -> Optional[float]:
+            return round(now - t, 1) if t is not None else None
+        return {
+            'device': self.device,
+            'device_id': self.device_id,
+            'packet': self.packet,
+            'last_seen_ago': age(self.last_seen),
+            'last_change_ago': age(self.last_change),
+            'last_poll_ago': age(self.last_poll),
+            'change_rate_per_min': round(self.change_rate, 3),
+            'poll_interval': round(interval, 1),
+            'polls': self.polls
+        }
+
+
+class StatePoller:
+    """버스 유휴 구간에 state_request 패킷을 보내는 적응형 상태 조회기
+
+    Args:
+        controller: WallpadController 인스턴스
+        min_interval (float): 기기별 최소 조회 간격 (초). 최근에 자주 바뀐 기기에 적용
+        max_interval (float): 기기별 최대 조회 간격 (초). 오래 변화가 없는 기기에 적용
+        airtime_share (float): state_request와 그 응답이 차지할 수 있는 버스 점유율 (0~1)
+        idle_gap (float): 마지막 수신 후 이 시간(초)이 지나야 버스가 쉬는 것으로 판단
+        baud_rate (int): 월패드 RS485 통신 속도
+        window (float): 점유율을 계산하는 구간 (초)
+    """
+
+    CHANGE_RATE_ALPHA = 0.3
+
+    def __init__(self,
+                 controller: Any,
+                 min_interval: float = 10.0,
+                 max_interval: float = 300.0,
+                 airtime_share: float = 0.05,
+                 idle_gap: float = 0.13,
+                 baud_rate: int = 9600,
+                 window: float = 10.0) -> None:
+        self.controller = controller
+        self.logger = controller.logger
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.airtime_share = airtime_share
+        self.idle_gap = idle_gap
+        self.window = window
+        self.frame_airtime = PACKET_LENGTH * BITS_PER_BYTE / baud_rate
+        self.targets: Dict[Tuple[str, int], PollTarget] = {}
+        self._sent: Deque[float] = deque()
+        self._last_send = float('-inf')
+
+    @classmethod
+    def from_config(cls, controller: Any) -> 'StatePoller':
+        config = controller.config.get('state_polling', {})
+        return cls(
+            controller,
+            min_interval=float(config.get('min_interval', 10)),
+            max_interval=float(config.get('max_interval', 300)),
+            airtime_share=float(config.get('airtime_share_percent', 5)) / 100,
+            baud_rate=int(config.get('baud_rate', 9600))
+        )
+
+    @property
+    def structure(self) -> Dict[str, Any]:
+        return self.controller.DEVICE_STRUCTURE or {}
+
+    def build_request_packet(self, device: str, device_id: int,
+                             devices: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """기기의 state_request 패킷을 만듭니다. state_request가 정의되지 않은 기기는 None
+
+        deviceId 위치에는 기기 번호를, 값이 정의된 다른 필드에는 첫 번째 값을 넣습니다.
+        (예: Outlet의 requrestType은 wattage) devices를 주지 않으면 현재 구조를 씁니다.
+        """
+        structure = self.structure if devices is None else devices
+        request = structure.get(device, {}).get('state_request')
+        if not request:
+            return None
+        packet = bytearray(PACKET_LENGTH - 1)
+        packet[0] = int(request['header'], 16)
+        for pos, field in request.get('structure', {}).items():
+            pos = int(pos)
+            if not 0 < pos < len(packet):
+                continue
+            if field.get('name') == 'deviceId':
+                packet[pos] = device_id
+            elif isinstance(field.get('values'), dict) and field['values']:
+                packet[pos] = int(str(next(iter(field['values'].values()))), 16)
+        return checksum(packet.hex().upper())
+
+    def set_targets(self, device_list: Optional[Dict[str, Any]]) -> None:
+        """기기 목록(commax_found_device.json)으로 조회 대상을 만듭니다. 기존 관측 기록은 유지합니다."""
+        self.targets = self.build_targets(device_list)
+
+    def build_targets(self, device_list: Optional[Dict[str, Any]],
+                      devices: Optional[Dict[str, Any]] = None) -> Dict[Tuple[str, int], PollTarget]:
+        """기기 목록과 구조(기본은 현재 구조)로 조회 대상을 만들어 반환합니다.
+
+        이미 있던 대상은 관측 기록을 그대로 두고 요청 패킷만 주어진 구조로 다시 만듭니다.
+        """
+        targets: Dict[Tuple[str, int], PollTarget] = {}
+        for device, info in (device_list or {}).items():
+            for device_id in range(1, int(info.get('count', 0)) + 1):
+                packet = self.build_request_packet(device, device_id, devices)
+                if packet is None:
+                    continue
+                target = self.targets.get((device, device_id))
+                if target is None:
+                    target = PollTarget(device, device_id, packet)
+                else:
+                    target.packet = packet
+                targets[(device, device_id)] = target
+        return targets
+
+    def observe(self, raw_data: str, now: Optional[float] = None) -> None:
+        """월패드에서 받은 상태 패킷으로 기기별 마지막 수신/변화 시각을 갱신합니다.
+
+        체크섬이 맞지 않는 프레임은 무시합니다. (깨진 프레임이 변화로 기록되지 않도록)
+        """
+        if not self.targets:
+            return
+        compiled = self.controller.compiled_structure
+        if compiled is None:
+            return
+        now = time.monotonic() if now is None else now
+        for k in range(0, len(raw_data) - 15, 16):
+            frame = raw_data[k:k + 16]
+            if frame != checksum(frame):
+                continue
+            candidate = compiled.identify(bytes.fromhex(frame))
+            if candidate is None or candidate.packet_type != 'state':
+                continue
+            device = candidate.device
+            state = compiled.devices[device]['state']
+            device_id_pos = state.get('fieldPositions', {}).get('deviceId')
+            device_id = int(frame[int(device_id_pos) * 2:int(device_id_pos) * 2 + 2], 16) if device_id_pos else 1
+            target = self.targets.get((device, device_id))
+            if target is not None:
+                self._record_state(target, state, frame, now)
+
+    def _record_state(self, target: PollTarget, state: Dict[str, Any], frame: str, now: float) -> None:
+        # Outlet처럼 stateType에 따라 내용이 다른 상태 패킷은 종류별로 비교합니다
+        variant = tuple(
+            int(frame[int(pos) * 2:int(pos) * 2 + 2], 16)
+            for pos, field in state.get('structure', {}).items()
+            if str(field.get('name', '')).endswith('Type')
+        )
+        previous = target.payloads.get(variant)
+        target.payloads[variant] = frame
+        if target.first_seen is None:
+            target.first_seen = now
+        if previous is not None and previous != frame:
+            if target.last_change is not None and now > target.last_change:
+                instant_rate = 60.0 / (now - target.last_change)
+                target.change_rate += self.CHANGE_RATE_ALPHA * (instant_rate - target.change_rate)
+            target.last_change = now
+        target.last_seen = now
+
+    def poll_interval(self, target: PollTarget, now: float) -> float:
+        """기기별 조회 간격을 계산합니다.
+
+        마지막 변화 후 경과 시간의 절반을 기본 간격으로 삼아 (최근에 바뀐 기기일수록 자주 조회)
+        분당 변화율로 한 번 더 나누고, min_interval~max_interval 범위로 제한합니다.
+        변화율은 max_interval이 지날 때마다 절반으로 줄어듭니다.
+        """
+        if target.last_seen is None:
+            return self.min_interval
+        reference = target.last_change if target.last_change is not None else target.first_seen
+        since_change = now - (reference if reference is not None else now)
+        change_rate = target.change_rate * 0.5 ** (since_change / self.max_interval)
+        interval = since_change / 2 / (1 + change_rate)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def airtime_used(self, now: float) -> float:
+        """최근 window 동안 조회(요청+응답)가 차지한 버스 점유율"""
+        while self._sent and self._sent[0] <= now - self.window:
+            self._sent.popleft()
+        return len(self._sent) * 2 * self.frame_airtime / self.window
+
+    def bus_idle(self, now: float) -> bool:
+        """보낼 명령이 없고 최근 idle_gap 동안 수신/조회가 없었는지 확인합니다."""
+        if self.controller.QUEUE:
+            return False
+        since_recv = (time.time_ns() - self.controller.COLLECTDATA['last_recv_time']) / 1e9
+        return since_recv >= self.idle_gap and now - self._last_send >= self.idle_gap
+
+    def next_due(self, now: float) -> Optional[PollTarget]:
+        """조회 간격이 지난 기기 중 가장 많이 밀린 기기를 반환합니다."""
+        best, best_ratio = None, 1.0
+        for target in self.targets.values():
+            last = max(t if t is not None else float('-inf') for t in (target.last_seen, target.last_poll))
+            ratio = (now - last) / self.poll_interval(target, now)
+            if ratio >= best_ratio:
+                best, best_ratio = target, ratio
+        return best
+
+    def can_send(self, now: float) -> bool:
+        return (self.bus_idle(now)
+                and self.airtime_used(now) + 2 * self.frame_airtime / self.window <= self.airtime_share)
+
+    async def send_request(self, target: PollTarget, now: Optional[float] = None) -> bool:
+        """state_request 패킷 하나를 월패드로 보냅니다. 전송하지 못했으면 기록하지 않고 False를 반환합니다."""
+        now = time.monotonic() if now is None else now
+        sent = await self.controller.publish_to_wallpad(bytes.fromhex(target.packet))
+        if not sent:
+            return False
+        self._sent.append(now)
+        self._last_send = now
+        target.last_poll = now
+        target.polls += 1
+        return sent
+
+    async def poll_once(self, now: Optional[float] = None) -> Optional[PollTarget]:
+        """조건이 맞으면 가장 밀린 기기 하나를 조회하고 그 기기를 반환합니다."""
+        now = time.monotonic() if now is None else now
+        if not self.can_send(now):
+            return None
+        target = self.next_due(now)
+        if target is None:
+            return None
+        self.logger.debug(f'상태 조회: {target.device}{target.device_id} {target.packet}')
+        await self.send_request(target, now)
+        return target
+
+    @staticmethod
+    def burst_order(targets: List[PollTarget]) -> List[PollTarget]:
+        """기기 종류를 번갈아가며 (Light1, Thermo1, Light2, Thermo2, ...) 정렬합니다.
+
+        같은 종류의 요청이 연달아 나가지 않으므로 한 종류의 응답이 늦어져도 다른 기기가 밀리지 않습니다.
+        """
+        groups: Dict[str, List[PollTarget]] = {}
+        for target in sorted(targets, key=lambda t: t.device_id):
+            groups.setdefault(target.device, []).append(target)
+        ordered: List[PollTarget] = []
+        for i in range(max((len(group) for group in groups.values()), default=0)):
+            ordered.extend(group[i] for group in groups.values() if i < len(group))
+        return ordered
+
+    def link_ready(self) -> bool:
+        """EW11(월패드 클라이언트)이 연결되어 있는지 확인합니다."""
+        return 'wallpad' in self.controller.writers
+
+    async def wait_for_link(self, timeout: float) -> bool:
+        """EW11이 연결될 때까지 최대 timeout초 기다립니다."""
+        deadline = time.monotonic() + timeout
+        while not self.link_ready():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def wait_for_idle(self, timeout: float) -> None:
+        """버스가 쉴 때까지 기다립니다.
+
+        큐에 보낼 명령이 있으면 계속 기다리고, 월패드 상태 패킷이 이어져 조용한 구간이 없을 때만
+        timeout초 뒤 포기합니다. (명령보다 상태 요청이 먼저 나가지 않도록)
+        """
+        deadline = time.monotonic() + timeout
+        while not self.bus_idle(time.monotonic()):
+            if not self.controller.QUEUE and time.monotonic() >= deadline:
+                return
+            await asyncio.sleep(0.01)
+
+    async def wait_for_state(self, target: PollTarget, since: float, timeout: float) -> bool:
+        """since 이후 기기의 상태 패킷을 받을 때까지 (최대 timeout초) 기다립니다."""
+        deadline = since + timeout
+        while time.monotonic() < deadline:
+            if target.last_seen is not None and target.last_seen >= since:
+                return True
+            await asyncio.sleep(0.01)
+        return target.last_seen is not None and target.last_seen >= since
+
+    async def burst(self, rounds: int = 3, response_timeout: float = 0.5, idle_timeout: float = 2.0,
+                    link_timeout: float = 60.0) -> Dict[str, Any]:
+        """시작 직후 모든 기기의 상태를 한 번씩 요청합니다.
+
+        EW11이 연결될 때까지 (최대 link_timeout초) 기다린 뒤 시작합니다.
+        기기 종류를 번갈아가며 한 번에 하나씩, 버스가 쉴 때만 요청하고 응답(최대 response_timeout초)을
+        기다린 뒤 다음 기기로 넘어갑니다. 전송하지 못한 요청은 세지 않고 연결을 다시 기다립니다.
+        버스트 도중 상태를 받지 못한 기기만 다음 라운드에서 다시 요청하며,
+        라운드 사이에는 점점 길게 쉽니다. 버스트는 평상시 점유율 한도를 적용하지 않습니다.
+
+        Returns:
+            Dict[str, Any]: 요청 수, 응답/미응답 기기, 소요 시간
+        """
+        started = time.monotonic()
+        answered = lambda target: target.last_seen is not None and target.last_seen >= started
+        pending = self.burst_order(list(self.targets.values()))
+        requests = 0
+        for round_no in range(rounds):
+            for target in pending:
+                if answered(target):
+                    continue
+                while True:
+                    if not await self.wait_for_link(link_timeout):
+                        self.logger.warning(f'EW11이 {link_timeout:.0f}초 안에 연결되지 않아 시작 상태 조회를 중단합니다.')
+                        return self._burst_summary(started, requests, pending, answered)
+                    await self.wait_for_idle(idle_timeout)
+                    sent_at = time.monotonic()
+                    if await self.send_request(target, sent_at):
+                        break
+                    # 연결이 끊긴 직후라면 writer가 정리될 때까지 잠시 기다립니다
+                    await asyncio.sleep(0.1)
+                requests += 1
+                await self.wait_for_state(target, sent_at, response_timeout)
+            pending = [target for target in pending if not answered(target)]
+            if not pending:
+                break
+            if round_no + 1 < rounds:
+                self.logger.debug(f'상태 버스트 {round_no + 1}라운드 미응답: {[f"{t.device}{t.device_id}" for t in pending]}')
+                await asyncio.sleep(response_timeout * (round_no + 1))
+
+        return self._burst_summary(started, requests, pending, answered)
+
+    def _burst_summary(self, started: float, requests: int, pending: List[PollTarget],
+                       answered: Callable[[PollTarget], bool]) -> Dict[str, Any]:
+        pending = [target for target in pending if not answered(target)]
+        summary = {
+            'requests': requests,
+            'answered': sum(1 for target in self.targets.values() if answered(target)),
+            'unanswered': [f'{target.device}{target.device_id}' for target in pending],
+            'elapsed': round(time.monotonic() - started, 2)
+        }
+        self.logger.info(f"시작 상태 조회 완료: {summary['answered']}/{len(self.targets)}개 기기 응답, "
+                         f"{summary['requests']}회 요청, {summary['elapsed']}초")
+        if pending:
+            self.logger.warning(f"상태 응답이 없는 기기: {', '.join(summary['unanswered'])}")
+        return summary
+
+    async def run(self, tick: float = 0.05, burst: bool = False, poll: bool = True) -> None:
+        """백그라운드 조회 루프. burst가 True면 먼저 모든 기기의 상태를 한 번에 요청합니다."""
+        if burst and self.targets:
+            try:
+                await self.burst()
+            except Exception as e:
+                self.logger.error(f'시작 상태 조회 중 오류: {e}')
+        if not poll:
+            return
+        self.logger.info(f'상태 조회 시작: {len(self.targets)}개 기기, 버스 점유율 한도 {self.airtime_share * 100:.1f}%')
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                self.logger.error(f'상태 조회 중 오류: {e}')
+            await asyncio.sleep(tick)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'airtime_percent': round(self.airtime_used(now) * 100, 2),
+            'airtime_share_percent': self.airtime_share * 100,
+            'targets': [target.to_dict(now, self.poll_interval(target, now)) for target in self.targets.values()]
+        }
@@ -1,23 +1,31 @@
-from typing import Union
+import inspect
+from typing import Any, Dict, Optional, Union
+
+from .publish_filter import PublishFilter
 
 class StateUpdater:
-    def __init__(self, ha_topic: str, publish_mqtt_func):
+    def __init__(self, ha_topic: str, publish_mqtt_func, publish_filter: Optional[PublishFilter] = None):
         self.STATE_TOPIC = ha_topic
         self.publish_mqtt = publish_mqtt_func
+        self.publish_filter = publish_filter or PublishFilter()
 
-    async def update_light(self, idx: int, onoff: str) -> None:
-        state = 'power'
-        deviceID = 'Light' + str(idx)
+    async def publish(self, device: str, idx: int, state: str, value: str) -> None:
+        """상태 토픽으로 값을 발행합니다. 발행 규칙(deadband, 발행 간격)에 걸린 값은 보내지 않습니다.
 
-        topic = self.STATE_TOPIC.format(deviceID, state)
-        self.publish_mqtt(topic, onoff)
+        publish_mqtt가 코루틴 함수(WallpadController.publish_to_ha)이면 전송이 끝날 때까지 기다립니다.
+        """
+        topic = self.STATE_TOPIC.format(device + str(idx), state)
+        if not self.publish_filter.allow(device, state, topic, value):
+            return
+        result = self.publish_mqtt(topic, value)
+        if inspect.isawaitable(result):
+            await result
+
+    async def update_light(self, idx: int, onoff: str) -> None:
+        await self.publish('Light', idx, 'power', onoff)
     
     async def update_light_breaker(self, idx: int, onoff: str) -> None:
-        state = 'power'
-        deviceID = 'LightBreaker' + str(idx)
-
-        topic = self.STATE_TOPIC.format(deviceID, state)
-        self.publish_mqtt(topic, onoff)
+        await self.publish('LightBreaker', idx, 'power', onoff)
 
     async def update_temperature(self, idx: int, mode_text: str, action_text: str, curTemp: int, setTemp: int) -> None:
         """
@@ -34,37 +42,27 @@ class StateUpdater:
             Exception: 온도 업데이트 중 오류가 발생하면 예외를 발생시킵니다.
         """
         try:
-            deviceID = 'Thermo' + str(idx)
-            
             # 온도 상태 업데이트
             temperature = {
                 'curTemp': str(curTemp).zfill(2),
                 'setTemp': str(setTemp).zfill(2)
             }
             for state in temperature:
-                val = temperature[state]
-                topic = self.STATE_TOPIC.format(deviceID, state)
-                self.publish_mqtt(topic, val)
+                await self.publish('Thermo', idx, state, temperature[state])
             
-            power_topic = self.STATE_TOPIC.format(deviceID, 'power')
-            action_topic = self.STATE_TOPIC.format(deviceID, 'action')
-            self.publish_mqtt(power_topic, mode_text)
-            self.publish_mqtt(action_topic, action_text)
+            await self.publish('Thermo', idx, 'power', mode_text)
+            await self.publish('Thermo', idx, 'action', action_text)
             
         except Exception as e:
             raise Exception(f"온도 업데이트 중 오류 발생: {str(e)}")
  
     async def update_fan(self, idx: int, power_text: str, speed_text: str) -> None:
         try:
-            deviceID = 'Fan' + str(idx)
             if power_text == 'OFF':
-                topic = self.STATE_TOPIC.format(deviceID, 'power')
-                self.publish_mqtt(topic,'OFF')
+                await self.publish('Fan', idx, 'power', 'OFF')
             else:
-                topic = self.STATE_TOPIC.format(deviceID, 'speed')
-                self.publish_mqtt(topic, speed_text)
-                topic = self.STATE_TOPIC.format(deviceID, 'power')
-                self.publish_mqtt(topic, 'ON')
+                await self.publish('Fan', idx, 'speed', speed_text)
+                await self.publish('Fan', idx, 'power', 'ON')
                 
         except Exception as e:
             raise Exception(f"팬 상태 업데이트 중 오류 발생: {str(e)}")
@@ -76,37 +74,37 @@ class StateUpdater:
                             cutoff: Union[int,None], 
                             is_eco: Union[bool,None]) -> None:
         try:
-            deviceID = 'Outlet' + str(idx)
-            topic = self.STATE_TOPIC.format(deviceID, 'power')
-            self.publish_mqtt(topic, power_text)
+            await self.publish('Outlet', idx, 'power', power_text)
             if is_eco is not None:
-                topic = self.STATE_TOPIC.format(deviceID, 'ecomode')
-                self.publish_mqtt(topic, 'ON' if is_eco else 'OFF')
+                await self.publish('Outlet', idx, 'ecomode', 'ON' if is_eco else 'OFF')
             if watt is not None:
-                topic = self.STATE_TOPIC.format(deviceID, 'watt')
-                self.publish_mqtt(topic, '%.1f' % watt)
+                await self.publish('Outlet', idx, 'watt', '%.1f' % watt)
             if cutoff is not None:
-                topic = self.STATE_TOPIC.format(deviceID, 'cutoff')
-                self.publish_mqtt(topic, str(cutoff))
+                await self.publish('Outlet', idx, 'cutoff', str(cutoff))
 
         except Exception as e:
             raise Exception(f"콘센트 상태 업데이트 중 오류 발생: {str(e)}")
 
     async def update_gas(self, idx: int, power_text: str) -> None:
         try:
-            deviceID = 'Gas' + str(idx)
-            topic = self.STATE_TOPIC.format(deviceID, 'power')
-            self.publish_mqtt(topic, power_text)
+            await self.publish('Gas', idx, 'power', power_text)
         except Exception as e:
             raise Exception(f"가스밸브 상태 업데이트 중 오류 발생: {str(e)}")
 
     async def update_ev(self, idx: int, power_text: str, floor_text: str) -> None:
         try:
-            deviceID = 'EV' + str(idx)
             if power_text == 'ON':
-                topic = self.STATE_TOPIC.format(deviceID, 'power')
-                self.publish_mqtt(topic, 'ON')
-                topic = self.STATE_TOPIC.format(deviceID, 'floor')
-                self.publish_mqtt(topic, floor_text)
+                await self.publish('EV', idx, 'power', 'ON')
+                await self.publish('EV', idx, 'floor', floor_text)
+        except Exception as e:
+            raise Exception(f"엘리베이터 상태 업데이트 중 오류 발생: {str(e)}")
+
+    async def update_fields(self, device: str, idx: int, fields: Dict[str, Any]) -> None:
+        """전용 메서드가 없는 기기의 상태를 출력 이름마다 상태 토픽으로 발행합니다."""
+        try:
+            for state, value in fields.items():
+                if value is None:
+                    continue
+                await self.publish(device, idx, state, str(value))
         except Exception as e:
-            raise Exception(f"엘리베이터 상태 업데이트 중 오류 발생: {str(e)}")
\ No newline at end of file
+            raise Exception(f"{device} 상태 업데이트 중 오류 발생: {str(e)}")
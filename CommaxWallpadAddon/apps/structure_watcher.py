@@ -0,0 +1,82 @@
+"""커스텀 패킷 구조 파일(/share/packet_structures_custom.yaml)의 변경을 감시하는 모듈입니다.
+
+파일의 mtime/크기가 바뀌면 컨트롤러의 reload_structure()로 구조를 다시 읽어 교체하므로
+애드온을 재시작하지 않아도 편집 내용이 바로 적용됩니다. 감시는 inotify 없이 주기적인
+os.stat으로 하므로 /share가 네트워크 공유여도 동작합니다.
+편집기가 파일을 쓰는 도중에 읽지 않도록, 바뀐 뒤 한 주기 동안 더 바뀌지 않을 때 다시 읽습니다.
+"""
+
+import os
+import asyncio
+from typing import Any, Optional, Tuple
+
+
+class StructureWatcher:
+    """패킷 구조 파일이 바뀌면 구조를 다시 로드하는 클래스
+
+    Args:
+        controller: WallpadController 인스턴스
+        path (str): 감시할 파일 경로
+        interval (float): 파일 확인 주기 (초)
+    """
+
+    def __init__(self, controller: Any, path: str, interval: float = 5.0) -> None:
+        self.controller = controller
+        self.logger = controller.logger
+        self.path = path
+        self.interval = interval
+        self.seen: Optional[Tuple[int, int]] = None
+        self.pending: Optional[Tuple[int, int]] = None
+        self.reload_count = 0
+
+    @classmethod
+    def from_config(cls, controller: Any, path: str) -> Optional['StructureWatcher']:
+        """structure_watch.enabled이고 vendor가 custom일 때만 감시기를 만듭니다."""
+        settings = controller.config.get('structure_watch', {})
+        if not settings.get('enabled', False):
+            return None
+        if controller.config.get('vendor', 'commax').lower() != 'custom':
+            controller.logger.info('vendor가 custom이 아니므로 패킷 구조 파일을 감시하지 않습니다.')
+            return None
+        return cls(controller, path, interval=float(settings.get('interval', 5)))
+
+    def signature(self) -> Optional[Tuple[int, int]]:
+        """파일의 (mtime_ns, 크기). 파일이 없으면 None"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self) -> None:
+        """지금 파일 상태를 기준으로 삼습니다. (시작 시 읽은 구조를 다시 읽지 않도록)"""
+        self.seen = self.signature()
+        self.pending = None
+
+    async def check(self) -> bool:
+        """감시 한 단계: 파일이 바뀐 뒤 안정되었으면 구조를 다시 로드합니다. 교체했으면 True"""
+        current = self.signature()
+        if current is None or current == self.seen:
+            self.pending = None
+            return False
+        if current != self.pending:
+            # 방금 바뀌었습니다. 쓰기가 끝났는지 다음 주기에 한 번 더 확인합니다
+            self.pending = current
+            return False
+        self.seen = current
+        self.pending = None
+        self.logger.info(f'{self.path} 파일이 바뀌어 패킷 구조를 다시 로드합니다.')
+        swapped = await self.controller.reload_structure()
+        if swapped:
+            self.reload_count += 1
+        return swapped
+
+    async def run(self) -> None:
+        self.start()
+        self.logger.info(f'패킷 구조 파일 감시 시작: {self.path} ({self.interval:g}초 주기)')
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                self.logger.error(f'패킷 구조 파일 감시 중 오류: {e}')
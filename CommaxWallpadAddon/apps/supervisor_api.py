@@ -1,6 +1,12 @@
 import os
+import time
+import asyncio
+import threading
 import requests
-from typing import Optional, Dict, Any, TypeVar, Generic
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, TypeVar, Generic, Tuple, Callable
 from enum import Enum
 from dataclasses import dataclass
 
@@ -20,31 +26,66 @@ class SupervisorEndpoint(Enum):
     NOTIFICATION = '/core/api/services/notify/persistent_notification'
 
 class SupervisorAPI:
+    """Home Assistant Supervisor API 클라이언트
+
+    하나의 requests 세션(커넥션 풀)을 재사용하며 모든 요청에 연결/응답 타임아웃을 적용합니다.
+    asyncio 루프에서는 ``async_*`` 메서드를 사용하면 요청이 전용 스레드에서 실행되어
+    루프가 막히지 않습니다.
+
+    Args:
+        base_url (Optional[str]): Supervisor 주소. 기본값은 SUPERVISOR_URL 환경변수 또는 http://supervisor
+        token (Optional[str]): Supervisor 토큰. 기본값은 SUPERVISOR_TOKEN 환경변수
+        connect_timeout (float): 연결 타임아웃 (초)
+        read_timeout (float): 응답 타임아웃 (초)
+    """
     BASE_URL = 'http://supervisor'
 
-    def __init__(self):
-        self.supervisor_token = os.environ.get('SUPERVISOR_TOKEN')
-        
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 token: Optional[str] = None,
+                 connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0,
+                 pool_size: int = 4) -> None:
+        self.base_url = (base_url or os.environ.get('SUPERVISOR_URL') or self.BASE_URL).rstrip('/')
+        self.supervisor_token = token if token is not None else os.environ.get('SUPERVISOR_TOKEN')
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._addon_info_cache: Optional[Tuple[float, APIResult]] = None
+        self._addon_info_lock = threading.Lock()
+
+    def _get_session(self) -> requests.Session:
+        """커넥션을 재사용하는 세션을 (필요 시 생성하여) 반환합니다."""
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({
+                    'Authorization': f'Bearer {self.supervisor_token}',
+                    'Content-Type': 'application/json'
+                })
+                self._session = session
+            return self._session
+
     def _make_request(self, method: str, endpoint: SupervisorEndpoint, data: Optional[Dict] = None) -> APIResult:
         """공통 API 요청 처리 메서드"""
         if not self.supervisor_token:
             return APIResult(success=False, message="Supervisor 토큰이 설정되지 않았습니다.")
-            
-        headers = {
-            'Authorization': f'Bearer {self.supervisor_token}',
-            'Content-Type': 'application/json'
-        }
-        
+
         try:
-            url = f"{self.BASE_URL}{endpoint.value}"
-            response = requests.request(
+            url = f"{self.base_url}{endpoint.value}"
+            response = self._get_session().request(
                 method=method,
                 url=url,
-                headers=headers,
-                json=data
+                json=data,
+                timeout=self.timeout
             )
             response.raise_for_status()
-            
+
             if response.content:
                 if method == 'GET':
                     return APIResult(
@@ -60,7 +101,11 @@ class SupervisorAPI:
                 success=response.status_code == 200,
                 message="요청이 성공적으로 처리되었습니다." if response.status_code == 200 else "요청 처리 중 오류가 발생했습니다."
             )
-            
+
+        except requests.exceptions.Timeout as e:
+            error_message = f"API 요청 시간 초과 ({endpoint.value}): {str(e)}"
+            print(error_message)
+            return APIResult(success=False, message=error_message)
         except requests.exceptions.RequestException as e:
             error_message = f"API 요청 중 오류 발생 ({endpoint.value}): {str(e)}"
             print(error_message)
@@ -69,26 +114,60 @@ class SupervisorAPI:
             error_message = f"예상치 못한 오류 발생: {str(e)}"
             print(error_message)
             return APIResult(success=False, message=error_message)
-    
+
+    async def _run_off_loop(self, func: Callable[..., APIResult], *args: Any) -> APIResult:
+        """동기 요청을 전용 스레드에서 실행하고 결과를 기다립니다."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='supervisor_api')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def close(self) -> None:
+        """세션과 실행기 스레드를 정리합니다."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
     def get_addon_info(self) -> APIResult[Dict[str, Any]]:
         """애드온 정보 조회"""
         return self._make_request('GET', SupervisorEndpoint.INFO)
-            
+
+    def get_addon_info_cached(self, ttl: float = 300.0) -> APIResult[Dict[str, Any]]:
+        """애드온 정보를 ttl(초) 동안 캐시하여 반환합니다. 실패한 결과는 캐시하지 않습니다."""
+        with self._addon_info_lock:
+            cached = self._addon_info_cache
+            if cached is not None and time.monotonic() - cached[0] < ttl:
+                return cached[1]
+            result = self.get_addon_info()
+            if result.success:
+                self._addon_info_cache = (time.monotonic(), result)
+            return result
+
+    def invalidate_addon_info(self) -> None:
+        """캐시된 애드온 정보를 버립니다."""
+        self._addon_info_cache = None
+
     def update_addon_options(self, options: Dict[str, Any]) -> APIResult:
         """애드온 옵션 업데이트"""
-        return self._make_request('POST', SupervisorEndpoint.OPTIONS, {'options': options})
-            
+        result = self._make_request('POST', SupervisorEndpoint.OPTIONS, {'options': options})
+        self.invalidate_addon_info()
+        return result
+
     def restart_addon(self) -> APIResult:
         """애드온 재시작"""
         return self._make_request('POST', SupervisorEndpoint.RESTART)
-            
+
     def send_notification(self, title: str, message: str) -> APIResult:
         """Home Assistant에 persistent notification 전송
-        
+
         Args:
             title (str): 알림 제목
             message (str): 알림 내용
-            
+
         Returns:
             APIResult: API 호출 결과
         """
@@ -96,4 +175,90 @@ class SupervisorAPI:
             "title": title,
             "message": message
         }
-        return self._make_request('POST', SupervisorEndpoint.NOTIFICATION, notification_data) 
\ No newline at end of file
+        return self._make_request('POST', SupervisorEndpoint.NOTIFICATION, notification_data)
+
+    async def async_get_addon_info(self) -> APIResult[Dict[str, Any]]:
+        """get_addon_info의 비동기 버전 (이벤트 루프를 막지 않음)"""
+        return await self._run_off_loop(self.get_addon_info)
+
+    async def async_get_addon_info_cached(self, ttl: float = 300.0) -> APIResult[Dict[str, Any]]:
+        """get_addon_info_cached의 비동기 버전 (이벤트 루프를 막지 않음)"""
+        cached = self._addon_info_cache
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        return await self._run_off_loop(self.get_addon_info_cached, ttl)
+
+    async def async_update_addon_options(self, options: Dict[str, Any]) -> APIResult:
+        """update_addon_options의 비동기 버전 (이벤트 루프를 막지 않음)"""
+        return await self._run_off_loop(self.update_addon_options, options)
+
+    async def async_restart_addon(self) -> APIResult:
+        """restart_addon의 비동기 버전 (이벤트 루프를 막지 않음)"""
+        return await self._run_off_loop(self.restart_addon)
+
+    async def async_send_notification(self, title: str, message: str) -> APIResult:
+        """send_notification의 비동기 버전 (이벤트 루프를 막지 않음)"""
+        return await self._run_off_loop(self.send_notification, title, message)
+
+class NotificationQueue:
+    """HA 알림을 큐에 모아 일정 간격 이상으로만 전송하는 클래스
+
+    같은 제목의 알림이 아직 전송되지 않았다면 새 알림이 기존 알림을 대체합니다.
+    큐가 가득 차면 가장 오래된 알림을 버립니다.
+
+    Args:
+        api (SupervisorAPI): 알림을 전송할 API 클라이언트
+        min_interval (float): 알림 사이의 최소 전송 간격 (초)
+        max_pending (int): 대기 가능한 최대 알림 수
+    """
+
+    def __init__(self, api: SupervisorAPI, min_interval: float = 60.0, max_pending: int = 10, logger: Any = None) -> None:
+        self.api = api
+        self.min_interval = min_interval
+        self.max_pending = max_pending
+        self.logger = logger
+        self._pending: 'OrderedDict[str, str]' = OrderedDict()
+        self._event: Optional[asyncio.Event] = None
+        self._last_sent = float('-inf')
+
+    def enqueue(self, title: str, message: str) -> None:
+        """알림을 큐에 넣습니다. 즉시 반환하며 네트워크 요청을 하지 않습니다."""
+        if title in self._pending:
+            self._pending.move_to_end(title)
+        self._pending[title] = message
+        while len(self._pending) > self.max_pending:
+            dropped, _ = self._pending.popitem(last=False)
+            self._log('warning', f'알림 큐가 가득 차 오래된 알림을 버립니다: {dropped}')
+        if self._event is not None:
+            self._event.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def run(self) -> None:
+        """큐에 쌓인 알림을 속도 제한에 맞추어 전송하는 작업 루프"""
+        self._event = asyncio.Event()
+        if self._pending:
+            self._event.set()
+        while True:
+            await self._event.wait()
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if not self._pending:
+                self._event.clear()
+                continue
+            title, message = self._pending.popitem(last=False)
+            if not self._pending:
+                self._event.clear()
+            self._last_sent = time.monotonic()
+            result = await self.api.async_send_notification(title, message)
+            if result.success:
+                self._log('info', f'HA 알림 전송 완료: {title}')
+            else:
+                self._log('error', f'HA 알림 전송 실패: {title} ({result.message})')
+
+    def _log(self, level: str, message: str) -> None:
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
@@ -430,9 +430,16 @@ class PacketAnalyzer {
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                alert('패킷을 전송했습니다.');
+                const result = data.result;
+                if (result.confirmed) {
+                    alert(`패킷을 전송했고 상태 변화를 확인했습니다. (${result.attempts}회 전송, ${result.total_ms.toFixed(0)}ms)`);
+                } else if (result.confirmed === false) {
+                    alert(`패킷을 ${result.attempts}회 전송했지만 예상 상태 패킷을 받지 못했습니다.`);
+                } else {
+                    alert('패킷을 전송했습니다.');
+                }
             } else {
-                alert('패킷 전송에 실패했습니다.');
+                alert(`패킷 전송에 실패했습니다. ${data.error || ''}`);
             }
         });
     }
@@ -0,0 +1,61 @@
+// ===============================
+// 패킷 저널 조회 클래스
+// ===============================
+class PacketJournalViewer {
+    constructor() {
+        this.searchButton = document.getElementById('journalSearchButton');
+        this.resultElement = document.getElementById('journalResult');
+        this.statusElement = document.getElementById('journalStatus');
+        this.bindEvents();
+    }
+
+    bindEvents() {
+        if (this.searchButton) {
+            this.searchButton.addEventListener('click', () => this.search());
+        }
+    }
+
+    buildQuery() {
+        const params = new URLSearchParams();
+        ['start', 'end', 'date', 'header', 'direction', 'limit'].forEach(name => {
+            const input = document.getElementById(`journal_${name}`);
+            if (input && input.value.trim()) {
+                params.append(name, input.value.trim());
+            }
+        });
+        return params;
+    }
+
+    formatTimestamp(timestampNs) {
+        const ms = Math.floor(timestampNs / 1000000);
+        const date = new Date(ms);
+        const pad = (n, width = 2) => String(n).padStart(width, '0');
+        return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())} ` +
+            `${pad(date.getHours())}:${pad(date.getMinutes())}:${pad(date.getSeconds())}.${pad(ms % 1000, 3)}`;
+    }
+
+    async search() {
+        const params = this.buildQuery();
+        if (!params.get('start') || !params.get('end')) {
+            this.statusElement.textContent = '시작/종료 시각을 입력해주세요.';
+            return;
+        }
+        this.statusElement.textContent = '조회 중...';
+        try {
+            const response = await fetch(`./api/packet_journal?${params.toString()}`);
+            const data = await response.json();
+            if (!data.success) {
+                this.statusElement.textContent = data.error || '조회 실패';
+                this.resultElement.textContent = '';
+                return;
+            }
+            this.resultElement.textContent = data.frames
+                .map(frame => `${this.formatTimestamp(frame.timestamp)} [${frame.direction.toUpperCase()}] ${frame.packet.match(/.{1,2}/g).join(' ')}`)
+                .join('\n');
+            this.statusElement.textContent = `${data.frames.length}개 프레임${data.truncated ? ' (최대 개수에 도달하여 잘림)' : ''}`;
+        } catch (error) {
+            console.error('패킷 저널 조회 실패:', error);
+            this.statusElement.textContent = '조회 실패';
+        }
+    }
+}
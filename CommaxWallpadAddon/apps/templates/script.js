@@ -59,6 +59,9 @@ const packetAnalyzer = new PacketAnalyzer();
 // 패킷 로그 인스턴스 생성
 const packetLogger = new PacketLogger();
 
+// 패킷 저널 조회 인스턴스 생성
+const packetJournalViewer = new PacketJournalViewer();
+
 // ===============================
 // 초기화 및 상태 업데이트 함수들
 // ===============================
@@ -1,4 +1,6 @@
 """유틸리티 함수들을 모아둔 모듈입니다."""
+import time
+from typing import Any, List, Tuple
 
 def byte_to_hex_str(byte_val: int) -> str:
     """바이트를 16진수 문자열로 변환하는 유틸리티 함수
@@ -32,6 +34,47 @@ def checksum(input_hex: str) -> str | None:
     except:
         return None
 
+class StartupTimer:
+    """애드온 시작 단계별 소요 시간을 기록하고 로그로 보고하는 클래스
+
+    Examples:
+        >>> timer = StartupTimer(logger)
+        >>> with timer.phase('TCP 서버 시작'):
+        ...     await controller.start_tcp_server()
+        >>> timer.report()
+    """
+
+    def __init__(self, logger: Any) -> None:
+        self.logger = logger
+        self.started_at = time.perf_counter()
+        self.phases: List[Tuple[str, float, float]] = []
+
+    def phase(self, name: str) -> '_StartupPhase':
+        return _StartupPhase(self, name)
+
+    def record(self, name: str, started: float, finished: float) -> None:
+        self.phases.append((name, started - self.started_at, finished - started))
+
+    def report(self) -> None:
+        total = time.perf_counter() - self.started_at
+        self.logger.info('시작 단계별 소요 시간 (시작 시점 / 소요 시간):')
+        for name, offset, duration in sorted(self.phases, key=lambda phase: phase[1]):
+            self.logger.info(f'  - {name}: +{offset * 1000:.1f}ms / {duration * 1000:.1f}ms')
+        self.logger.info(f'  = 전체: {total * 1000:.1f}ms')
+
+class _StartupPhase:
+    def __init__(self, timer: StartupTimer, name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> '_StartupPhase':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.timer.record(self.name, self.started, time.perf_counter())
+
 # def pad(value: int | str) -> str:
 #     """한 자리 숫자를 두 자리로 패딩하는 함수
     
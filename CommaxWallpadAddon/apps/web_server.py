@@ -1,9 +1,13 @@
-from flask import Flask, render_template, jsonify, request # type: ignore
-import threading
-import logging
+from quart import Quart, render_template, jsonify, request # type: ignore
+from hypercorn.asyncio import serve # type: ignore
+from hypercorn.config import Config as HypercornConfig # type: ignore
 import asyncio
+import io
 import os
-from typing import Dict, Any
+import copy
+import gzip
+import hashlib
+from typing import Dict, Any, Callable, NamedTuple, Optional, Tuple
 import time
 import json
 import yaml # type: ignore
@@ -11,33 +15,49 @@ import shutil
 from datetime import datetime
 import requests # type: ignore
 from .utils import checksum
-from gevent.pywsgi import WSGIServer # type: ignore
-import sys
 from .supervisor_api import SupervisorAPI
+from .packet_journal import DIRECTIONS, parse_time_range
+from .packet_structure import CompiledStructure, HeaderCandidate, load_structure, load_yaml, dump_yaml
+from .command_bus import build_batch_packets
+from .command_scheduler import parse_priority
+
+class CachedPayload(NamedTuple):
+    """구조 버전 하나에 대해 미리 만들어 둔 JSON 응답"""
+    version: str
+    etag: str
+    body: bytes
+    gzipped: bytes
 
 class WebServer:
-    def __init__(self, wallpad_controller):
-        # Flask 로깅 완전 비활성화
-        logging.getLogger('werkzeug').disabled = True
-        cli = sys.modules['flask.cli']
-        cli.show_server_banner = lambda *x: None # type: ignore
-        
-        self.app = Flask(__name__, template_folder='templates', static_folder='static')
+    ADDON_INFO_TTL = 300.0
+    SEND_PACKET_TIMEOUT = 15.0
+
+    def __init__(self, wallpad_controller, host: str = '0.0.0.0', port: int = 8099):
+        """웹 UI 서버
+
+        TCP 서버와 같은 asyncio 이벤트 루프에서 hypercorn으로 동작하므로
+        핸들러에서 COLLECTDATA, QUEUE 등 컨트롤러 상태에 잠금 없이 접근할 수 있습니다.
+        핸들러 안에서 오래 걸리는 동기 작업은 asyncio.to_thread로 넘겨야 합니다.
+        """
+        self.app = Quart(__name__, template_folder='templates', static_folder='static')
         self.app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0  # static 파일 캐싱 비활성화
         self.app.logger.disabled = True
         self.wallpad_controller = wallpad_controller
         self.logger = wallpad_controller.logger
-        self.supervisor_api = SupervisorAPI()
-        
-        # addon_info 초기화
-        addon_info_result = self.supervisor_api.get_addon_info()
-        self.addon_info = addon_info_result.data if addon_info_result.success else None
+        self.supervisor_api: SupervisorAPI = wallpad_controller.supervisor_api
         
         self.recent_messages = {}
-        self.server = None
+        self.host = host
+        self.port = port
+        self._shutdown_event: Optional[asyncio.Event] = None
+        # 구조 버전별로 미리 직렬화한 JSON 응답 {이름: CachedPayload}
+        self._json_cache: Dict[str, CachedPayload] = {}
         
         @self.app.after_request
         def add_header(response):
+            if 'ETag' in response.headers:
+                # ETag로 검증하는 응답은 브라우저가 보관했다가 If-None-Match로 다시 물어볼 수 있게 둡니다
+                return response
             response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
             response.headers['Pragma'] = 'no-cache'
             response.headers['Expires'] = '-1'
@@ -48,27 +68,21 @@ class WebServer:
         
         # 라우트 설정
         @self.app.route('/')
-        def home():
-            return render_template('index.html')
+        async def home():
+            return await render_template('index.html')
 
         @self.app.route('/api/live_packets')
-        def live_packets():
+        async def live_packets():
             """실시간 패킷 데이터를 반환하는 API"""
             return jsonify({
                 'send_data': self.wallpad_controller.COLLECTDATA['send_data'],
                 'recv_data': self.wallpad_controller.COLLECTDATA['recv_data']
             })
         @self.app.route('/api/custom_packet_structure/editable', methods=['GET'])
-        def get_editable_packet_structure():
+        async def get_editable_packet_structure():
             """편집 가능한 패킷 구조 필드를 반환합니다."""
             try:
-                custom_file = '/share/packet_structures_custom.yaml'
-                if os.path.exists(custom_file):
-                    with open(custom_file, 'r', encoding='utf-8') as f:
-                        data = yaml.safe_load(f)
-                else:
-                    with open('/apps/packet_structures_commax.yaml', 'r', encoding='utf-8') as f:
-                        data = yaml.safe_load(f)
+                data = (await asyncio.to_thread(self._load_packet_structure)).raw
 
                 editable_structure = {}
                 for device_name, device_data in data.items():
@@ -84,63 +98,28 @@ class WebServer:
                 return jsonify({'error': str(e), 'success': False})
 
         @self.app.route('/api/custom_packet_structure/editable', methods=['POST'])
-        def save_editable_packet_structure():
+        async def save_editable_packet_structure():
             """편집된 패킷 구조를 기존 구조와 병합하여 저장합니다."""
             try:
-                if not request.json:
+                data = await request.get_json(silent=True)
+                if not data:
                     return jsonify({'error': '요청 데이터가 없습니다.', 'success': False})
-                content = request.json.get('content', {})
-                
-                # 현재 패킷 구조 로드
-                custom_file = '/share/packet_structures_custom.yaml'
-                if os.path.exists(custom_file):
-                    with open(custom_file, 'r', encoding='utf-8') as f:
-                        current_data = yaml.safe_load(f)
-                else:
-                    with open('/apps/packet_structures_commax.yaml', 'r', encoding='utf-8') as f:
-                        current_data = yaml.safe_load(f)
-
-                # 편집된 내용을 현재 구조와 병합
-                for device_name, device_data in content.items():
-                    if device_name not in current_data:
-                        current_data[device_name] = {}
-                    
-                    current_data[device_name]['type'] = device_data.get('type', current_data[device_name].get('type', ''))
-                    
-                    for packet_type in ['command', 'state', 'state_request', 'ack']:
-                        if packet_type in device_data:
-                            self._merge_packet_structure(
-                                current_data[device_name].setdefault(packet_type, {}),
-                                device_data[packet_type]
-                            )
-
-                # 백업 생성
-                backup_dir = '/share/packet_structure_backups'
-                if not os.path.exists(backup_dir):
-                    os.makedirs(backup_dir)
-                
-                if os.path.exists(custom_file):
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    backup_file = f'{backup_dir}/packet_structures_custom_{timestamp}.yaml'
-                    shutil.copy2(custom_file, backup_file)
-
-                # 새 내용 저장
-                with open(custom_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(current_data, f, allow_unicode=True, sort_keys=False)
+                content = data.get('content', {})
 
-                # 컨트롤러의 패킷 구조 다시 로드
-                self.wallpad_controller.load_devices_and_packets_structures()
+                # 병합/백업/저장은 YAML을 새로 파싱하므로 이벤트 루프 밖에서 실행합니다
+                await asyncio.to_thread(self._save_editable_structure, content)
+                await self.wallpad_controller.reload_structure()
 
                 return jsonify({'success': True})
             except Exception as e:
                 return jsonify({'error': str(e), 'success': False})
 
         @self.app.route('/api/devices')
-        def get_devices():
+        async def get_devices():
             return jsonify(self.wallpad_controller.device_list or {})
             
         @self.app.route('/api/mqtt_status')
-        def get_mqtt_status():
+        async def get_mqtt_status():
             """MQTT 연결 상태 정보를 제공합니다."""
             if not self.wallpad_controller.mqtt_client:
                 return jsonify({
@@ -163,10 +142,11 @@ class WebServer:
             })
 
         @self.app.route('/api/config', methods=['GET'])
-        def get_config():
+        async def get_config():
             """CONFIG 객체의 내용과 스키마를 제공합니다."""
             # addon_info에서 schema 정보 가져오기
-            schema = self.addon_info.get('schema', {}) if self.addon_info else {}
+            addon_info = await self.get_addon_info()
+            schema = addon_info.get('schema', {}) if addon_info else {}
             
             return jsonify({
                 'config': self.wallpad_controller.config,
@@ -174,22 +154,23 @@ class WebServer:
             })
         
         @self.app.route('/api/config', methods=['POST'])
-        def save_config():
+        async def save_config():
             """설정을 저장하고 컨트롤러에 적용합니다."""
             try:
-                data = request.json
+                data = await request.get_json(silent=True)
                 if not data:
                     return jsonify({'error': '설정 데이터가 없습니다.'}), 400
 
                 # addon_info에서 현재 설정 가져오기
-                current_options = self.addon_info.get('options', {}) if self.addon_info else {}
+                addon_info = await self.get_addon_info()
+                current_options = addon_info.get('options', {}) if addon_info else {}
                 
                 try:
                     updated_options = current_options.copy()
                     updated_options.update(data)
 
                     # SupervisorAPI를 사용하여 설정 업데이트
-                    update_result = self.supervisor_api.update_addon_options(updated_options)
+                    update_result = await self.supervisor_api.async_update_addon_options(updated_options)
                     if not update_result.success:
                         return jsonify({
                             'success': False,
@@ -197,7 +178,7 @@ class WebServer:
                         }), 500
 
                     # SupervisorAPI를 사용하여 애드온 재시작
-                    restart_result = self.supervisor_api.restart_addon()
+                    restart_result = await self.supervisor_api.async_restart_addon()
                     if not restart_result.success:
                         return jsonify({
                             'success': False,
@@ -215,14 +196,14 @@ class WebServer:
                 return jsonify({'error': str(e)}), 500
 
         @self.app.route('/api/recent_messages')
-        def get_recent_messages():
+        async def get_recent_messages():
             """최근 MQTT 메시지 목록을 제공합니다."""
             return jsonify({
                 'messages': self.recent_messages  # 전체 딕셔너리 반환
             })
 
         @self.app.route('/api/packet_logs')
-        def get_packet_logs():
+        async def get_packet_logs():
             """패킷 로그를 제공합니다.
             
             Returns:
@@ -271,14 +252,14 @@ class WebServer:
                 }), 500
 
         @self.app.route('/api/find_devices', methods=['POST'])
-        def find_devices():
+        async def find_devices():
             try:
                 # 기존 기기 목록 파일 삭제
                 if os.path.exists('/share/commax_found_device.json'):
                     os.remove('/share/commax_found_device.json')
                 
                 # SupervisorAPI를 사용하여 애드온 재시작
-                restart_result = self.supervisor_api.restart_addon()
+                restart_result = await self.supervisor_api.async_restart_addon()
                 if not restart_result.success:
                     return jsonify({
                         'success': False,
@@ -297,9 +278,9 @@ class WebServer:
                 }), 500
 
         @self.app.route('/api/analyze_packet', methods=['POST'])
-        def analyze_packet():
+        async def analyze_packet():
             try:
-                data = request.get_json()
+                data = await request.get_json()
                 command = data.get('command', '').strip()
 
                 # 체크섬 계산
@@ -336,88 +317,29 @@ class WebServer:
                 }), 400
 
         @self.app.route('/api/packet_structures')
-        def get_packet_structures():
-            structures = {}
-            for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-                structures[device_name] = {
-                    "type": device['type'],
-                    "command": self._get_packet_structure(device_name, device, 'command'),
-                    "state": self._get_packet_structure(device_name, device, 'state'),
-                    "state_request": self._get_packet_structure(device_name, device, 'state_request'),
-                    "ack": self._get_packet_structure(device_name, device, 'ack')
-                }
-             
-            return jsonify(structures)
+        async def get_packet_structures():
+            """패킷 구조 참조 페이지용 구조 정보를 제공합니다. (구조 버전별로 미리 직렬화, ETag 지원)"""
+            return self._serve_cached_json('packet_structures', self._build_packet_structures)
 
         @self.app.route('/api/packet_suggestions')
-        def get_packet_suggestions():
-            """패킷 입력 도우미를 위한 정보를 제공합니다."""
-            suggestions = {
-                'headers': {},  # 헤더 정보
-                'values': {}    # 각 바이트 위치별 가능한 값
-            }
-            
-            # 명령 패킷 헤더
-            command_headers = []
-            for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-                if 'command' in device:
-                    command_headers.append({
-                        'header': device['command']['header'],
-                        'device': device_name
-                    })
-            suggestions['headers']['command'] = command_headers
-            
-            # 상태 패킷 헤더
-            state_headers = []
-            for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-                if 'state' in device:
-                    state_headers.append({
-                        'header': device['state']['header'],
-                        'device': device_name
-                    })
-            suggestions['headers']['state'] = state_headers
-            
-            # 상태 요청 패킷 헤더
-            state_request_headers = []
-            for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-                if 'state_request' in device:
-                    state_request_headers.append({
-                        'header': device['state_request']['header'],
-                        'device': device_name
-                    })
-            suggestions['headers']['state_request'] = state_request_headers
-            
-            # 응답 패킷 헤더
-            ack_headers = []
-            for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-                if 'ack' in device:
-                    ack_headers.append({
-                        'header': device['ack']['header'],
-                        'device': device_name
-                    })
-            suggestions['headers']['ack'] = ack_headers
-            
-            # 각 기기별 가능한 값들
-            for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-                for packet_type in ['command', 'state', 'state_request', 'ack']:
-                    if packet_type in device:
-                        key = f"{device_name}_{packet_type}"
-                        suggestions['values'][key] = {}
-                        
-                        for pos, field in device[packet_type]['structure'].items():
-                            if 'values' in field:
-                                suggestions['values'][key][pos] = {
-                                    'name': field['name'],
-                                    'values': field['values']
-                                }
-            
-            return jsonify(suggestions)
+        async def get_packet_suggestions():
+            """패킷 입력 도우미를 위한 정보를 제공합니다. (구조 버전별로 미리 직렬화, ETag 지원)"""
+            return self._serve_cached_json('packet_suggestions', self._build_packet_suggestions)
 
         @self.app.route('/api/send_packet', methods=['POST'])
-        def send_packet():
+        async def send_packet():
+            """패킷을 전송 큐로 보내고 전송/확인 결과와 소요 시간을 반환합니다.
+
+            Request Body:
+                packet: 체크섬을 포함한 16진수 패킷
+                max_send_count: 최대 전송 횟수 (생략하면 예상 상태가 있는 명령은 설정값, 그 외는 1)
+                timeout: 결과를 기다릴 최대 시간 (초)
+                priority: 'critical', 'high', 'normal'(기본값), 'low'
+                deadline: 이 시간(초) 안에 확인되지 않으면 더 보내지 않음 (생략하면 기한 없음)
+            """
             try:
-                data = request.get_json()
-                packet = data.get('packet', '').strip()
+                data = await request.get_json()
+                packet = data.get('packet', '').strip().upper()
                 
                 if not packet:
                     return jsonify({"success": False, "error": "패킷이 비어있습니다."}), 400
@@ -425,21 +347,71 @@ class WebServer:
                 if packet != checksum(packet):
                     return jsonify({"success": False, "error": "잘못된 패킷입니다."}), 400
                 
-                loop = asyncio.get_event_loop()
-                loop.create_task(self.wallpad_controller.message_processor.process_elfin_data(packet))
-                
-                packet_bytes = bytes.fromhex(packet)
-                self.wallpad_controller.publish_mqtt(f'{self.wallpad_controller.ELFIN_TOPIC}/send', packet_bytes)
+                max_send_count = data.get('max_send_count')
+                timeout = float(data.get('timeout', self.SEND_PACKET_TIMEOUT))
+                try:
+                    priority = parse_priority(data.get('priority', 'normal'))
+                    deadline = float(data['deadline']) if data.get('deadline') is not None else None
+                except ValueError as e:
+                    return jsonify({"success": False, "error": str(e)}), 400
+                try:
+                    result = await self.wallpad_controller.command_bus.submit(
+                        packet, int(max_send_count) if max_send_count else None, timeout, priority, deadline
+                    )
+                except asyncio.TimeoutError:
+                    return jsonify({"success": False, "pending": True, "error": "전송 결과를 기다리는 중 시간이 초과되었습니다."}), 504
                 
-                return jsonify({"success": True})
+                return jsonify({"success": result.sent, "error": result.error, "result": result.to_dict()})
             
             except Exception as e:
                 self.logger.error(f"웹UI 패킷 전송 실패: {str(e)}")
                 return jsonify({"success": False, "error": str(e)}), 500
 
 
+        @self.app.route('/api/send_packets', methods=['POST'])
+        async def send_packets():
+            """여러 패킷(또는 한 바이트 위치를 훑는 템플릿)을 차례로 전송하고 패킷별 결과를 NDJSON으로 스트리밍합니다.
+
+            Request Body:
+                packets: 패킷 목록 (7바이트면 체크섬 자동 추가)
+                sweep: {'template', 'position', 'start', 'end', 'step'} 템플릿
+                interval: 패킷 사이 간격이자 응답 수집 시간 (초, 0.05~10, 기본값 0.5)
+                max_send_count: 패킷별 최대 전송 횟수
+                response_headers: 응답으로 모을 헤더 목록 (생략하면 모든 수신 프레임)
+            """
+            data = await request.get_json(silent=True) or {}
+            try:
+                packets = build_batch_packets(data.get('packets'), data.get('sweep'))
+                interval = min(max(float(data.get('interval', 0.5)), 0.05), 10.0)
+                max_send_count = int(data['max_send_count']) if data.get('max_send_count') else None
+                response_headers = {int(str(header), 16) for header in data.get('response_headers') or []} or None
+            except (ValueError, TypeError) as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+
+            async def stream():
+                batch = self.wallpad_controller.command_bus.run_batch(packets, interval, max_send_count, response_headers)
+                async for line in batch:
+                    yield (json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8')
+
+            return stream(), 200, {'Content-Type': 'application/x-ndjson', 'X-Accel-Buffering': 'no'}
+
+        @self.app.route('/api/state_poller')
+        async def get_state_poller_stats():
+            """기기별 상태 조회 간격과 버스 점유율을 반환합니다."""
+            return jsonify(self.wallpad_controller.state_poller.stats())
+
+        @self.app.route('/api/command_bus')
+        async def get_command_bus_stats():
+            """명령 버스 처리 통계를 반환합니다."""
+            return jsonify(self.wallpad_controller.command_bus.stats())
+
+        @self.app.route('/api/retry_policy')
+        async def get_retry_policy_stats():
+            """기기별 응답 시간, 성공률과 학습된 재전송 간격/횟수를 반환합니다."""
+            return jsonify(self.wallpad_controller.retry_policy.stats())
+
         @self.app.route('/api/custom_packet_structure', methods=['GET'])
-        def get_custom_packet_structure():
+        async def get_custom_packet_structure():
             """커스텀 패킷 구조 파일의 내용을 반환합니다."""
             try:
                 custom_file = '/share/packet_structures_custom.yaml'
@@ -455,7 +427,7 @@ class WebServer:
                 return jsonify({'error': str(e), 'success': False})
 
         @self.app.route('/api/custom_packet_structure', methods=['DELETE'])
-        def delete_custom_packet_structure():
+        async def delete_custom_packet_structure():
             """커스텀 패킷 구조 파일을 삭제하고 기본값으로 초기화합니다."""
             try:
                 custom_file = '/share/packet_structures_custom.yaml'
@@ -466,55 +438,180 @@ class WebServer:
                 return jsonify({'error': str(e), 'success': False})
 
         @self.app.route('/api/custom_packet_structure', methods=['POST'])
-        def save_custom_packet_structure():
+        async def save_custom_packet_structure():
             """커스텀 패킷 구조 파일을 저장합니다."""
             try:
-                if not request.json:
+                data = await request.get_json(silent=True)
+                if not data:
                     return jsonify({'error': 'JSON 형식이 아닙니다.', 'success': False}), 400
                     
-                content = request.json.get('content', '')
+                content = data.get('content', '')
                 if not content:
                     return jsonify({'error': '내용이 비어있습니다.', 'success': False}), 400
                 
-                # YAML 유효성 검사
+                # YAML 유효성 검사 (파싱은 이벤트 루프 밖에서)
                 try:
-                    yaml.safe_load(content)
+                    await asyncio.to_thread(load_yaml, content)
                 except yaml.YAMLError as e:
                     return jsonify({'error': f'YAML 형식이 잘못되었습니다: {str(e)}', 'success': False})
 
-                # 백업 생성
-                backup_dir = '/share/packet_structure_backups'
-                if not os.path.exists(backup_dir):
-                    os.makedirs(backup_dir)
-                
-                custom_file = '/share/packet_structures_custom.yaml'
-                if os.path.exists(custom_file):
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    backup_file = f'{backup_dir}/packet_structures_custom_{timestamp}.yaml'
-                    shutil.copy2(custom_file, backup_file)
-
-                # 새 내용 저장
-                with open(custom_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                await asyncio.to_thread(self._write_custom_structure, content)
+                await self.wallpad_controller.reload_structure()
 
                 return jsonify({'success': True})
             except Exception as e:
                 return jsonify({'error': str(e), 'success': False})
 
         @self.app.route('/api/ew11_status')
-        def get_ew11_status():
+        async def get_ew11_status():
             try:
                 last_recv_time = self.wallpad_controller.COLLECTDATA.get('last_recv_time', 0)
                 elfin_reboot_interval = self.wallpad_controller.config['elfin'].get('elfin_reboot_interval', 10)
                 
                 return jsonify({
                     'last_recv_time': last_recv_time,
-                    'elfin_reboot_interval': elfin_reboot_interval
+                    'elfin_reboot_interval': elfin_reboot_interval,
+                    'supervisor': self.wallpad_controller.ew11_supervisor.stats(),
+                    'link': self.wallpad_controller.link_monitor.stats()
                 })
             except Exception as e:
                 self.logger.error(f"웹UI EW11 상태 조회 실패: {str(e)}")
                 return jsonify({'error': str(e)}), 500
 
+        @self.app.route('/api/packet_journal')
+        async def get_packet_journal():
+            """패킷 저널에서 시간 범위(및 헤더/방향)로 원시 프레임을 조회합니다.
+
+            Query Params:
+                start, end: 'HH:MM[:SS]' 또는 'YYYY-MM-DD HH:MM[:SS]'
+                date: 시각만 입력한 경우 기준 날짜 (YYYY-MM-DD)
+                header: 헤더 바이트 (16진수, 예: 82)
+                direction: 'recv' 또는 'send'
+                limit: 최대 반환 개수 (기본값 2000, 최대 20000)
+            """
+            journal = self.wallpad_controller.packet_journal
+            if journal is None:
+                return jsonify({'success': False, 'error': '패킷 저널이 비활성화되어 있습니다.'}), 404
+            try:
+                start = request.args.get('start', '')
+                end = request.args.get('end', '')
+                if not start or not end:
+                    return jsonify({'success': False, 'error': 'start와 end를 입력해주세요.'}), 400
+                start_ns, end_ns = parse_time_range(start, end, request.args.get('date') or None)
+                header_arg = request.args.get('header', '').strip()
+                header = int(header_arg, 16) if header_arg else None
+                direction = request.args.get('direction') or None
+                if direction and direction not in DIRECTIONS:
+                    raise ValueError(f"direction은 {', '.join(sorted(DIRECTIONS))} 중 하나여야 합니다.")
+                limit = min(int(request.args.get('limit', 2000)), 20000)
+                if limit < 1:
+                    raise ValueError('limit은 1 이상이어야 합니다.')
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+
+            # 디스크를 읽으므로 이벤트 루프 밖에서 조회합니다.
+            # 한 개 더 읽어서 잘렸는지 정확히 판단합니다.
+            frames = await asyncio.to_thread(lambda: list(journal.query(start_ns, end_ns, header, direction, limit + 1)))
+            return jsonify({
+                'success': True,
+                'frames': frames[:limit],
+                'truncated': len(frames) > limit,
+                'stats': await asyncio.to_thread(journal.stats)
+            })
+
+        @self.app.route('/api/history')
+        async def get_history():
+            """메모리에 기록된 기기 상태 시계열을 조회합니다.
+
+            device/field가 없으면 기록 중인 시계열 목록을 반환합니다.
+
+            Query Params:
+                device: 기기 ID (예: Outlet1)
+                field: 상태 이름 (예: watt, current_temp, power)
+                tier: 'auto'(기본값), 'raw', 'minute', 'hour'
+                last: 최근 몇 초를 조회할지 (start 대신 사용)
+                start, end: 조회 구간 (epoch 초)
+            """
+            history = self.wallpad_controller.history
+            if history is None:
+                return jsonify({'success': False, 'error': '상태 기록이 비활성화되어 있습니다.'}), 404
+            device = request.args.get('device', '')
+            field = request.args.get('field', '')
+            if not device or not field:
+                return jsonify({'success': True, 'series': history.catalog(), 'stats': history.stats()})
+            try:
+                end = float(request.args['end']) if request.args.get('end') else time.time()
+                if request.args.get('last'):
+                    start: Optional[float] = end - float(request.args['last'])
+                else:
+                    start = float(request.args['start']) if request.args.get('start') else None
+                result = history.query(device, field, request.args.get('tier', 'auto'), start, end)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            if result is None:
+                return jsonify({'success': False, 'error': f'{device}/{field} 기록이 없습니다.'}), 404
+            return jsonify({'success': True, **result})
+
+    def _load_packet_structure(self) -> CompiledStructure:
+        """편집기용 패킷 구조를 (캐시를 활용해) 로드합니다. 커스텀 파일이 없으면 기본 파일을 사용합니다."""
+        custom_file = '/share/packet_structures_custom.yaml'
+        source = custom_file if os.path.exists(custom_file) else '/apps/packet_structures_commax.yaml'
+        return load_structure(source, self.wallpad_controller.cache_dir, self.logger)
+
+    def _save_editable_structure(self, content: Dict[str, Any]) -> None:
+        """편집된 내용을 현재 구조와 병합하고, 기존 파일을 백업한 뒤 저장합니다."""
+        # 캐시된 구조를 공유하므로 복사본을 수정합니다
+        current_data = copy.deepcopy(self._load_packet_structure().raw)
+
+        # 편집된 내용을 현재 구조와 병합
+        for device_name, device_data in content.items():
+            if device_name not in current_data:
+                current_data[device_name] = {}
+
+            current_data[device_name]['type'] = device_data.get('type', current_data[device_name].get('type', ''))
+
+            for packet_type in ['command', 'state', 'state_request', 'ack']:
+                if packet_type in device_data:
+                    self._merge_packet_structure(
+                        current_data[device_name].setdefault(packet_type, {}),
+                        device_data[packet_type]
+                    )
+
+        stream = io.StringIO()
+        dump_yaml(current_data, stream)
+        self._write_custom_structure(stream.getvalue())
+
+    def _write_custom_structure(self, content: str) -> None:
+        """기존 커스텀 패킷 구조 파일을 백업하고 새 내용을 저장합니다.
+
+        파일 감시기가 쓰는 도중의 파일을 읽거나, 저장 중에 꺼져 잘린 파일이 남지 않도록
+        같은 디렉토리의 임시 파일에 쓰고 fsync한 뒤 os.replace로 한 번에 바꿉니다.
+        """
+        custom_file = self.wallpad_controller.custom_structure_path
+
+        # 백업 생성
+        backup_dir = os.path.join(os.path.dirname(custom_file), 'packet_structure_backups')
+        if not os.path.exists(backup_dir):
+            os.makedirs(backup_dir)
+
+        if os.path.exists(custom_file):
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_file = f'{backup_dir}/packet_structures_custom_{timestamp}.yaml'
+            shutil.copy2(custom_file, backup_file)
+
+        # 새 내용 저장
+        tmp_file = f'{custom_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, custom_file)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
     def _get_editable_fields(self, packet_data):
         """패킷 구조에서 편집 가능한 필드만 추출합니다."""
         if not packet_data:
@@ -562,28 +659,22 @@ class WebServer:
 
     def _analyze_packet_structure(self, command: str) -> Dict[str, Any]:
         """패킷 구조를 분석하고 관련 정보를 반환합니다."""
-        # 헤더 기기 찾기
+        # 헤더 인덱스로 기기 찾기 (같은 헤더를 쓰는 후보는 고정 바이트로 구분)
         header = command[:2]
-        device_info = None
-        device_name = None
-        packet_type = None
-
-        for name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-            for ptype in ['command', 'state', 'state_request', 'ack']:
-                if ptype in device and device[ptype]['header'] == header:
-                    device_info = device[ptype]
-                    device_name = name
-                    packet_type = ptype
-                    break
-            if device_info:
-                break
-
-        if not device_info:
+        compiled = self.wallpad_controller.compiled_structure
+        candidate = self._identify_packet(command, compiled=compiled)
+
+        if candidate is None:
             return {
                 "success": False,
                 "error": f"알 수 없는 패킷입니다."
             }
 
+        device_name = candidate.device
+        packet_type = candidate.packet_type
+        assert compiled is not None
+        device_info = compiled.devices[device_name][packet_type]
+
         # 각 바이트 분석
         byte_analysis = []
         # 헤더 추가
@@ -622,6 +713,74 @@ class WebServer:
             "analysis": byte_analysis
         }
 
+    def _build_packet_structures(self, devices: Dict[str, Any]) -> Dict[str, Any]:
+        structures = {}
+        for device_name, device in devices.items():
+            structures[device_name] = {
+                "type": device['type'],
+                "command": self._get_packet_structure(device_name, device, 'command'),
+                "state": self._get_packet_structure(device_name, device, 'state'),
+                "state_request": self._get_packet_structure(device_name, device, 'state_request'),
+                "ack": self._get_packet_structure(device_name, device, 'ack')
+            }
+        return structures
+
+    def _build_packet_suggestions(self, devices: Dict[str, Any]) -> Dict[str, Any]:
+        """패킷 타입별 헤더 목록과 (기기_패킷타입)별 바이트 위치의 가능한 값을 한 번에 모읍니다."""
+        packet_types = ['command', 'state', 'state_request', 'ack']
+        suggestions: Dict[str, Any] = {
+            'headers': {packet_type: [] for packet_type in packet_types},  # 헤더 정보
+            'values': {}    # 각 바이트 위치별 가능한 값
+        }
+        for device_name, device in devices.items():
+            for packet_type in packet_types:
+                if packet_type not in device:
+                    continue
+                suggestions['headers'][packet_type].append({
+                    'header': device[packet_type]['header'],
+                    'device': device_name
+                })
+                key = f"{device_name}_{packet_type}"
+                suggestions['values'][key] = {}
+                for pos, field in device[packet_type]['structure'].items():
+                    if 'values' in field:
+                        suggestions['values'][key][pos] = {
+                            'name': field['name'],
+                            'values': field['values']
+                        }
+        return suggestions
+
+    def _cached_json(self, name: str, build: Callable[[Dict[str, Any]], Any]) -> CachedPayload:
+        """구조 버전이 바뀌었을 때만 JSON을 다시 만들고, 직렬화/압축한 결과를 보관합니다.
+
+        버전과 내용이 어긋나지 않도록 같은 구조 객체의 devices로 만듭니다.
+        """
+        compiled = self.wallpad_controller.compiled_structure
+        version = compiled.version if compiled is not None else ''
+        cached = self._json_cache.get(name)
+        if cached is None or cached.version != version:
+            body = self.app.json.dumps(build(compiled.devices if compiled is not None else {})).encode('utf-8')
+            etag = hashlib.sha256(body).hexdigest()[:20]
+            cached = CachedPayload(version, etag, body, gzip.compress(body, compresslevel=6))
+            self._json_cache[name] = cached
+        return cached
+
+    def _serve_cached_json(self, name: str, build: Callable[[Dict[str, Any]], Any]) -> Tuple[bytes, int, Dict[str, str]]:
+        """미리 직렬화한 JSON을 응답합니다. If-None-Match가 같으면 304, gzip을 받으면 압축본을 보냅니다."""
+        cached = self._cached_json(name, build)
+        headers = {
+            'ETag': f'"{cached.etag}"',
+            'Cache-Control': 'no-cache',  # 저장은 하되 매번 ETag로 확인
+            'Vary': 'Accept-Encoding'
+        }
+        if request.if_none_match.contains_weak(cached.etag):
+            return b'', 304, headers
+        headers['Content-Type'] = 'application/json'
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            headers['Content-Encoding'] = 'gzip'
+            return cached.gzipped, 200, headers
+        return cached.body, 200, headers
+
     def _get_packet_structure(self, device_name: str, device: Dict[str, Any], packet_type: str) -> Dict[str, Any]:
         """패킷 구조 정보를 생성합니다."""
         if packet_type not in device:
@@ -655,25 +814,35 @@ class WebServer:
             "byte_memos": byte_memos,  # memo 정보 추가
         }
 
+    def _identify_packet(self, packet: str, packet_type: Optional[str] = None,
+                         compiled: Optional[CompiledStructure] = None) -> Optional[HeaderCandidate]:
+        """16진수 패킷의 (기기, 패킷 타입)을 구조(기본은 현재 구조)의 헤더 인덱스에서 찾습니다."""
+        compiled = compiled or self.wallpad_controller.compiled_structure
+        if compiled is None:
+            return None
+        try:
+            frame = bytes.fromhex(packet[:len(packet) // 2 * 2])
+        except ValueError:
+            return None
+        return compiled.identify(frame, packet_type)
+
     def _get_device_info(self, packet: str) -> Dict[str, str]:
         """패킷의 헤더를 기반으로 기기 정보를 반환합니다."""
-        if len(packet) < 2:
-            return {"name": "Unknown", "packet_type": "Unknown"}
-            
-        header = packet[:2]
-        
-        # 명령 패킷 확인
-        for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-            if 'command' in device and device['command']['header'] == header:
-                return {"name": device_name, "packet_type": "Command"}
-                
-        # 상태 패킷 확인
-        for device_name, device in self.wallpad_controller.DEVICE_STRUCTURE.items():
-            if 'state' in device and device['state']['header'] == header:
-                return {"name": device_name, "packet_type": "State"}
-                
+        for packet_type, label in (('command', 'Command'), ('state', 'State')):
+            candidate = self._identify_packet(packet, packet_type)
+            if candidate is not None:
+                return {"name": candidate.device, "packet_type": label}
         return {"name": "Unknown", "packet_type": "Unknown"}
 
+    async def get_addon_info(self) -> Optional[Dict[str, Any]]:
+        """애드온 정보 (처음 필요할 때 조회하고 ADDON_INFO_TTL 동안 캐시)"""
+        result = await self.supervisor_api.async_get_addon_info_cached(self.ADDON_INFO_TTL)
+        return result.data if result.success else None
+
+    def add_tcp_message(self, topic: str, payload: str) -> None:
+        """TCP로 송수신한 메시지를 채널별로 저장합니다. 각 채널당 최신 메시지만 유지합니다."""
+        self.add_mqtt_message(topic, payload)
+
     def add_mqtt_message(self, topic: str, payload: str) -> None:
         """MQTT 메시지를 토픽별로 저장합니다. 각 토픽당 최신 메시지만 유지합니다."""
         self.recent_messages[topic] = {
@@ -681,22 +850,22 @@ class WebServer:
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
         }
 
-    def run(self):
-        # Flask 서버 실행
-        self.server = WSGIServer(('0.0.0.0', 8099), self.app, log=None)
-        # 별도의 스레드에서 서버 실행
-        threading.Thread(target=self._run_server, daemon=True).start()
-        
-    def _run_server(self):
+    async def run(self) -> None:
+        """컨트롤러와 같은 이벤트 루프에서 웹서버를 실행합니다. stop()이 호출될 때까지 반환하지 않습니다."""
+        config = HypercornConfig()
+        config.bind = [f'{self.host}:{self.port}']
+        config.accesslog = None
+        config.errorlog = None
+        config.graceful_timeout = 1.0
+        self._shutdown_event = asyncio.Event()
         try:
             self.logger.info("웹서버 시작")
-            assert self.server is not None
-            self.server.serve_forever()
+            await serve(self.app, config, shutdown_trigger=self._shutdown_event.wait)  # type: ignore[arg-type]
         except Exception as e:
             self.logger.error(f"Server error: {e}")
-            
-    def stop(self):
-        if self.server:
+
+    def stop(self) -> None:
+        if self._shutdown_event is not None:
             self.logger.info("웹서버 종료")
-            self.server.stop()
-            self.server = None 
\ No newline at end of file
+            self._shutdown_event.set()
+            self._shutdown_event = None
@@ -0,0 +1,78 @@
+"""여러 테스트 파일에서 함께 쓰는 fixture"""
+import os
+import sys
+import pytest
+from unittest.mock import AsyncMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.main import WallpadController
+from apps.logger import Logger
+
+@pytest.fixture
+def config():
+    """테스트용 설정을 제공하는 fixture"""
+    # 테스트용 패킷 구조 파일 경로 설정
+    packet_file = os.path.join(os.path.dirname(__file__), 'fixtures', 'packet_structures_commax.yaml')
+    
+    return {
+        'vendor': 'commax',
+        'mqtt': {
+            'mqtt_server': '192.168.0.39',
+            'mqtt_id': 'my_user',
+            'mqtt_password': 'm1o@s#quitto'
+        },
+        'mqtt_TOPIC': 'commax',
+        'elfin_TOPIC': 'ew11',
+        'elfin': {
+            'use_auto_reboot': True,
+            'elfin_unavailable_notification': False,
+            'elfin_server': '192.168.0.38',
+            'elfin_id': 'admin',
+            'elfin_password': 'admin',
+            'elfin_reboot_interval': 60
+        },
+        'log': {
+            'DEBUG': True,
+            'elfin_log': True,
+            'mqtt_log': True
+        },
+        'command_settings': {
+            'queue_interval_in_second': 0.1,
+            'max_send_count': 15,
+            'min_receive_count': 1,
+            'send_command_on_idle': True
+        },
+        'climate_settings': {
+            'min_temp': 5,
+            'max_temp': 40
+        },
+        'packet_file': packet_file  # 테스트용 패킷 파일 경로
+    }
+
+@pytest.fixture
+def device_list():
+    """기기 검색 결과를 흉내낸 기기 목록 (HA 명령 토픽 라우터가 이 목록으로 만들어집니다)"""
+    return {
+        'Light': {'type': 'light', 'count': 2},
+        'LightBreaker': {'type': 'switch', 'count': 1},
+        'Outlet': {'type': 'switch', 'count': 2},
+        'Thermo': {'type': 'climate', 'count': 2},
+        'Fan': {'type': 'fan', 'count': 1},
+        'Gas': {'type': 'button', 'count': 1},
+        'EV': {'type': 'button', 'count': 1}
+    }
+
+@pytest.fixture
+def controller(config, device_list, tmp_path):
+    """패킷 구조를 로드하고 월패드 전송을 흉내내는 테스트용 컨트롤러
+
+    캐시는 tmp_path에 두어 테스트가 실제 캐시 디렉토리에 파일을 남기지 않게 합니다.
+    """
+    controller = WallpadController(config, Logger(debug=True, elfin_log=True, mqtt_log=True))
+    controller.cache_dir = str(tmp_path / 'cache')
+    controller.device_list = device_list
+    controller.load_devices_and_packets_structures()
+    controller.publish_to_wallpad = AsyncMock(return_value=True)
+    return controller
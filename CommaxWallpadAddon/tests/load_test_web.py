@@ -0,0 +1,182 @@
+"""웹 UI 부하 테스트 스크립트
+
+테스트용 설정으로 컨트롤러(TCP 서버 + 웹서버)를 별도 프로세스에서 띄우고,
+가짜 EW11이 월패드 패킷을 계속 보내는 동안 여러 클라이언트가 웹 API를 동시에 호출하여
+처리량과 응답 지연을 측정합니다. pytest 수집 대상이 아니며 직접 실행합니다.
+
+사용 예:
+    cd CommaxWallpadAddon
+    python -m tests.load_test_web --clients 16 --duration 10
+    python -m tests.load_test_web --url http://192.168.0.10:8099   # 이미 실행 중인 애드온 측정
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+ENDPOINTS = ['/api/live_packets', '/api/recent_messages', '/api/devices', '/api/packet_logs']
+# 조명 1번 켜짐/꺼짐 상태 패킷을 번갈아 보냅니다.
+WALLPAD_PACKETS = [bytes.fromhex('B0010100000000B2'), bytes.fromhex('B0000100000000B1')]
+
+
+def serve(tcp_port: int) -> None:
+    """테스트용 설정으로 컨트롤러를 실행합니다 (자식 프로세스에서 호출)."""
+    sys.path.insert(0, ROOT)
+    from apps.main import WallpadController
+    from apps.logger import Logger
+
+    config = {
+        'vendor': 'commax',
+        'tcp': {'tcp_server': '127.0.0.1', 'tcp_port': tcp_port},
+        'elfin': {'use_auto_reboot': False, 'elfin_unavailable_notification': False,
+                  'elfin_server': '127.0.0.1', 'elfin_reboot_interval': 10},
+        'log': {'DEBUG': False, 'elfin_log': False, 'mqtt_log': False},
+        'command_settings': {'queue_interval_in_second': 0.1, 'max_send_count': 15,
+                             'min_receive_count': 1, 'send_command_on_idle': True},
+        'climate_settings': {'min_temp': 5, 'max_temp': 40},
+        'packet_journal': {'enabled': False},
+        'packet_file': os.path.join(FIXTURES, 'packet_structures_commax.yaml')
+    }
+    controller = WallpadController(config, Logger(debug=False, elfin_log=False, mqtt_log=False))
+    controller.share_dir = FIXTURES
+    controller.cache_dir = tempfile.mkdtemp()
+    controller.run()
+
+
+def wait_for_port(host: str, port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f'{host}:{port}에 연결할 수 없습니다.')
+
+
+def fake_ew11(host: str, port: int, interval: float, stop: threading.Event, counter: List[int]) -> None:
+    """EW11처럼 월패드 상태 패킷을 일정 간격으로 보냅니다."""
+    with socket.create_connection((host, port)) as sock:
+        i = 0
+        while not stop.is_set():
+            sock.sendall(WALLPAD_PACKETS[i % 2])
+            counter[0] += 1
+            i += 1
+            time.sleep(interval)
+
+
+def web_client(host: str, port: int, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    """keep-alive 연결 하나로 API를 돌아가며 호출합니다."""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    i = 0
+    while time.monotonic() < deadline:
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors[0] += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors[0] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_load(url: str, clients: int, duration: float, tcp: Optional[str], packet_interval: float) -> Dict[str, float]:
+    parsed = urlparse(url)
+    host, port = parsed.hostname or '127.0.0.1', parsed.port or 80
+    wait_for_port(host, port)
+
+    stop = threading.Event()
+    sent = [0]
+    ew11_thread = None
+    if tcp:
+        tcp_host, tcp_port = tcp.rsplit(':', 1)
+        ew11_thread = threading.Thread(target=fake_ew11, args=(tcp_host, int(tcp_port), packet_interval, stop, sent), daemon=True)
+        ew11_thread.start()
+
+    # 워밍업 (첫 요청의 템플릿/임포트 비용 제외)
+    warmup: List[float] = []
+    web_client(host, port, time.monotonic() + 1.0, warmup, [0])
+
+    latencies: List[float] = []
+    errors = [0]
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=web_client, args=(host, port, deadline, latencies, errors)) for _ in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    stop.set()
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else float('nan'),
+        'wallpad_packets': sent[0]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='웹 UI 부하 테스트')
+    parser.add_argument('--url', help='측정할 웹서버 주소 (생략하면 테스트용 컨트롤러를 직접 실행)')
+    parser.add_argument('--tcp', help='가짜 EW11이 접속할 TCP 서버 주소 (host:port)')
+    parser.add_argument('--clients', type=int, default=16, help='동시 클라이언트 수')
+    parser.add_argument('--duration', type=float, default=10.0, help='측정 시간 (초)')
+    parser.add_argument('--packet-interval', type=float, default=0.02, help='가짜 EW11 패킷 간격 (초)')
+    parser.add_argument('--serve', type=int, metavar='TCP_PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    server = None
+    url, tcp = args.url, args.tcp
+    if not url:
+        tcp_port = 18830
+        server = subprocess.Popen([sys.executable, '-m', 'tests.load_test_web', '--serve', str(tcp_port)],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url, tcp = 'http://127.0.0.1:8099', f'127.0.0.1:{tcp_port}'
+        wait_for_port('127.0.0.1', tcp_port)
+    try:
+        result = run_load(url, args.clients, args.duration, tcp, args.packet_interval)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""테스트용 로컬 Supervisor API 스텁 서버
+
+실제 Supervisor 대신 127.0.0.1의 임의 포트에서 동작하며, 받은 요청과 연결 정보를 기록합니다.
+응답 지연(delay)을 주어 타임아웃 동작을 확인할 수 있습니다.
+
+사용 예:
+    with SupervisorStub() as stub:
+        api = SupervisorAPI(base_url=stub.url, token='test')
+        api.get_addon_info()
+        assert stub.requests[0]['path'] == '/addons/self/info'
+"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class SupervisorStub:
+    def __init__(self, addon_info: Optional[Dict[str, Any]] = None, delay: float = 0.0) -> None:
+        self.addon_info = addon_info if addon_info is not None else {
+            'options': {'vendor': 'commax'},
+            'schema': {'vendor': 'list(commax|custom)'}
+        }
+        self.delay = delay
+        self.status_code = 200
+        self.requests: List[Dict[str, Any]] = []
+        self.client_addresses: Set[Tuple[str, int]] = set()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'SupervisorStub':
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _handle(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                with stub._lock:
+                    stub.client_addresses.add(self.client_address)
+                    stub.requests.append({
+                        'method': self.command,
+                        'path': self.path,
+                        'authorization': self.headers.get('Authorization'),
+                        'json': json.loads(body) if body else None,
+                        'time': time.monotonic()
+                    })
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if self.command == 'GET' and self.path == '/addons/self/info':
+                    payload = json.dumps({'result': 'ok', 'data': stub.addon_info}).encode()
+                else:
+                    payload = json.dumps({'result': 'ok'}).encode()
+                self.send_response(stub.status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'SupervisorStub':
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
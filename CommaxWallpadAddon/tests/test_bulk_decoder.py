@@ -0,0 +1,75 @@
+import os
+import sys
+import csv
+import math
+import pytest
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+np = pytest.importorskip('numpy')
+
+from apps.utils import checksum
+from apps.packet_structure import load_structure
+from apps.bulk_decoder import BulkDecoder, checksum_mask, frames_to_array, main
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'packet_structures_commax.yaml')
+FRAMES = [
+    checksum('B0010100000000'),   # Light 1 ON
+    checksum('B0000200000000'),   # Light 2 OFF
+    checksum('82830224250000'),   # Thermo 2 난방
+    checksum('82810119200000'),   # Thermo 1 꺼짐
+    checksum('F9010111000103'),   # Outlet 1 전력
+    checksum('F6040102000000'),   # Fan
+    checksum('55010100000000'),   # 구조에 없는 헤더
+    'B0010100000000FF',           # 체크섬 오류
+]
+
+@pytest.fixture
+def compiled():
+    return load_structure(FIXTURE)
+
+def test_checksum_mask_matches_utils():
+    """벡터 체크섬 검증이 utils.checksum과 같은 결과를 내는지 테스트"""
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(2000, 8), dtype=np.uint8)
+    for row in frames[::2]:
+        row[7] = int(checksum(bytes(row[:7]).hex().upper())[14:], 16)
+    expected = [checksum(bytes(row).hex().upper()) == bytes(row).hex().upper() for row in frames]
+    assert checksum_mask(frames).tolist() == expected
+
+def test_bulk_decode_matches_state_decoders(compiled):
+    """열 단위 해석 결과가 실시간 디코더(StateDecoder)와 같은지 테스트"""
+    decoder = BulkDecoder(compiled)
+    tables = decoder.decode(frames_to_array(bytes.fromhex(f) for f in FRAMES), timestamps=range(len(FRAMES)))
+    assert decoder.stats == {'frames': 8, 'bad_checksum': 1, 'unknown_header': 1}
+    assert tables['Light']['timestamp'].tolist() == [0, 1]
+
+    for packet in FRAMES[:6]:
+        frame = bytes.fromhex(packet)
+        device_id, expected = compiled.state_decoders[frame[0]].decode(frame)
+        table = tables[compiled.state_decoders[frame[0]].device]
+        row = table['device_id'].tolist().index(device_id)
+        for name, value in expected.items():
+            actual = table[name].tolist()[row]
+            if value is None:
+                assert actual is None or math.isnan(actual)
+            else:
+                assert actual == pytest.approx(value)
+
+def test_cli_exports_csv_and_npz(tmp_path):
+    """명령행에서 16진수 파일을 읽어 CSV/NPZ로 저장하는지 테스트"""
+    source = tmp_path / 'capture.txt'
+    source.write_text('\n'.join(f'2025-03-21 03:00:00.000 recv {f}' for f in FRAMES))
+
+    assert main(['--structure', FIXTURE, '--input', str(source), '--output', str(tmp_path / 'csv')]) == 0
+    with open(tmp_path / 'csv' / 'Thermo.csv', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['device_id'] for row in rows] == ['2', '1']
+    assert rows[0]['mode'] == 'heat' and float(rows[0]['current_temp']) == 24
+
+    assert main(['--structure', FIXTURE, '--input', str(source), '--format', 'npz',
+                 '--output', str(tmp_path / 'decoded.npz')]) == 0
+    with np.load(tmp_path / 'decoded.npz') as data:
+        assert data['Light.power'].tolist() == ['ON', 'OFF']
+        assert data['Outlet.watt'][0] == pytest.approx(10.3)
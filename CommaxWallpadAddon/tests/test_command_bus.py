@@ -0,0 +1,131 @@
+import os
+import sys
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+LIGHT1_ON = '3101010000000033'
+LIGHT1_ON_STATE = 'B0010100000000B2'
+
+async def drive_queue(controller, rounds=500, interval=0.002, until_empty=True):
+    """메인 루프 대신 전송 큐를 처리합니다. until_empty면 큐가 비었을 때 멈춥니다."""
+    for _ in range(rounds):
+        await controller.process_queue()
+        if until_empty and not controller.QUEUE:
+            return
+        await asyncio.sleep(interval)
+
+def reply_with(controller, packet, delay=0.0):
+    """전송할 때마다 월패드가 delay초 뒤 상태 패킷으로 응답하도록 설정합니다."""
+    async def publish(command):
+        asyncio.get_running_loop().call_later(delay, controller.confirm_inflight, packet)
+        return True
+    controller.publish_to_wallpad = AsyncMock(side_effect=publish)
+
+@pytest.mark.asyncio
+async def test_command_confirmed_by_state_packet(controller):
+    """예상 상태 패킷을 받으면 확인 완료로 결과가 나오는지 테스트"""
+    reply_with(controller, LIGHT1_ON_STATE)
+    future = controller.command_bus.enqueue(LIGHT1_ON)
+    await drive_queue(controller)
+
+    result = future.result()
+    assert result.sent and result.confirmed
+    assert result.attempts == 1
+    assert result.confirm_ms is not None and result.total_ms >= result.queued_ms
+    assert not controller.QUEUE
+    assert controller.command_bus.stats()['confirmed'] == 1
+
+@pytest.mark.asyncio
+async def test_delayed_reply_confirms_without_resend(controller):
+    """전송 뒤 늦게 도착한 응답으로 재전송 없이 확인되고, 확인 시간이 큐 처리 주기에 묶이지 않는지 테스트"""
+    reply_with(controller, LIGHT1_ON_STATE, delay=0.02)
+    future = controller.command_bus.enqueue(LIGHT1_ON)
+    await drive_queue(controller, interval=0.1)
+
+    result = future.result()
+    assert result.confirmed
+    assert result.attempts == 1
+    assert controller.publish_to_wallpad.await_count == 1
+    assert result.confirm_ms is not None and 15 <= result.confirm_ms < 60
+
+@pytest.mark.asyncio
+async def test_stale_state_packet_does_not_confirm(controller):
+    """전송 전에 받은 상태 패킷으로는 확인되지 않는지 테스트"""
+    future = controller.command_bus.enqueue(LIGHT1_ON, max_send_count=3)
+    controller.confirm_inflight(LIGHT1_ON_STATE)
+    await drive_queue(controller)
+
+    result = future.result()
+    assert result.sent and result.confirmed is False
+    assert result.attempts == 3
+    assert controller.publish_to_wallpad.await_count == 3
+
+@pytest.mark.asyncio
+async def test_packet_without_expected_state_is_sent_once(controller):
+    """예상 상태가 없는 패킷(상태 패킷 등)은 한 번만 전송되는지 테스트"""
+    future = controller.command_bus.enqueue(LIGHT1_ON_STATE)
+    await drive_queue(controller)
+
+    result = future.result()
+    assert result.sent and result.confirmed is None
+    assert controller.publish_to_wallpad.await_count == 1
+
+@pytest.mark.asyncio
+async def test_unsent_when_wallpad_disconnected(controller):
+    """월패드가 연결되지 않았으면 미전송으로 결과가 나오는지 테스트"""
+    controller.publish_to_wallpad = AsyncMock(return_value=False)
+    future = controller.command_bus.enqueue(LIGHT1_ON, max_send_count=2)
+    await drive_queue(controller)
+
+    result = future.result()
+    assert not result.sent and result.confirmed is False
+    assert result.error
+
+@pytest.mark.asyncio
+async def test_submit_from_another_thread(controller):
+    """다른 스레드에서 제출한 명령이 컨트롤러 루프에서 처리되는지 테스트"""
+    reply_with(controller, LIGHT1_ON_STATE)
+    controller.command_bus.bind(asyncio.get_running_loop())
+    driver = asyncio.create_task(drive_queue(controller, rounds=1000, interval=0.005, until_empty=False))
+
+    def worker():
+        return controller.command_bus.submit_threadsafe(LIGHT1_ON).result(timeout=5)
+
+    result = await asyncio.to_thread(worker)
+    driver.cancel()
+    assert result.confirmed
+
+def test_build_batch_packets_validates_once():
+    """일괄 패킷이 한 번에 검증되고 체크섬과 스윕이 적용되는지 테스트"""
+    from apps.command_bus import build_batch_packets
+    packets = build_batch_packets(['31010100000000'], {'template': '31010000000000', 'position': 2, 'start': '00', 'end': '02'})
+    assert packets == ['3101010000000033', '3101000000000032', '3101010000000033', '3101020000000034']
+
+    with pytest.raises(ValueError):
+        build_batch_packets(['3101010000000033', '3101010000000000'])
+    with pytest.raises(ValueError):
+        build_batch_packets(sweep={'template': '31010000000000', 'position': 0})
+
+@pytest.mark.asyncio
+async def test_run_batch_collects_responses(controller):
+    """일괄 전송이 패킷별 결과와 그 사이에 받은 응답을 순서대로 내보내는지 테스트"""
+    async def publish(command):
+        # 월패드 응답을 수신 경로로 흘려보냅니다
+        asyncio.get_running_loop().call_soon(controller.command_bus.observe, 'B0010100000000B2' '8281022420000049')
+        return True
+    controller.publish_to_wallpad = AsyncMock(side_effect=publish)
+    driver = asyncio.create_task(drive_queue(controller, rounds=1000, interval=0.002, until_empty=False))
+
+    lines = [line async for line in controller.command_bus.run_batch(
+        ['3101010000000033', 'B0010100000000B2'], interval=0.05, max_send_count=1, response_headers={0xB0})]
+    driver.cancel()
+
+    assert [line.get('packet') for line in lines[:2]] == ['3101010000000033', 'B0010100000000B2']
+    assert all(line['result']['sent'] for line in lines[:2])
+    assert [frame['packet'] for frame in lines[0]['responses']] == ['B0010100000000B2']
+    assert lines[-1] == {'done': True, 'count': 2, 'elapsed_ms': lines[-1]['elapsed_ms']}
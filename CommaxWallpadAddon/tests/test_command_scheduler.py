@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.retry_policy import RetryPolicy
+
+LIGHT1_ON = '3101010000000033'
+LIGHT1_OFF = '3101000000000032'
+LIGHT1_ON_STATE = 'B0010100000000B2'
+OUTLET1_ON = '7A0101010000007D'
+THERMO1_HEAT = '040104810000008A'
+
+@pytest.fixture
+def controller(controller):
+    """재전송 간격을 고정하고 전송한 패킷을 기록하는 컨트롤러"""
+    controller.retry_policy = RetryPolicy(controller, default_interval=0.05, min_interval=0.05, max_interval=0.05)
+    controller.sent = []
+
+    async def publish(command):
+        packet = command.hex().upper()
+        controller.sent.append(packet)
+        if packet == LIGHT1_ON:
+            asyncio.get_running_loop().call_later(0.01, controller.confirm_inflight, LIGHT1_ON_STATE)
+        return True
+    controller.publish_to_wallpad = AsyncMock(side_effect=publish)
+    return controller
+
+async def drive_until(controller, future, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not future.done() and loop.time() < deadline:
+        await controller.process_queue()
+        await asyncio.sleep(0.002)
+
+@pytest.mark.asyncio
+async def test_stuck_device_does_not_block_others(controller):
+    """응답하지 않는 기기의 명령이 다른 기기의 명령을 막지 않는지 테스트"""
+    outlet = controller.command_bus.enqueue(OUTLET1_ON, max_send_count=10)
+    light = controller.command_bus.enqueue(LIGHT1_ON)
+    await drive_until(controller, light)
+
+    result = light.result()
+    assert result.confirmed and result.attempts == 1
+    assert result.total_ms < 200
+    assert not outlet.done()
+    assert controller.sent[:2] == [OUTLET1_ON, LIGHT1_ON]
+
+@pytest.mark.asyncio
+async def test_one_command_in_flight_per_device(controller):
+    """같은 기기의 다음 명령은 앞 명령이 끝난 뒤에 보내는지 테스트"""
+    first = controller.command_bus.enqueue(LIGHT1_OFF, max_send_count=2)
+    second = controller.command_bus.enqueue(LIGHT1_ON)
+    await drive_until(controller, second)
+
+    assert first.result().confirmed is False
+    assert second.result().confirmed
+    assert controller.sent == [LIGHT1_OFF, LIGHT1_OFF, LIGHT1_ON]
+
+@pytest.mark.asyncio
+async def test_retries_interleave_across_devices(controller):
+    """응답하지 않는 두 기기의 재전송이 번갈아 나가는지 테스트"""
+    outlet = controller.command_bus.enqueue(OUTLET1_ON, max_send_count=3)
+    thermo = controller.command_bus.enqueue(THERMO1_HEAT, max_send_count=3)
+    await drive_until(controller, thermo)
+
+    assert outlet.result().attempts == 3 and thermo.result().attempts == 3
+    assert controller.sent == [OUTLET1_ON, THERMO1_HEAT] * 3
+
+@pytest.mark.asyncio
+async def test_critical_command_goes_first(controller):
+    """가스 차단 명령이 먼저 들어온 일괄 명령보다 먼저 나가는지 테스트"""
+    from apps.command_scheduler import PRIORITY_CRITICAL, PRIORITY_LOW
+    controller.command_bus.enqueue(OUTLET1_ON, max_send_count=1, priority=PRIORITY_LOW)
+    controller.command_bus.enqueue(THERMO1_HEAT, max_send_count=1, priority=PRIORITY_LOW)
+    await controller.message_processor.process_ha_command(['commax', 'Gas1', 'power'], 'PRESS')
+
+    gas = controller.QUEUE[-1]
+    assert gas['priority'] == PRIORITY_CRITICAL and gas['deadline'] is None
+    await controller.process_queue()
+    assert controller.sent == ['1101800000000092']
+
+@pytest.mark.asyncio
+async def test_expired_command_is_dropped(controller):
+    """기한이 지난 명령은 보내지 않고 실패로 끝나는지 테스트"""
+    stale = controller.command_bus.enqueue(OUTLET1_ON, deadline=0.0)
+    await asyncio.sleep(0.001)
+    await controller.process_queue()
+
+    result = stale.result()
+    assert not result.sent and result.confirmed is False
+    assert '기한' in result.error
+    assert controller.sent == [] and not controller.QUEUE
+
+@pytest.mark.asyncio
+async def test_ha_command_gets_deadline(controller):
+    """HA 명령에는 설정된 기한이 붙는지 테스트"""
+    controller.command_deadline = 5.0
+    await controller.message_processor.process_ha_command(['commax', 'Light1', 'power'], 'ON')
+    item = controller.QUEUE[-1]
+    assert 4.0 < item['deadline'] - time.monotonic() <= 5.0
@@ -0,0 +1,53 @@
+import os
+import sys
+import copy
+import pytest
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.utils import checksum
+from apps.command_table import CommandTemplate, build_topic_routes
+
+def test_template_checksum_matches_for_every_value():
+    """템플릿으로 만든 패킷이 checksum()으로 만든 패킷과 모든 값에서 같은지 테스트"""
+    for base in ('04010300000000', '7A0103FF00FFFF', 'FFFFFFFFFFFFFF'):
+        packet = bytes.fromhex(base)
+        for position in range(1, 7):
+            template = CommandTemplate(packet, position)
+            for value in range(256):
+                expected = bytearray(packet)
+                expected[position] = value
+                assert template.build(value) == checksum(expected.hex().upper())
+
+def test_routes_cover_every_entity_with_valid_packets(controller):
+    """기기 목록의 모든 기기/action에 경로가 생기고, 미리 만든 패킷의 체크섬이 맞는지 테스트"""
+    routes = controller.message_processor.topic_routes
+    assert ('Light2', 'power') in routes and ('Thermo2', 'setTemp') in routes and ('EV1', '*') in routes
+    assert ('Light3', 'power') not in routes
+    for route in routes.values():
+        for packet in list(route.packets.values()) + ([route.default] if route.default else []):
+            assert packet == checksum(packet)
+    assert routes[('Light2', 'power')].packets['ON'] == checksum('31020100000000')
+    assert routes[('Light2', 'power')].default == checksum('31020000000000')
+
+def test_missing_structure_value_skips_action(controller, device_list):
+    """구조에 필요한 값이 없는 action은 건너뛰고 나머지 경로는 만드는지 테스트"""
+    structure = copy.deepcopy(controller.DEVICE_STRUCTURE)
+    del structure['Fan']['command']['structure']['2']['values']['setSpeed']
+    routes = build_topic_routes(structure, device_list, controller.logger)
+    assert ('Fan1', 'speed') not in routes
+    assert ('Fan1', 'power') in routes
+
+@pytest.mark.asyncio
+async def test_parameterized_values_are_validated(controller):
+    """템플릿 명령의 값이 범위를 벗어나면 큐에 넣지 않는지 테스트"""
+    processor = controller.message_processor
+    for topics, value in ((['commax', 'Thermo1', 'setTemp', 'command'], '99'),
+                          (['commax', 'Thermo1', 'setTemp', 'command'], 'warm'),
+                          (['commax', 'Outlet1', 'setCutoff', 'command'], '1FF'),
+                          (['commax', 'Fan1', 'speed', 'command'], 'turbo')):
+        await processor.process_ha_command(topics, value)
+    assert controller.QUEUE == []
+    await processor.process_ha_command(['commax', 'Thermo2', 'setTemp', 'command'], '23.5')
+    assert controller.QUEUE[-1]['sendcmd'] == checksum('04020323000000')
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.ew11_supervisor import EW11Supervisor, CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+
+@pytest.fixture
+def supervisor(controller):
+    supervisor = EW11Supervisor(controller, silence_threshold=60, host='192.168.0.38', reboot_grace=10,
+                                max_backoff=900, failure_threshold=3, open_cooldown=1800)
+    supervisor.probe = AsyncMock(return_value=True)
+    supervisor.reboot = AsyncMock(return_value=True)
+    controller.publish_to_ha = AsyncMock()
+    return supervisor
+
+def go_silent(controller, seconds):
+    controller.COLLECTDATA['last_recv_time'] = time.time_ns() - int(seconds * 1e9)
+
+@pytest.mark.asyncio
+async def test_no_attempt_while_signal_is_fresh(supervisor, controller):
+    """신호가 들어오는 동안에는 복구를 시도하지 않는지 테스트"""
+    go_silent(controller, 5)
+    await supervisor.check(now=0)
+    supervisor.probe.assert_not_awaited()
+    assert supervisor.state == CIRCUIT_CLOSED
+
+@pytest.mark.asyncio
+async def test_unreachable_ew11_is_not_rebooted_and_backs_off(supervisor, controller):
+    """TCP 확인이 실패하면 텔넷 재부팅을 건너뛰고, 시도 간격이 두 배씩 늘어나는지 테스트"""
+    supervisor.probe.return_value = False
+    go_silent(controller, 120)
+    await supervisor.check(now=0)
+    supervisor.reboot.assert_not_awaited()
+    assert supervisor.failures == 1 and supervisor.next_attempt_at == 10 + 60
+
+    await supervisor.check(now=30)
+    assert supervisor.probe.await_count == 1
+    await supervisor.check(now=70)
+    assert supervisor.failures == 2 and supervisor.next_attempt_at == 70 + 10 + 120
+    assert controller.elfin_reboot_count == 2
+
+@pytest.mark.asyncio
+async def test_circuit_opens_then_half_opens(supervisor, controller):
+    """연속 실패 후 회로가 열려 쿨다운 동안 재부팅을 멈추고, 쿨다운 뒤 한 번만 시도하는지 테스트"""
+    go_silent(controller, 120)
+    now = 0.0
+    for _ in range(3):
+        now = max(now, supervisor.next_attempt_at)
+        await supervisor.check(now=now)
+    assert supervisor.state == CIRCUIT_OPEN and supervisor.reboot.await_count == 3
+
+    await supervisor.check(now=now + 1000)
+    assert supervisor.reboot.await_count == 3
+
+    await supervisor.check(now=now + 1800)
+    assert supervisor.reboot.await_count == 4
+    assert supervisor.state == CIRCUIT_OPEN and supervisor.opened_at == now + 1800
+
+    supervisor.state = CIRCUIT_HALF_OPEN
+    go_silent(controller, 1)
+    await supervisor.check(now=now + 2000)
+    assert supervisor.state == CIRCUIT_CLOSED and supervisor.failures == 0
+
+@pytest.mark.asyncio
+async def test_long_silence_marks_offline(supervisor, controller):
+    """재부팅을 끈 상태에서도 오래 신호가 없으면 offline을 알리는지 테스트"""
+    supervisor.use_auto_reboot = False
+    controller.is_available = True
+    go_silent(controller, 601)
+    await supervisor.check(now=0)
+    supervisor.probe.assert_not_awaited()
+    controller.publish_to_ha.assert_awaited_with(f"{controller.HA_TOPIC}/status", "offline")
+    assert controller.is_available is False
+
+@pytest.mark.asyncio
+async def test_slow_reboot_does_not_block_queue(supervisor, controller):
+    """재부팅이 오래 걸려도 전송 큐 처리가 계속되는지 테스트"""
+    async def slow_reboot():
+        await asyncio.sleep(1)
+        return True
+    supervisor.reboot = AsyncMock(side_effect=slow_reboot)
+    go_silent(controller, 120)
+    task = asyncio.create_task(supervisor.check(now=0))
+    controller.send_command_on_idle = False
+    controller.QUEUE.append({'sendcmd': '3101010000000033', 'count': 0, 'expected_state': None,
+                             'received_count': 0, 'max_send_count': 1})
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(controller.process_queue_and_monitor(), 0.5)
+    controller.publish_to_wallpad.assert_awaited_with(bytes.fromhex('3101010000000033'))
+    assert not task.done()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
@@ -0,0 +1,79 @@
+import os
+import sys
+import copy
+import pytest
+from unittest.mock import AsyncMock, patch
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.utils import checksum
+from apps.packet_structure import CompiledStructure
+from apps.field_codecs import BCD_TABLE, compile_codec
+
+def frame(hex7):
+    return bytes.fromhex(checksum(hex7))
+
+def test_bcd_and_scaled_codecs():
+    """BCD/scaled/hex codec이 문자열 변환 없이 같은 값을 내는지 테스트"""
+    assert BCD_TABLE[0x24] == 24 and BCD_TABLE[0x1A] is None
+    bcd3 = compile_codec({'type': 'bcd', 'length': 3, 'scale': 0.1}, 4, {}, {})
+    assert bcd3(frame('F9010111000103')) == pytest.approx(10.3)
+    assert bcd3(frame('F90101110001A3')) is None
+    scaled = compile_codec({'type': 'scaled', 'length': 2, 'scale': 0.5, 'offset': -1}, 3, {}, {})
+    assert scaled(frame('00000001020000')) == 0x0102 * 0.5 - 1
+    hex2 = compile_codec({'type': 'hex', 'length': 2}, 3, {}, {})
+    assert hex2(frame('230101B1020000')) == 'B102'
+
+@pytest.mark.asyncio
+async def test_thermo_and_fan_states_are_decoded(controller):
+    """온도조절기/환기장치 상태가 선언된 codec으로 해석되는지 테스트"""
+    updater = controller.state_updater
+    with patch.object(updater, 'update_temperature') as thermo, patch.object(updater, 'update_fan') as fan:
+        await controller.message_processor.process_elfin_data(checksum('82830224250000') + checksum('F6040102000000'))
+    thermo.assert_called_once_with(2, 'heat', 'heating', 24, 25)
+    fan.assert_called_once_with(1, 'ON', 'medium')
+
+@pytest.mark.asyncio
+async def test_invalid_bcd_skips_frame_only(controller):
+    """BCD가 아닌 온도 바이트는 그 프레임만 건너뛰고 다음 프레임은 처리하는지 테스트"""
+    updater = controller.state_updater
+    with patch.object(updater, 'update_temperature') as thermo, patch.object(updater, 'update_light') as light:
+        await controller.message_processor.process_elfin_data(checksum('8281012A250000') + checksum('B0010100000000'))
+    thermo.assert_not_called()
+    light.assert_called_once_with(1, 'ON')
+
+def test_legacy_structure_without_decode_uses_defaults(controller):
+    """decode 선언이 없는 예전 사용자 구조도 같은 결과로 해석되는지 테스트"""
+    raw = copy.deepcopy(controller.compiled_structure.raw)
+    for device in raw.values():
+        for field in device.get('state', {}).get('structure', {}).values():
+            field.pop('decode', None)
+    legacy = CompiledStructure(raw)
+    for packet in ('F901011100010310', checksum('F9110121000023'), checksum('82800124250000'),
+                   checksum('23010115000000'), checksum('90800000000000')):
+        data = bytes.fromhex(packet)
+        declared_decoder = controller.compiled_structure.state_decoders[data[0]]
+        assert legacy.state_decoders[data[0]].decode(data) == declared_decoder.decode(data)
+
+@pytest.mark.asyncio
+async def test_new_device_type_needs_no_code(controller):
+    """decode만 선언한 새 기기는 출력마다 상태 토픽으로 발행되는지 테스트"""
+    raw = copy.deepcopy(controller.compiled_structure.raw)
+    raw['Curtain'] = {
+        'type': 'cover',
+        'state': {
+            'header': 'C1',
+            'structure': {
+                '1': {'name': 'deviceId', 'values': {'id': 'FF'}},
+                '2': {'name': 'position', 'decode': {'position': {'type': 'raw'}}},
+                '3': {'name': 'moving', 'values': {'stop': '00', 'open': '01', 'close': '02'},
+                      'decode': {'motion': {'type': 'enum', 'default': 'unknown'}}},
+                '4': {'name': 'bogus', 'decode': {'broken': {'type': 'float32'}}},
+            }
+        }
+    }
+    controller.apply_structure(CompiledStructure(raw, logger=controller.logger))
+    controller.state_updater.update_fields = AsyncMock()
+    await controller.message_processor.process_elfin_data(checksum('C1023202000000'))
+    controller.state_updater.update_fields.assert_awaited_once_with('Curtain', 2, {'position': 0x32, 'motion': 'close'})
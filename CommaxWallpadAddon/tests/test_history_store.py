@@ -0,0 +1,59 @@
+import os
+import sys
+import pytest
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.utils import checksum
+from apps.history_store import HistoryStore
+
+BASE = 1_700_000_000.0 - 1_700_000_000.0 % 3600  # 정각
+
+def test_tiers_downsample_with_fixed_memory():
+    """원본은 고정 크기로 덮어쓰고, 1분/1시간 구간은 평균/최소/최대로 묶이는지 테스트"""
+    store = HistoryStore(raw_points=10, minute_points=120, hour_points=24)
+    for second in range(0, 3 * 3600, 10):
+        store.record('Outlet1', {'watt': float(second % 60), 'power': 'ON', 'floor': '0A'}, BASE + second)
+    size = store.stats()['bytes']
+    store.record('Outlet1', {'watt': 1.0}, BASE + 3 * 3600)
+    assert store.stats()['bytes'] == size
+    assert [item['field'] for item in store.catalog()] == ['power', 'watt']
+
+    raw = store.query('Outlet1', 'watt', 'raw')
+    assert len(raw['t']) == 10 and raw['t'][-1] == BASE + 3 * 3600
+
+    minute = store.query('Outlet1', 'watt', 'minute', start=BASE + 3600, end=BASE + 3600)
+    assert minute['value'] == [25.0] and minute['min'] == [0.0] and minute['max'] == [50.0]
+
+    hour = store.query('Outlet1', 'watt', 'hour')
+    assert hour['t'] == [BASE, BASE + 3600, BASE + 7200, BASE + 3 * 3600]
+    assert hour['value'][:3] == [25.0, 25.0, 25.0] and hour['value'][3] == 1.0
+
+def test_auto_tier_picks_finest_covering_tier():
+    """조회 구간을 담고 있는 가장 촘촘한 단계가 선택되는지 테스트"""
+    store = HistoryStore(raw_points=60, minute_points=60, hour_points=24)
+    for second in range(0, 7200, 10):
+        store.record('Thermo1', {'current_temp': 24}, BASE + second)
+    end = BASE + 7190
+    assert store.query('Thermo1', 'current_temp', start=end - 300, end=end)['tier'] == 'raw'
+    assert store.query('Thermo1', 'current_temp', start=end - 1800, end=end)['tier'] == 'minute'
+    assert store.query('Thermo1', 'current_temp', start=BASE, end=end)['tier'] == 'hour'
+    assert store.query('Thermo1', 'target_temp') is None
+    with pytest.raises(ValueError):
+        store.query('Thermo1', 'current_temp', 'day')
+
+@pytest.mark.asyncio
+async def test_state_frames_are_recorded_and_served(controller):
+    """상태 패킷이 기록되고 /api/history로 조회되는지 테스트"""
+    from apps.web_server import WebServer
+    await controller.message_processor.process_elfin_data(checksum('82830224250000') + checksum('F9010111000103'))
+    client = WebServer(controller).app.test_client()
+
+    data = await (await client.get('/api/history?device=Thermo2&field=current_temp&last=60')).get_json()
+    assert data['tier'] == 'raw' and data['value'] == [24.0]
+    data = await (await client.get('/api/history?device=Outlet1&field=watt&tier=minute')).get_json()
+    assert data['value'] == [pytest.approx(10.3)]
+    data = await (await client.get('/api/history')).get_json()
+    assert {'device': 'Thermo2', 'field': 'mode'} in [{k: s[k] for k in ('device', 'field')} for s in data['series']]
+    assert (await client.get('/api/history?device=Thermo2&field=current_temp&tier=day')).status_code == 400
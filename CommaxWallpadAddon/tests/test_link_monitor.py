@@ -0,0 +1,93 @@
+import os
+import sys
+import socket
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.link_monitor import LinkMonitor, set_tcp_keepalive, LINK_ALIVE, LINK_DEAD, LINK_UNKNOWN
+
+@pytest.fixture
+def monitor(controller):
+    controller.publish_to_ha = AsyncMock()
+    controller.is_available = True
+    monitor = LinkMonitor(controller, min_silence=2.0, max_silence=10.0, cadence_multiplier=20, min_samples=5)
+    controller.link_monitor = monitor
+    return monitor
+
+def feed(monitor, count, gap, start=0.0):
+    now = start
+    for _ in range(count):
+        monitor.observe(now)
+        now += gap
+    return now - gap
+
+def test_threshold_follows_bus_cadence(monitor):
+    """평소 수신 간격을 학습해 무수신 허용 시간을 줄이고, 끊김 간격은 학습하지 않는지 테스트"""
+    assert monitor.silence_threshold() == 10.0
+    last = feed(monitor, 30, 0.1)
+    assert monitor.silence_threshold() == pytest.approx(2.0)
+    monitor.observe(last + 8)
+    assert monitor.gap_ewma == pytest.approx(0.1)
+
+@pytest.mark.asyncio
+async def test_silent_link_is_marked_dead_and_queue_is_shed(monitor, controller):
+    """버스가 몇 초 조용하면 offline을 알리고 대기 중인 명령을 실패로 끝내는지 테스트"""
+    last = feed(monitor, 30, 0.1)
+    future = controller.command_bus.enqueue('3101010000000033', max_send_count=3)
+
+    await monitor.check(now=last + 1.0)
+    assert monitor.state == LINK_ALIVE and controller.QUEUE
+
+    await monitor.check(now=last + 2.5)
+    assert monitor.state == LINK_DEAD and not controller.QUEUE
+    controller.publish_to_ha.assert_awaited_once_with(f"{controller.HA_TOPIC}/status", "offline")
+    result = future.result()
+    assert result.sent is False and 'EW11' in result.error
+
+    monitor.observe(last + 3.0)
+    assert monitor.state == LINK_ALIVE
+
+@pytest.mark.asyncio
+async def test_link_never_seen_is_not_dead(monitor, controller):
+    """EW11이 한 번도 연결되지 않았으면 큐를 버리지 않는지 테스트"""
+    controller.command_bus.enqueue('3101010000000033', max_send_count=1)
+    await monitor.check(now=1000)
+    assert monitor.state == LINK_UNKNOWN and controller.QUEUE
+
+@pytest.mark.asyncio
+async def test_stalled_ha_socket_is_dropped(monitor, controller):
+    """HA 소켓 쓰기가 제한 시간 안에 끝나지 않으면 연결을 끊고 목록에서 빼는지 테스트"""
+    monitor.write_timeout = 0.05
+    writer = MagicMock()
+    writer.drain = lambda: asyncio.sleep(10)
+    writer.transport.is_closing.return_value = False
+    controller.writers['ha'] = writer
+    del controller.publish_to_ha
+
+    await controller.publish_to_ha('commax/Light1/power/state', 'ON')
+    assert 'ha' not in controller.writers
+    writer.transport.abort.assert_called_once()
+    assert monitor.dropped['ha'] == 1
+
+@pytest.mark.asyncio
+async def test_keepalive_is_set_on_accepted_socket():
+    """받아들인 연결에 TCP keepalive가 설정되는지 테스트"""
+    accepted = asyncio.get_running_loop().create_future()
+
+    async def handler(reader, writer):
+        accepted.set_result(set_tcp_keepalive(writer, idle=3, interval=1, count=3))
+        sock = writer.get_extra_info('socket')
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        writer.close()
+
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    _, client = await asyncio.open_connection('127.0.0.1', port)
+    assert await asyncio.wait_for(accepted, 2)
+    client.close()
+    server.close()
+    await server.wait_closed()
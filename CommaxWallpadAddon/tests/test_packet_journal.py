@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.packet_journal import PacketJournal, parse_time_range
+
+BASE_NS = 1_700_000_000 * 1_000_000_000
+
+@pytest.fixture
+def journal(tmp_path):
+    """작은 세그먼트와 촘촘한 인덱스를 사용하는 테스트용 저널"""
+    journal = PacketJournal(str(tmp_path), segment_size=1024, max_segments=100, index_interval=4)
+    yield journal
+    journal.close()
+
+def test_query_time_range_and_header(journal):
+    """시간 범위와 헤더 필터로 조회되는지 테스트"""
+    for i in range(200):
+        header = 0x82 if i % 2 == 0 else 0xB0
+        journal.append(bytes([header, 0x81, 0x01, 0x24, 0x20, 0x00, 0x00, i % 256]), 'recv', BASE_NS + i * 1_000_000_000)
+
+    frames = list(journal.query(BASE_NS + 10 * 1_000_000_000, BASE_NS + 20 * 1_000_000_000, header=0x82))
+
+    assert [frame['timestamp'] for frame in frames] == [BASE_NS + i * 1_000_000_000 for i in range(10, 21, 2)]
+    assert all(frame['packet'].startswith('82') for frame in frames)
+    assert journal.stats()['segments'] > 1, "세그먼트가 회전되지 않았습니다"
+
+def test_query_direction_and_limit(journal):
+    """송수신 방향 필터와 limit 테스트"""
+    journal.append(bytes.fromhex('3101010000000033'), 'send', BASE_NS)
+    journal.append(bytes.fromhex('B0010100000000B2'), 'recv', BASE_NS + 1)
+    journal.append(bytes.fromhex('3101000000000032'), 'send', BASE_NS + 2)
+
+    sent = list(journal.query(BASE_NS, BASE_NS + 10, direction='send'))
+    assert [frame['packet'] for frame in sent] == ['3101010000000033', '3101000000000032']
+    assert len(list(journal.query(BASE_NS, BASE_NS + 10, limit=1))) == 1
+    assert list(journal.query(BASE_NS, BASE_NS + 10, limit=0)) == []
+    with pytest.raises(ValueError):
+        list(journal.query(BASE_NS, BASE_NS + 10, direction='both'))
+
+def test_append_frames_splits_buffer(journal):
+    """수신 버퍼가 8바이트 프레임 단위로 기록되는지 테스트"""
+    journal.append_frames(bytes.fromhex('B0010100000000B2' '8281022420000049'), 'recv')
+    frames = list(journal.query(0, 2**63 - 1))
+    assert [frame['packet'] for frame in frames] == ['B0010100000000B2', '8281022420000049']
+
+def test_old_segments_are_pruned(tmp_path):
+    """최대 세그먼트 수를 넘으면 오래된 세그먼트가 삭제되는지 테스트"""
+    journal = PacketJournal(str(tmp_path), segment_size=1024, max_segments=3)
+    for i in range(1000):
+        journal.append(bytes(8), 'recv', BASE_NS + i)
+    journal.close()
+    assert journal.stats()['segments'] == 3
+
+def test_parse_time_range_wraps_midnight():
+    """종료 시각이 시작보다 이르면 다음날로 해석하는지 테스트"""
+    start_ns, end_ns = parse_time_range('23:58', '00:02', '2025-03-21')
+    assert end_ns - start_ns == 4 * 60 * 1_000_000_000
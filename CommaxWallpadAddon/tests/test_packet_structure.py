@@ -0,0 +1,117 @@
+import os
+import sys
+import shutil
+import pytest
+from unittest.mock import Mock, patch
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps import packet_structure
+from apps.utils import checksum
+from apps.packet_structure import load_structure
+from apps.command_table import build_topic_routes
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'packet_structures_commax.yaml')
+
+@pytest.fixture
+def source(tmp_path):
+    """임시 디렉토리에 복사한 패킷 구조 파일"""
+    path = tmp_path / 'packet_structures_custom.yaml'
+    shutil.copy(FIXTURE, path)
+    return str(path)
+
+def test_compiled_structure(source):
+    """fieldPositions와 헤더 인덱스가 컴파일되는지 테스트"""
+    compiled = load_structure(source)
+    assert compiled.devices['Light']['command']['fieldPositions']['power'] == '2'
+    assert 'fieldPositions' not in compiled.raw['Light']['command']
+    assert compiled.find_device('state', 0xB0) == 'Light'
+
+def test_cache_hit_skips_yaml_parsing(source, tmp_path):
+    """원본이 바뀌지 않았다면 캐시를 사용하고 YAML을 다시 파싱하지 않는지 테스트"""
+    cache_dir = str(tmp_path / 'cache')
+    first = load_structure(source, cache_dir)
+    assert os.listdir(cache_dir)
+
+    with patch.object(packet_structure, 'load_yaml', side_effect=AssertionError('YAML 재파싱')):
+        second = load_structure(source, cache_dir)
+    assert second.devices == first.devices
+    assert second.version == first.version
+
+def test_cache_invalidated_on_change(source, tmp_path):
+    """원본 내용과 mtime이 바뀌면 캐시를 버리고 다시 컴파일하는지 테스트"""
+    cache_dir = str(tmp_path / 'cache')
+    first = load_structure(source, cache_dir)
+
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write('\nExtra:\n  type: switch\n')
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = load_structure(source, cache_dir)
+    assert 'Extra' in second.devices
+    assert second.version != first.version
+
+def test_corrupt_cache_is_ignored(source, tmp_path):
+    """손상된 캐시 파일이 있어도 원본에서 다시 컴파일하는지 테스트"""
+    cache_dir = str(tmp_path / 'cache')
+    load_structure(source, cache_dir)
+    for name in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, name), 'wb') as f:
+            f.write(b'broken')
+
+    assert 'Light' in load_structure(source, cache_dir).devices
+
+class _Exploit:
+    def __init__(self, marker):
+        self.marker = marker
+
+    def __reduce__(self):
+        return (open, (self.marker, 'w'))
+
+def test_cache_never_unpickles(source, tmp_path):
+    """캐시 자리에 악성 pickle이 있어도 실행하지 않고 원본에서 다시 읽는지 테스트"""
+    import pickle
+    cache_dir = str(tmp_path / 'cache')
+    load_structure(source, cache_dir)
+    marker = str(tmp_path / 'pwned')
+    for name in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, name), 'wb') as f:
+            pickle.dump(_Exploit(marker), f)
+
+    assert 'Light' in load_structure(source, cache_dir).devices
+    assert not os.path.exists(marker)
+
+def test_header_index_disambiguates_shared_header(source):
+    """같은 헤더(A0)를 쓰는 일괄조명차단기 상태와 엘리베이터 호출을 고정 바이트로 구분하는지 테스트"""
+    compiled = load_structure(source)
+    assert [(c.device, c.packet_type) for c in compiled.header_candidates[0xA0]] == \
+        [('LightBreaker', 'state'), ('EV', 'command')]
+    assert compiled.find_device('command', 0xA0) == 'EV'
+
+    ev_call = bytes.fromhex('A0010101081500C0')
+    breaker = bytes.fromhex(checksum('A0010000001500'))
+    assert compiled.identify(ev_call) == compiled.identify(ev_call, 'command')
+    assert compiled.identify(ev_call).device == 'EV'
+    assert compiled.identify(breaker).device == 'LightBreaker'
+    assert compiled.identify(ev_call, 'state') is None
+    assert compiled.state_decoder(ev_call) is None
+    assert compiled.state_decoder(breaker).device == 'LightBreaker'
+    assert compiled.identify(bytes.fromhex('A0' * 9)) is None
+
+def test_legacy_ev_command_header_is_migrated(source, device_list):
+    """예전 커스텀 파일의 엘리베이터 호출 헤더 FF를 A0으로 바꿔 명령을 만드는지 테스트"""
+    with open(source, encoding='utf-8') as f:
+        raw = packet_structure.load_yaml(f.read())
+    raw['EV']['command']['header'] = 'FF'
+    with open(source, 'w', encoding='utf-8') as f:
+        packet_structure.dump_yaml(raw, f)
+    logger = Mock()
+    compiled = load_structure(source, logger=logger)
+    assert compiled.raw['EV']['command']['header'] == 'FF'
+    assert compiled.find_device('command', 0xA0) == 'EV' and compiled.find_device('command', 0xFF) is None
+    logger.warning.assert_called()
+
+    routes = build_topic_routes(compiled.devices, device_list, logger)
+    assert routes[('EV1', '*')].packets['PRESS'].startswith('A0')
@@ -0,0 +1,83 @@
+import os
+import sys
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.utils import checksum
+from apps.publish_filter import PublishFilter, PublishRule, compile_publish_rules
+from apps.state_updater import StateUpdater
+
+TOPIC = 'commax/Outlet1/watt/state'
+
+def test_compile_publish_rules_skips_invalid():
+    """잘못된 발행 규칙은 로그를 남기고 그 상태만 건너뛰는지 테스트"""
+    logger = Mock()
+    rules = compile_publish_rules('Outlet', {'publish': {
+        'watt': {'deadband': 1, 'max_interval': 300},
+        'cutoff': {'deadband': -1},
+        'power': {'debounce': 1},
+    }}, logger)
+    assert rules == {('Outlet', 'watt'): PublishRule(deadband=1.0, max_interval=300.0)}
+    assert logger.error.call_count == 2
+
+def test_deadband_and_intervals():
+    """deadband(절대값/비율)와 최소/최대 발행 간격이 적용되는지 테스트"""
+    publish_filter = PublishFilter({('Outlet', 'watt'): PublishRule(1.0, 5.0, 5.0, 300.0)})
+    allow = lambda value, now: publish_filter.allow('Outlet', 'watt', TOPIC, value, now)
+    assert allow('10.3', 0)
+    assert not allow('12.0', 3)       # 최소 간격 전
+    assert not allow('10.9', 10)      # 1W 미만 변화
+    assert allow('11.3', 11)          # 정확히 1W 변화
+    assert allow('200.0', 20)
+    assert not allow('209.0', 30)     # 5%(10W) 미만 변화
+    assert allow('209.0', 320)        # 최대 간격이 지나 다시 발행
+    assert publish_filter.allow('Outlet', 'power', 'commax/Outlet1/power/state', 'ON', 321)
+    assert publish_filter.stats() == {'rules': 1, 'published': 4, 'suppressed': 3}
+
+@pytest.mark.asyncio
+async def test_state_updater_awaits_async_publish_and_filters():
+    """코루틴 발행 함수를 기다리고, 규칙에 걸린 값은 보내지 않는지 테스트"""
+    publish = AsyncMock()
+    updater = StateUpdater('commax/{}/{}/state', publish,
+                           PublishFilter({('Thermo', 'curTemp'): PublishRule(max_interval=300.0)}))
+    await updater.update_temperature(1, 'heat', 'heating', 24, 25)
+    await updater.update_temperature(1, 'heat', 'heating', 24, 26)
+    assert publish.await_count == 7
+    assert [call.args for call in publish.await_args_list].count(('commax/Thermo1/curTemp/state', '24')) == 1
+
+@pytest.mark.asyncio
+async def test_outlet_watt_jitter_is_not_published(controller):
+    """구조 파일의 발행 규칙으로 콘센트 전력값의 작은 흔들림이 걸러지는지 테스트"""
+    controller.publish_to_ha = AsyncMock()
+    controller.state_updater.publish_mqtt = controller.publish_to_ha
+    for data in ('F9010111000103', 'F9010111000104', 'F9010111000103'):
+        await controller.message_processor.process_elfin_data(checksum(data))
+    watts = [call.args[1] for call in controller.publish_to_ha.await_args_list if call.args[0].endswith('/watt/state')]
+    assert watts == ['10.3']
+    assert controller.state_updater.publish_filter.stats()['suppressed'] == 2
+
+@pytest.mark.asyncio
+async def test_values_published_again_after_ha_reconnects(controller):
+    """HA 연결이 없어 보내지 못한 값이 HA가 다시 연결된 뒤 걸러지지 않는지 테스트"""
+    frame = checksum('F9010111000103')
+    await controller.message_processor.process_elfin_data(frame)   # HA 연결 없음: 전송 안 됨
+
+    reads = iter([b'iam_ha'])
+    async def read(_):
+        try:
+            return next(reads)
+        except StopIteration:
+            # HA 등록 뒤 같은 값을 다시 받음
+            await controller.message_processor.process_elfin_data(frame)
+            return b''
+    reader = Mock(read=read)
+    writer = Mock(drain=AsyncMock(), wait_closed=AsyncMock())
+    writer.get_extra_info.return_value = None
+    controller.structure_ready.set()
+    await controller.handle_client(reader, writer)
+
+    sent = [call.args[0] for call in writer.write.call_args_list]
+    assert b'commax/Outlet1/watt/state:10.3' in sent
@@ -0,0 +1,60 @@
+import os
+import sys
+import asyncio
+import pytest
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.retry_policy import RetryPolicy
+
+LIGHT1_ON = '3101010000000033'
+LIGHT1_ON_STATE = 'B0010100000000B2'
+
+@pytest.fixture
+def policy(controller):
+    return RetryPolicy(controller, default_interval=0.1, min_interval=0.03, max_interval=1.0, min_count=3, max_count=15)
+
+def test_key_for_command_packet(policy):
+    """명령 패킷에서 (기기 이름, deviceId)를 찾는지 테스트"""
+    assert policy.key_for(LIGHT1_ON) == ('Light', 1)
+    assert policy.key_for('3102010000000034') == ('Light', 2)
+    assert policy.key_for('5501010000000057') is None
+
+def test_learns_interval_and_cap_from_fast_device(policy):
+    """응답이 빠르고 확실한 기기는 재전송 간격과 횟수가 줄어드는지 테스트"""
+    key = ('Light', 1)
+    assert policy.retry_interval(key, 1) == 0.1
+    assert policy.retry_cap(key) == 15
+    for _ in range(10):
+        policy.record_success(key, 1, 0.04)
+    assert policy.retry_interval(key, 1) < 0.1
+    assert policy.retry_interval(key, 3) > policy.retry_interval(key, 1)
+    assert policy.retry_cap(key) == 4
+
+def test_bounds_and_unreliable_device(policy):
+    """느린 기기도 상한을 넘지 않고, 자주 실패하는 기기는 횟수를 줄이지 않는지 테스트"""
+    slow, flaky = ('Thermo', 1), ('Outlet', 1)
+    for _ in range(10):
+        policy.record_success(slow, 1, 3.0)
+        policy.record_failure(flaky)
+    assert policy.retry_interval(slow, 1) == policy.max_interval
+    assert policy.retry_cap(flaky) == policy.max_count
+
+@pytest.mark.asyncio
+async def test_process_queue_waits_for_learned_interval(controller):
+    """재전송이 큐 처리 주기마다가 아니라 학습된 간격마다 일어나는지 테스트"""
+    controller.retry_policy = RetryPolicy(controller, default_interval=0.05, min_interval=0.05, max_interval=0.05)
+    future = controller.command_bus.enqueue(LIGHT1_ON, max_send_count=3)
+    for _ in range(20):
+        await controller.process_queue()
+        await asyncio.sleep(0.001)
+    assert controller.publish_to_wallpad.await_count == 1
+    assert 0 < controller.next_queue_wakeup(0.1) <= 0.05
+
+    controller.confirm_inflight(LIGHT1_ON_STATE)
+    await controller.process_queue()
+    result = future.result()
+    assert result.confirmed and result.attempts == 1
+    stats = controller.retry_policy.stats()['Light1']
+    assert stats['samples'] == 1 and stats['latency_ms'] is not None
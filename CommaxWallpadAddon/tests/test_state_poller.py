@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.state_poller import StatePoller
+
+DEVICE_LIST = {
+    'Light': {'type': 'light', 'count': 2},
+    'Outlet': {'type': 'switch', 'count': 1},
+    'Gas': {'type': 'button', 'count': 1}
+}
+
+@pytest.fixture
+def controller(controller):
+    """EW11이 연결되어 있고 버스가 조용한 상태의 테스트용 컨트롤러"""
+    controller.writers['wallpad'] = MagicMock()
+    controller.COLLECTDATA['last_recv_time'] = time.time_ns() - 10**9
+    return controller
+
+@pytest.fixture
+def poller(controller):
+    poller = StatePoller(controller, min_interval=10, max_interval=300, airtime_share=0.05)
+    poller.set_targets(DEVICE_LIST)
+    return poller
+
+def test_targets_and_request_packets(poller):
+    """state_request가 있는 기기만 대상이 되고 요청 패킷이 올바른지 테스트"""
+    assert set(poller.targets) == {('Light', 1), ('Light', 2), ('Outlet', 1)}
+    assert poller.targets[('Light', 2)].packet == '3002000000000032'
+    # Outlet은 requrestType(wattage=01)을 채워서 요청합니다
+    assert poller.targets[('Outlet', 1)].packet == '790101000000007B'
+
+def test_interval_adapts_to_changes(poller):
+    """최근에 자주 바뀐 기기는 짧게, 오래 안 바뀐 기기는 길게 조회하는지 테스트"""
+    light1, light2 = poller.targets[('Light', 1)], poller.targets[('Light', 2)]
+    start = 1000.0
+    poller.observe('B0000100000000B1', start)
+    poller.observe('B0000200000000B2', start)
+    for i in range(1, 6):
+        poller.observe('B0010100000000B2' if i % 2 else 'B0000100000000B1', start + i * 5)
+
+    now = start + 600
+    poller.observe('B0000200000000B2', now)
+    assert light1.change_rate > light2.change_rate
+    assert poller.poll_interval(light2, now) == poller.max_interval
+    assert poller.poll_interval(light1, start + 30) == poller.min_interval
+    assert poller.poll_interval(light1, now) < poller.max_interval
+
+def test_corrupt_frames_are_ignored(poller):
+    """체크섬이 맞지 않는 프레임은 수신/변화로 기록하지 않는지 테스트"""
+    light1 = poller.targets[('Light', 1)]
+    poller.observe('B0000100000000B1', 1000.0)
+    poller.observe('B0010100000000FF', 1005.0)
+    assert light1.last_seen == 1000.0
+    assert light1.last_change is None
+
+@pytest.mark.asyncio
+async def test_polls_only_when_bus_idle(poller, controller):
+    """명령 대기 중이거나 최근 수신이 있으면 조회하지 않는지 테스트"""
+    controller.QUEUE.append({'sendcmd': '3101010000000033', 'count': 0, 'expected_state': None, 'received_count': 0})
+    assert await poller.poll_once() is None
+    controller.QUEUE.clear()
+
+    controller.COLLECTDATA['last_recv_time'] = time.time_ns()
+    assert await poller.poll_once() is None
+
+    controller.COLLECTDATA['last_recv_time'] = time.time_ns() - 10**9
+    target = await poller.poll_once()
+    assert target is not None
+    controller.publish_to_wallpad.assert_awaited_once_with(bytes.fromhex(target.packet))
+
+@pytest.mark.asyncio
+async def test_airtime_budget_limits_polls(poller, controller):
+    """버스 점유율 한도를 넘지 않도록 조회 횟수가 제한되는지 테스트"""
+    poller.airtime_share = 0.005  # 10초에 요청+응답 약 3쌍
+    poller.set_targets({'Light': {'type': 'light', 'count': 20}})
+    now = time.monotonic()
+    sent = 0
+    for i in range(20):
+        if await poller.poll_once(now + i * 0.2):
+            sent += 1
+    assert sent == 3
+    assert poller.airtime_used(now + 4) <= poller.airtime_share
+
+def test_burst_order_interleaves_device_types(poller):
+    """시작 버스트가 기기 종류를 번갈아 요청하는지 테스트"""
+    poller.set_targets({'Light': {'type': 'light', 'count': 3}, 'Outlet': {'type': 'switch', 'count': 1}})
+    ordered = poller.burst_order(list(poller.targets.values()))
+    assert [target.key for target in ordered] == [('Light', 1), ('Outlet', 1), ('Light', 2), ('Light', 3)]
+
+@pytest.mark.asyncio
+async def test_burst_retries_only_unanswered(poller, controller):
+    """응답한 기기는 다시 요청하지 않고 미응답 기기만 재요청하는지 테스트"""
+    replies = {'3001000000000031': 'B0000100000000B1', '790101000000007B': 'F9010100000000FB'}
+    sent = []
+
+    async def publish(command):
+        packet = command.hex().upper()
+        sent.append(packet)
+        if packet in replies:
+            poller.observe(replies[packet])
+        return True
+    controller.publish_to_wallpad = AsyncMock(side_effect=publish)
+
+    summary = await poller.burst(rounds=3, response_timeout=0.05, idle_timeout=0.01)
+
+    assert summary['answered'] == 2
+    assert summary['unanswered'] == ['Light2']
+    assert sent.count('3001000000000031') == 1
+    assert sent.count('3002000000000032') == 3
+    assert summary['requests'] == 5
+
+@pytest.mark.asyncio
+async def test_burst_waits_for_link_and_skips_failed_sends(poller, controller):
+    """EW11이 연결되기 전에는 요청하지 않고, 전송하지 못한 요청은 세지 않는지 테스트"""
+    poller.set_targets({'Light': {'type': 'light', 'count': 1}})
+    del controller.writers['wallpad']
+    failures = []
+
+    async def publish(command):
+        # 연결 직후 첫 전송은 실패한다고 가정
+        if not failures:
+            failures.append(command)
+            return False
+        poller.observe('B0000100000000B1')
+        return True
+    controller.publish_to_wallpad = AsyncMock(side_effect=publish)
+    asyncio.get_running_loop().call_later(0.1, controller.writers.__setitem__, 'wallpad', MagicMock())
+
+    started = time.monotonic()
+    summary = await poller.burst(rounds=1, response_timeout=0.05, idle_timeout=0.01)
+
+    assert time.monotonic() - started >= 0.1
+    assert summary['requests'] == 1 and summary['answered'] == 1
+    assert controller.publish_to_wallpad.await_count == 2
+    assert poller.targets[('Light', 1)].polls == 1
+
+@pytest.mark.asyncio
+async def test_burst_gives_up_without_link(poller, controller):
+    """EW11이 끝내 연결되지 않으면 요청 없이 버스트를 끝내는지 테스트"""
+    del controller.writers['wallpad']
+    summary = await poller.burst(rounds=3, response_timeout=0.05, idle_timeout=0.01, link_timeout=0.1)
+    assert summary['requests'] == 0
+    controller.publish_to_wallpad.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_burst_yields_to_queued_commands(poller, controller):
+    """큐에 명령이 있으면 idle_timeout이 지나도 상태 요청을 보내지 않는지 테스트"""
+    poller.set_targets({'Light': {'type': 'light', 'count': 1}})
+    controller.QUEUE.append({'sendcmd': '3101010000000033', 'count': 0, 'expected_state': None, 'received_count': 0})
+    asyncio.get_running_loop().call_later(0.2, controller.QUEUE.clear)
+
+    task = asyncio.create_task(poller.burst(rounds=1, response_timeout=0.01, idle_timeout=0.01))
+    await asyncio.sleep(0.1)
+    controller.publish_to_wallpad.assert_not_awaited()
+    summary = await task
+    assert summary['requests'] == 1
@@ -0,0 +1,100 @@
+import os
+import sys
+import shutil
+import pytest
+from unittest.mock import AsyncMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.main import WallpadController
+from apps.logger import Logger
+from apps.utils import checksum
+from apps.structure_watcher import StructureWatcher
+
+@pytest.fixture
+def custom_controller(config, device_list, tmp_path):
+    """/share 대신 tmp_path의 커스텀 구조 파일을 쓰는 컨트롤러"""
+    config['vendor'] = 'custom'
+    config['structure_watch'] = {'enabled': True, 'interval': 1}
+    custom_path = tmp_path / 'packet_structures_custom.yaml'
+    shutil.copy(config['packet_file'], custom_path)
+    controller = WallpadController(config, Logger(debug=True, elfin_log=True, mqtt_log=True))
+    controller.cache_dir = str(tmp_path / 'cache')
+    controller.custom_structure_path = str(custom_path)
+    controller.device_list = device_list
+    controller.load_devices_and_packets_structures()
+    controller.publish_to_wallpad = AsyncMock(return_value=True)
+    return controller
+
+def edit_light_headers(path):
+    """Light 명령 헤더를 31 -> 32, 상태 헤더를 B0 -> B5로 바꿉니다."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    text = text.replace('header: "31"', 'header: "32"', 1).replace('header: "B0"', 'header: "B5"', 1)
+    text += '# 편집됨\n'  # mtime 해상도가 낮은 파일 시스템에서도 크기로 변화를 알 수 있게
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+@pytest.mark.asyncio
+async def test_reload_swaps_structure_for_every_consumer(custom_controller):
+    """다시 로드하면 파서, 명령 토픽, 분석기가 모두 새 구조 하나를 보는지 테스트"""
+    controller = custom_controller
+    old = controller.compiled_structure
+    edit_light_headers(controller.custom_structure_path)
+
+    assert await controller.reload_structure()
+    compiled = controller.compiled_structure
+    assert compiled is not old and compiled.version != old.version
+    assert controller.DEVICE_STRUCTURE is compiled.devices
+    assert controller.message_processor.topic_routes[('Light1', 'power')].packets['ON'].startswith('32')
+    with pytest.raises(AttributeError):
+        compiled.version = 'changed'
+
+    controller.state_updater.update_light = AsyncMock()
+    await controller.message_processor.process_elfin_data(checksum('B5010100000000'))
+    controller.state_updater.update_light.assert_awaited_once_with(1, 'ON')
+
+    # 같은 내용을 다시 읽으면 교체하지 않고, YAML이 깨지면 지금 구조를 그대로 씁니다
+    assert not await controller.reload_structure()
+    with open(controller.custom_structure_path, 'a', encoding='utf-8') as f:
+        f.write('\n  broken: [\n')
+    assert not await controller.reload_structure()
+    assert controller.compiled_structure is compiled
+
+@pytest.mark.asyncio
+async def test_watcher_reloads_after_file_settles(custom_controller):
+    """파일이 바뀌고 한 주기 동안 그대로일 때만 다시 로드하는지 테스트"""
+    controller = custom_controller
+    assert isinstance(controller.structure_watcher, StructureWatcher)
+    watcher = StructureWatcher(controller, controller.custom_structure_path, interval=0)
+    watcher.start()
+    assert not await watcher.check()
+
+    old = controller.compiled_structure
+    edit_light_headers(controller.custom_structure_path)
+    assert not await watcher.check()     # 방금 바뀜: 쓰기가 끝났는지 한 번 더 확인
+    assert await watcher.check()
+    assert controller.compiled_structure.version != old.version
+    assert not await watcher.check()
+    assert watcher.reload_count == 1
+
+@pytest.mark.asyncio
+async def test_reload_rebuilds_poll_packets(custom_controller):
+    """다시 로드하면 상태 조회 요청 패킷을 새 구조로 만들고 관측 기록은 유지하는지 테스트"""
+    controller = custom_controller
+    poller = controller.state_poller
+    poller.set_targets(controller.device_list)
+    target = poller.targets[('Light', 1)]
+    assert target.packet.startswith('30')
+    target.polls = 3
+
+    path = controller.custom_structure_path
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text.replace('header: "30"', 'header: "3A"', 1))
+
+    assert await controller.reload_structure()
+    target = poller.targets[('Light', 1)]
+    assert target.packet == checksum('3A010000000000') and target.polls == 3
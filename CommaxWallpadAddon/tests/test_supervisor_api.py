@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.supervisor_api import SupervisorAPI, NotificationQueue
+from tests.supervisor_stub import SupervisorStub
+
+@pytest.fixture
+def stub():
+    """로컬 Supervisor 스텁 서버"""
+    with SupervisorStub() as server:
+        yield server
+
+def test_connection_reuse(stub):
+    """여러 요청이 하나의 커넥션을 재사용하는지 테스트"""
+    api = SupervisorAPI(base_url=stub.url, token='test-token')
+    for _ in range(5):
+        result = api.get_addon_info()
+        assert result.success
+        assert result.data == stub.addon_info
+    api.close()
+
+    assert len(stub.requests) == 5
+    assert len(stub.client_addresses) == 1, "요청마다 새 커넥션이 생성되었습니다"
+    assert stub.requests[0]['authorization'] == 'Bearer test-token'
+
+def test_request_timeout(stub):
+    """응답이 없는 Supervisor에 대해 타임아웃 내에 실패를 반환하는지 테스트"""
+    stub.delay = 2.0
+    api = SupervisorAPI(base_url=stub.url, token='test-token', read_timeout=0.2)
+    started = time.monotonic()
+    result = api.send_notification('title', 'message')
+    api.close()
+
+    assert not result.success
+    assert time.monotonic() - started < 1.5
+
+def test_missing_token_does_not_send(stub):
+    """토큰이 없으면 요청을 보내지 않는지 테스트"""
+    api = SupervisorAPI(base_url=stub.url, token='')
+    assert not api.get_addon_info().success
+    assert stub.requests == []
+
+@pytest.mark.asyncio
+async def test_async_facade_does_not_block_loop(stub):
+    """비동기 요청이 진행되는 동안 이벤트 루프가 계속 동작하는지 테스트"""
+    stub.delay = 0.3
+    api = SupervisorAPI(base_url=stub.url, token='test-token')
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker_task = asyncio.create_task(ticker())
+    result = await api.async_restart_addon()
+    ticker_task.cancel()
+    api.close()
+
+    assert result.success
+    assert ticks >= 10, "요청 중에 이벤트 루프가 멈췄습니다"
+
+@pytest.mark.asyncio
+async def test_notification_queue_rate_limit(stub):
+    """알림이 최소 간격을 지키고 같은 제목은 합쳐지는지 테스트"""
+    api = SupervisorAPI(base_url=stub.url, token='test-token')
+    queue = NotificationQueue(api, min_interval=0.3)
+    queue.enqueue('EW11', 'first')
+    queue.enqueue('EW11', 'second')
+    queue.enqueue('Other', 'third')
+    assert queue.pending == 2
+
+    task = asyncio.create_task(queue.run())
+    await asyncio.sleep(0.5)
+    task.cancel()
+    api.close()
+
+    sent = [request['json'] for request in stub.requests]
+    assert sent == [{'title': 'EW11', 'message': 'second'}, {'title': 'Other', 'message': 'third'}]
+    assert stub.requests[1]['time'] - stub.requests[0]['time'] >= 0.25
+
+def test_addon_info_cached_with_ttl(stub):
+    """애드온 정보가 TTL 동안 캐시되고 옵션 변경 시 무효화되는지 테스트"""
+    api = SupervisorAPI(base_url=stub.url, token='test-token')
+    assert api.get_addon_info_cached(ttl=60).success
+    assert api.get_addon_info_cached(ttl=60).success
+    assert len(stub.requests) == 1
+
+    api.update_addon_options({'vendor': 'custom'})
+    assert api.get_addon_info_cached(ttl=60).success
+    assert len(stub.requests) == 3
+    api.close()
@@ -1,5 +1,6 @@
 import unittest
-from unittest.mock import Mock, patch, mock_open
+from unittest.mock import Mock, AsyncMock, patch, mock_open
+import copy
 import json
 import asyncio
 import sys
@@ -14,53 +15,15 @@ from apps.main import WallpadController
 from apps.logger import Logger
 from apps.main import CollectData, ExpectedStatePacket
 from apps.state_updater import StateUpdater
+from apps.packet_structure import CompiledStructure
 
 @pytest.fixture
-def config():
-    """테스트용 설정을 제공하는 fixture"""
-    # 테스트용 패킷 구조 파일 경로 설정
-    packet_file = os.path.join(os.path.dirname(__file__), 'fixtures', 'packet_structures_commax.yaml')
-    
-    return {
-        'vendor': 'commax',
-        'mqtt': {
-            'mqtt_server': '192.168.0.39',
-            'mqtt_id': 'my_user',
-            'mqtt_password': 'm1o@s#quitto'
-        },
-        'mqtt_TOPIC': 'commax',
-        'elfin_TOPIC': 'ew11',
-        'elfin': {
-            'use_auto_reboot': True,
-            'elfin_unavailable_notification': False,
-            'elfin_server': '192.168.0.38',
-            'elfin_id': 'admin',
-            'elfin_password': 'admin',
-            'elfin_reboot_interval': 60
-        },
-        'log': {
-            'DEBUG': True,
-            'elfin_log': True,
-            'mqtt_log': True
-        },
-        'command_settings': {
-            'queue_interval_in_second': 0.1,
-            'max_send_count': 15,
-            'min_receive_count': 1,
-            'send_command_on_idle': True
-        },
-        'climate_settings': {
-            'min_temp': 5,
-            'max_temp': 40
-        },
-        'packet_file': packet_file  # 테스트용 패킷 파일 경로
-    }
-
-@pytest.fixture
-def controller(config):
+def controller(config, device_list, tmp_path):
     """테스트용 컨트롤러를 제공하는 fixture"""
     logger = Logger(debug=True, elfin_log=True, mqtt_log=True)
     controller = WallpadController(config, logger)
+    controller.cache_dir = str(tmp_path / 'cache')
+    controller.device_list = device_list
     
     # 파일이 존재하는지 확인
     if not os.path.exists(config['packet_file']):
@@ -99,7 +62,7 @@ def test_load_devices_and_packets_structures(controller):
 async def test_process_ha_command(controller):
     """홈어시스턴트 명령 처리 테스트"""
     # 테스트 토픽과 값
-    topics = ['commax', 'Thermo1', 'curTemp', 'command']
+    topics = ['commax', 'Thermo1', 'setTemp', 'command']
     value = '24'
     
     # process_ha_command 호출
@@ -108,6 +71,21 @@ async def test_process_ha_command(controller):
     # QUEUE에 명령이 추가되었는지 확인
     assert len(controller.QUEUE) > 0
 
+@pytest.mark.asyncio
+async def test_process_ha_command_rejects_unknown_topic(controller):
+    """라우터에 없는 토픽(없는 action, 검색되지 않은 기기)은 큐에 넣지 않는지 테스트"""
+    for topics in (['commax', 'Thermo1', 'curTemp', 'command'],
+                   ['commax', 'Light3', 'power', 'command'],
+                   ['commax', 'Light', 'power', 'command'],
+                   ['commax', 'Unknown1', 'power', 'command'],
+                   ['commax', 'Light1']):
+        await controller.message_processor.process_ha_command(topics, 'ON')
+    assert controller.QUEUE == []
+
+    # 버튼형 기기는 action과 관계없이 받습니다
+    await controller.message_processor.process_ha_command(['commax', 'Gas1', 'button', 'command'], 'PRESS')
+    assert controller.QUEUE[-1]['sendcmd'] == '1101800000000092'
+
 @pytest.mark.asyncio
 async def test_process_ha_command_light(controller):
     """조명 명령 패킷 테스트"""
@@ -377,8 +355,8 @@ def test_generate_expected_state_packet(controller):
     assert 'possible_values' in result_light, "possible_values 필드가 없습니다"
     
     # 필드 타입 확인
-    assert isinstance(result_light['required_bytes'], list), "required_bytes가 리스트가 아닙니다"
-    assert isinstance(result_light['possible_values'], list), "possible_values가 리스트가 아닙니다"
+    assert isinstance(result_light['required_bytes'], tuple), "required_bytes가 튜플이 아닙니다"
+    assert isinstance(result_light['possible_values'], tuple), "possible_values가 튜플이 아닙니다"
     
     # 조명 상태 패킷의 경우 예상되는 값들 확인
     assert 0 in result_light['required_bytes'], "헤더 위치(0)가 required_bytes에 없습니다"
@@ -399,8 +377,8 @@ def test_generate_expected_state_packet(controller):
     assert 'possible_values' in result_gas, "possible_values 필드가 없습니다"
     
     # 필드 타입 확인
-    assert isinstance(result_gas['required_bytes'], list), "required_bytes가 리스트가 아닙니다"
-    assert isinstance(result_gas['possible_values'], list), "possible_values가 리스트가 아닙니다"
+    assert isinstance(result_gas['required_bytes'], tuple), "required_bytes가 튜플이 아닙니다"
+    assert isinstance(result_gas['possible_values'], tuple), "possible_values가 튜플이 아닙니다"
     
     # 가스차단기 상태 패킷의 경우 예상되는 값들 확인
     assert 0 in result_gas['required_bytes'], "헤더 위치(0)가 required_bytes에 없습니다"
@@ -420,8 +398,8 @@ def test_generate_expected_state_packet(controller):
     assert 'possible_values' in result_outlet_power, "possible_values 필드가 없습니다"
     
     # 필드 타입 확인
-    assert isinstance(result_outlet_power['required_bytes'], list), "required_bytes가 리스트가 아닙니다"
-    assert isinstance(result_outlet_power['possible_values'], list), "possible_values가 리스트가 아닙니다"
+    assert isinstance(result_outlet_power['required_bytes'], tuple), "required_bytes가 튜플이 아닙니다"
+    assert isinstance(result_outlet_power['possible_values'], tuple), "possible_values가 튜플이 아닙니다"
     
     # 콘센트 파워 상태 패킷의 경우 예상되는 값들 확인
     assert 0 in result_outlet_power['required_bytes'], "헤더 위치(0)가 required_bytes에 없습니다"
@@ -445,8 +423,8 @@ def test_generate_expected_state_packet(controller):
     assert 'possible_values' in result_outlet_auto, "possible_values 필드가 없습니다"
     
     # 필드 타입 확인
-    assert isinstance(result_outlet_auto['required_bytes'], list), "required_bytes가 리스트가 아닙니다"
-    assert isinstance(result_outlet_auto['possible_values'], list), "possible_values가 리스트가 아닙니다"
+    assert isinstance(result_outlet_auto['required_bytes'], tuple), "required_bytes가 튜플이 아닙니다"
+    assert isinstance(result_outlet_auto['possible_values'], tuple), "possible_values가 튜플이 아닙니다"
     
     # 콘센트 오토 상태 패킷의 경우 예상되는 값들 확인
     assert 0 in result_outlet_auto['required_bytes'], "헤더 위치(0)가 required_bytes에 없습니다"
@@ -727,4 +705,66 @@ async def test_state_updater_light_breaker():
     mock_publish.assert_called_once_with(
         state_topic.format("LightBreaker1", "power"),
         "ON"
-    )
\ No newline at end of file
+    )
+
+@pytest.mark.asyncio
+async def test_startup_opens_tcp_server_first(config, tmp_path):
+    """TCP 서버가 가장 먼저 열리고 나머지 단계가 준비되는지 테스트"""
+    from apps.utils import StartupTimer
+    logger = Logger(debug=True, elfin_log=True, mqtt_log=True)
+    controller = WallpadController(config, logger)
+    controller.TCP_HOST, controller.TCP_PORT = '127.0.0.1', 0
+    controller.share_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
+    controller.cache_dir = str(tmp_path / 'cache')
+
+    timer = StartupTimer(logger)
+    with patch('apps.main.WebServer') as mock_web_server:
+        mock_web_server.return_value.run = AsyncMock()
+        await controller.startup(timer)
+
+    try:
+        assert controller.tcp_server is not None and controller.tcp_server.is_serving()
+        assert controller.structure_ready.is_set()
+        assert controller.DEVICE_STRUCTURE is not None
+        mock_web_server.return_value.run.assert_called_once()
+        phases = [name for name, _, _ in sorted(timer.phases, key=lambda phase: phase[1])]
+        assert phases[0] == 'TCP 서버 시작'
+        assert set(phases) == {'TCP 서버 시작', '패킷 구조 로드', '기기 목록 로드', '웹서버 시작'}
+    finally:
+        controller.tcp_server.close()
+
+def test_expected_state_packet_is_memoized(controller):
+    """같은 명령의 예상 상태 패킷은 다시 계산하지 않고, 구조가 바뀌면 새로 계산하는지 테스트"""
+    processor = controller.message_processor
+    first = processor.generate_expected_state_packet('3101010000000033')
+    second = processor.generate_expected_state_packet('3101010000000033')
+    assert first == second
+    assert processor.expected_state_misses == 1 and processor.expected_state_hits == 1
+
+    # 돌려받은 딕셔너리를 바꿔도 메모는 그대로여야 함
+    second['required_bytes'] = ()
+    assert processor.generate_expected_state_packet('3101010000000033') == first
+
+    controller.apply_structure(CompiledStructure(copy.deepcopy(controller.compiled_structure.raw)))
+    processor.generate_expected_state_packet('3101010000000033')
+    assert processor.expected_state_misses == 2
+
+def test_expected_state_matcher_matches_like_possible_values(controller):
+    """비트마스크 판별기가 possible_values 비교와 같은 결과를 내는지 테스트"""
+    from apps.message_processor import ExpectedStateMatcher
+    from apps.utils import checksum
+    processor = controller.message_processor
+    outlet_on = processor.generate_expected_state_packet('7A0201010000007E')
+    matcher = ExpectedStateMatcher(outlet_on)
+    assert len(matcher.multi) == 1
+
+    def slow_match(frame):
+        received = bytes.fromhex(frame)
+        return all(received[pos:pos + 1].hex().upper() in outlet_on['possible_values'][pos]
+                   for pos in outlet_on['required_bytes'])
+
+    for power in range(256):
+        frame = checksum(f'F9{power:02X}020000000000')
+        assert matcher.matches(int(frame, 16)) == slow_match(frame)
+    assert matcher.matches(int(checksum('F9010200000000'), 16))
+    assert not matcher.matches(int(checksum('F9010100000000'), 16))
@@ -0,0 +1,160 @@
+import os
+import copy
+import sys
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+# apps 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from apps.web_server import WebServer
+from apps.packet_structure import CompiledStructure
+
+@pytest.fixture
+def web_server(controller):
+    """테스트용 컨트롤러에 연결된 웹서버"""
+    return WebServer(controller)
+
+@pytest.mark.asyncio
+async def test_live_packets_reads_controller_state(web_server):
+    """웹 API가 같은 루프에서 컨트롤러 상태를 그대로 읽는지 테스트"""
+    web_server.wallpad_controller.COLLECTDATA['recv_data'].append('B0010100000000B2')
+    response = await web_server.app.test_client().get('/api/live_packets')
+    data = await response.get_json()
+    assert data['recv_data'] == ['B0010100000000B2']
+
+@pytest.mark.asyncio
+async def test_send_packet_returns_command_result(web_server):
+    """패킷 전송 API가 명령 버스를 거쳐 전송 결과를 반환하는지 테스트"""
+    controller = web_server.wallpad_controller
+    controller.publish_to_wallpad = AsyncMock(return_value=True)
+    controller.message_processor.process_elfin_data = AsyncMock()
+    client = web_server.app.test_client()
+
+    async def drive_queue():
+        while True:
+            await controller.process_queue()
+            await asyncio.sleep(0.001)
+
+    driver = asyncio.create_task(drive_queue())
+    response = await client.post('/api/send_packet', json={'packet': '3101010000000033', 'max_send_count': 2})
+    driver.cancel()
+    data = await response.get_json()
+    assert data['success']
+    assert data['result']['attempts'] == 2
+    assert data['result']['confirmed'] is False
+    controller.publish_to_wallpad.assert_awaited_with(bytes.fromhex('3101010000000033'))
+    # 보낸 명령을 월패드에서 받은 패킷처럼 해석하지 않음
+    controller.message_processor.process_elfin_data.assert_not_called()
+
+    response = await client.post('/api/send_packet', json={'packet': '3101010000000000'})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_send_packets_streams_ndjson(web_server):
+    """일괄 전송 API가 패킷별 결과를 NDJSON으로 스트리밍하는지 테스트"""
+    import json
+    controller = web_server.wallpad_controller
+    controller.publish_to_wallpad = AsyncMock(return_value=True)
+    client = web_server.app.test_client()
+
+    response = await client.post('/api/send_packets', json={'packets': ['3101010000000000']})
+    assert response.status_code == 400
+
+    async def drive_queue():
+        while True:
+            await controller.process_queue()
+            await asyncio.sleep(0.001)
+
+    driver = asyncio.create_task(drive_queue())
+    response = await client.post('/api/send_packets', json={
+        'sweep': {'template': '31010000000000', 'position': 2, 'start': '00', 'end': '01'},
+        'interval': 0.05, 'max_send_count': 1
+    })
+    body = await response.get_data()
+    driver.cancel()
+
+    assert response.headers['Content-Type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line.get('packet') for line in lines[:2]] == ['3101000000000032', '3101010000000033']
+    assert lines[-1]['done'] and lines[-1]['count'] == 2
+
+@pytest.mark.asyncio
+async def test_packet_journal_validates_query(web_server, tmp_path):
+    """패킷 저널 API가 잘못된 limit/direction을 거부하고 잘림 여부를 정확히 알려주는지 테스트"""
+    from apps.packet_journal import PacketJournal
+    journal = PacketJournal(str(tmp_path / 'journal'))
+    web_server.wallpad_controller.packet_journal = journal
+    for i in range(3):
+        journal.append(bytes.fromhex('B0010100000000B2'), 'recv')
+    client = web_server.app.test_client()
+    query = '/api/packet_journal?start=00:00&end=23:59:59'
+
+    assert (await client.get(query + '&limit=0')).status_code == 400
+    assert (await client.get(query + '&limit=-5')).status_code == 400
+    assert (await client.get(query + '&direction=both')).status_code == 400
+
+    data = await (await client.get(query + '&limit=3')).get_json()
+    assert len(data['frames']) == 3 and not data['truncated']
+    data = await (await client.get(query + '&limit=2&direction=recv')).get_json()
+    assert len(data['frames']) == 2 and data['truncated']
+    journal.close()
+
+@pytest.mark.asyncio
+async def test_analyze_packet_uses_header_index(web_server):
+    """패킷 분석이 헤더가 겹치는 패킷을 고정 바이트로 구분하는지 테스트"""
+    client = web_server.app.test_client()
+    data = await (await client.post('/api/analyze_packet', json={'command': 'A0010101081500'})).get_json()
+    assert data['device'] == 'EV' and data['expected_state']
+    data = await (await client.post('/api/analyze_packet', json={'command': 'A0010000001500'})).get_json()
+    assert data['device'] == 'LightBreaker' and data['analysis'][0].startswith('Byte 0: header = LightBreaker state')
+
+@pytest.mark.asyncio
+async def test_packet_structures_served_with_etag(web_server):
+    """구조 JSON을 구조 버전별로 한 번만 만들고, ETag가 같으면 304를 돌려주는지 테스트"""
+    import gzip
+    import json
+    from unittest.mock import patch
+    client = web_server.app.test_client()
+    response = await client.get('/api/packet_structures')
+    assert (await response.get_json())['Light']['command']['header'] == '31'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    with patch.object(web_server, '_build_packet_suggestions', wraps=web_server._build_packet_suggestions) as build:
+        response = await client.get('/api/packet_suggestions')
+        etag = response.headers['ETag']
+        data = await response.get_json()
+        assert {'header': 'A0', 'device': 'EV'} in data['headers']['command']
+        assert data['values']['Light_command']['2']['name'] == 'power'
+
+        response = await client.get('/api/packet_suggestions', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        response = await client.get('/api/packet_suggestions', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(await response.get_data())) == data
+        assert build.call_count == 1
+
+        # 구조가 바뀌면 (새 버전) 다시 만들고, 내용이 달라졌으므로 ETag도 달라집니다
+        controller = web_server.wallpad_controller
+        raw = copy.deepcopy(controller.compiled_structure.raw)
+        raw['Light']['command']['header'] = '32'
+        controller.apply_structure(CompiledStructure(raw))
+        response = await client.get('/api/packet_suggestions', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and build.call_count == 2
+        assert response.headers['ETag'] != etag
+
+@pytest.mark.asyncio
+async def test_custom_structure_is_replaced_atomically(web_server, tmp_path):
+    """커스텀 구조 저장이 임시 파일을 남기지 않고 파일을 통째로 바꾸고, 기존 파일은 백업하는지 테스트"""
+    custom_file = tmp_path / 'packet_structures_custom.yaml'
+    custom_file.write_text('old: true\n', encoding='utf-8')
+    web_server.wallpad_controller.custom_structure_path = str(custom_file)
+
+    with open(web_server.wallpad_controller.config['packet_file'], encoding='utf-8') as f:
+        content = f.read()
+    response = await web_server.app.test_client().post('/api/custom_packet_structure', json={'content': content})
+    assert (await response.get_json())['success']
+    assert custom_file.read_text(encoding='utf-8') == content
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cache', 'packet_structure_backups', 'packet_structures_custom.yaml']
+    assert [p.read_text(encoding='utf-8') for p in (tmp_path / 'packet_structure_backups').iterdir()] == ['old: true\n']